@@ -0,0 +1,145 @@
+"""
+Branching of a warmed-up simulation into what-if variants.
+
+The simulation runs once up to the time shared by every variant, then
+the process forks a child for each variant. Each child starts from a
+copy-on-write copy of the simulation, applies its variant and runs to
+completion, then sends its result back to the parent through a pipe.
+
+Since the children are forked, a variant can refer to any object that
+existed before branching, such as a link or a flow of the
+configuration, and modifies the copy of that object in its child.
+"""
+
+import cPickle
+import os
+import sys
+import traceback
+from collections import deque
+from multiprocessing import cpu_count
+
+def _child(simulation, variant, collect, outfile):
+    """
+    Applies the specified variant to the specified simulation, runs it
+    to completion, and writes the collected result to the specified
+    file.
+    """
+
+    try:
+        variant(simulation)
+        simulation.run()
+
+        data = cPickle.dumps((True, collect(simulation)), cPickle.HIGHEST_PROTOCOL)
+
+    except Exception:
+        data = cPickle.dumps((False, traceback.format_exc()), cPickle.HIGHEST_PROTOCOL)
+
+    outfile.write(data)
+    outfile.close()
+
+def _spawn(simulation, variant, collect):
+    """
+    Forks a child that runs the specified variant, and returns its
+    process id and the file its result is read from.
+    """
+
+    # Flushes the output so that the children do not repeat it
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    (read_fd, write_fd) = os.pipe()
+
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+
+        # Exits without returning into the caller of the parent
+        try:
+            _child(simulation, variant, collect, os.fdopen(write_fd, 'wb'))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+
+    return (pid, os.fdopen(read_fd, 'rb'))
+
+def _join(pid, infile):
+    """
+    Reads the result of the specified child and waits for it to exit.
+    Returns whether the child succeeded, and its result or the
+    traceback of its failure.
+    """
+
+    data = infile.read()
+    infile.close()
+
+    os.waitpid(pid, 0)
+
+    # Checks that the child sent its result before exiting
+    if not data:
+        return (False, 'child exited without a result')
+
+    return cPickle.loads(data)
+
+def branch(simulation, until, variants, collect, processes=None):
+    """
+    Runs the specified simulation until the specified time in
+    milliseconds, then runs each of the specified variants to
+    completion in a child process, with at most the specified number
+    of children at once.
+
+    Each variant is called with the simulation to modify it, and the
+    specified collect function is called with each completed
+    simulation to return a picklable result. Returns the list of
+    results, in the order of the variants.
+    """
+
+    # Checks that variants is a list
+    if not isinstance(variants, list):
+        raise TypeError, 'variants must be a list'
+
+    # Checks that each variant and collect are callable
+    for variant in variants:
+        if not callable(variant):
+            raise TypeError, 'variant must be callable'
+
+    if not callable(collect):
+        raise TypeError, 'collect must be callable'
+
+    # Defaults to one child per processor
+    if processes is None:
+        processes = cpu_count()
+
+    # Checks that processes is an int
+    if not isinstance(processes, int):
+        raise TypeError, 'number of processes must be an int'
+
+    # Checks that processes is positive
+    elif processes <= 0:
+        raise ValueError, 'number of processes must be positive'
+
+    simulation.run(until)
+
+    outcomes = [None] * len(variants)
+    running = deque()
+
+    for (i, variant) in enumerate(variants):
+        # Waits for the oldest child once every process is busy
+        if len(running) == processes:
+            (j, pid, infile) = running.popleft()
+            outcomes[j] = _join(pid, infile)
+
+        (pid, infile) = _spawn(simulation, variant, collect)
+        running.append((i, pid, infile))
+
+    while running:
+        (j, pid, infile) = running.popleft()
+        outcomes[j] = _join(pid, infile)
+
+    # Reports the first failure once every child has exited
+    for (i, (succeeded, value)) in enumerate(outcomes):
+        if not succeeded:
+            raise RuntimeError, 'variant %d failed:\n%s' % (i, value)
+
+    return [value for (succeeded, value) in outcomes]
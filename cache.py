@@ -0,0 +1,324 @@
+"""
+On-disk cache of the results of simulation runs.
+
+Each entry is keyed by a hash of the parsed configuration, the options
+that change the results of a run, and the source code of the
+simulator, so that a change to any of them misses the cache. An entry
+holds what the run wrote to the standard output, the datafiles it
+wrote and the state of the trackers of its measured flows and links.
+
+The entries are evicted least recently used first once the cache
+grows past its size bound.
+"""
+
+import cPickle
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+# Files of an entry
+_OUTPUT = 'output.txt'
+_TRACKERS = 'trackers.pkl'
+_DATAFILES = 'datafiles'
+
+# Directory of the datafiles written by Simulation._finalize()
+DATAFILES = 'datafiles'
+
+# Default bound on the size of the cache, in bytes
+DEFAULT_SIZE = 1 << 30
+
+def _number(field):
+    """
+    Returns the specified field of a configuration as a float if it is
+    a number, and as a string otherwise.
+    """
+
+    try:
+        return float(field)
+    except ValueError:
+        return field
+
+def _canonical(filename):
+    """
+    Returns the sections of the specified configuration file, each as
+    the sorted list of its entries with their numbers parsed, so that
+    formatting and order do not change the key.
+    """
+
+    sections = {}
+    section = None
+
+    for line in open(filename, 'r'):
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if line.startswith('#'):
+            section = line
+            sections.setdefault(section, [])
+            continue
+
+        sections[section].append(tuple([_number(field.strip())
+                                        for field in line.split(',')]))
+
+    return sorted([(section, sorted(entries)) for (section, entries) in sections.iteritems()])
+
+def version():
+    """
+    Returns a hash of the source code of the simulator, not counting
+    its tests.
+    """
+
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    digest = hashlib.sha1()
+
+    for (path, directories, filenames) in os.walk(root):
+        directories[:] = sorted([name for name in directories
+                                 if name != 'tests' and not name.startswith('.')])
+
+        for name in sorted(filenames):
+            if name.endswith('.py'):
+                source = os.path.join(path, name)
+
+                digest.update(os.path.relpath(source, root))
+                digest.update(open(source, 'rb').read())
+
+    return digest.hexdigest()
+
+def key(filename, settings):
+    """
+    Returns the key of the run of the specified configuration file
+    with the specified dictionary of the settings that change its
+    results.
+    """
+
+    description = (_canonical(filename), sorted(settings.items()), version())
+
+    return hashlib.sha1(repr(description)).hexdigest()
+
+def lookup(directory, key):
+    """
+    Returns the path of the entry of the specified key in the cache in
+    the specified directory, or None if there is none, and marks the
+    entry as the most recently used.
+    """
+
+    entry = os.path.join(directory, key)
+
+    if not os.path.isdir(entry):
+        return None
+
+    os.utime(entry, None)
+
+    return entry
+
+def replay(entry, measure_flows=None, measure_links=None):
+    """
+    Writes the output of the run of the specified entry to the
+    standard output, copies its datafiles back, and restores the
+    trackers of the specified measured flows and links, if any.
+    """
+
+    infile = open(os.path.join(entry, _OUTPUT), 'rb')
+    sys.stdout.write(infile.read())
+    infile.close()
+
+    datafiles = os.path.join(entry, _DATAFILES)
+
+    for name in sorted(os.listdir(datafiles)):
+        shutil.copyfile(os.path.join(datafiles, name), os.path.join(DATAFILES, name))
+
+    infile = open(os.path.join(entry, _TRACKERS), 'rb')
+    (flows, links) = cPickle.load(infile)
+    infile.close()
+
+    for (measured, states) in [(measure_flows, flows), (measure_links, links)]:
+        if measured is not None:
+            for (name, state) in states.iteritems():
+                measured[name].getTracker().__dict__.update(state)
+
+def _size(path):
+    """
+    Returns the number of bytes of the files under the specified path.
+    """
+
+    size = 0
+
+    for (directory, directories, filenames) in os.walk(path):
+        for name in filenames:
+            size += os.path.getsize(os.path.join(directory, name))
+
+    return size
+
+def _evict(directory, max_size):
+    """
+    Removes the least recently used entries of the cache in the
+    specified directory until it holds at most the specified number of
+    bytes.
+    """
+
+    entries = []
+
+    for name in os.listdir(directory):
+        entry = os.path.join(directory, name)
+
+        if os.path.isdir(entry) and not name.startswith('.'):
+            entries.append((os.path.getmtime(entry), entry, _size(entry)))
+
+    entries.sort()
+
+    total = sum([size for (used, entry, size) in entries])
+
+    for (used, entry, size) in entries:
+        if total <= max_size:
+            break
+
+        shutil.rmtree(entry, True)
+        total -= size
+
+class _Tee:
+    """
+    Standard output that also records what is written to it.
+    """
+
+    softspace = 0
+
+    def __init__(self, stream):
+        """
+        Creates a _Tee instance writing to the specified stream.
+        """
+
+        self._stream = stream
+        self._chunks = []
+
+    def write(self, text):
+        """
+        Writes and records the specified text.
+        """
+
+        self._stream.write(text)
+        self._chunks.append(text)
+
+    def flush(self):
+        """
+        Flushes the stream.
+        """
+
+        self._stream.flush()
+
+    def getvalue(self):
+        """
+        Returns what was written so far.
+        """
+
+        return ''.join(self._chunks)
+
+def _fingerprint(path):
+    """
+    Returns the modification time and a hash of the contents of the
+    specified file, since an edit within the resolution of the time or
+    a copy that keeps the time leaves the time unchanged.
+    """
+
+    infile = open(path, 'rb')
+    digest = hashlib.sha1(infile.read()).hexdigest()
+    infile.close()
+
+    return (os.path.getmtime(path), digest)
+
+class Recorder:
+    """
+    Recorder of the output and datafiles of a run, to be stored in the
+    cache.
+    """
+
+    def __init__(self):
+        """
+        Creates a Recorder instance, which records the standard output
+        and notes the datafiles that already exist.
+        """
+
+        self._before = self._datafiles()
+
+        self._stdout = sys.stdout
+        self._tee = _Tee(sys.stdout)
+
+        sys.stdout = self._tee
+
+    def _datafiles(self):
+        """
+        Returns the modification time and a hash of the contents of
+        each datafile.
+        """
+
+        if not os.path.isdir(DATAFILES):
+            return {}
+
+        return dict([(name, _fingerprint(os.path.join(DATAFILES, name)))
+                     for name in os.listdir(DATAFILES)])
+
+    def stop(self):
+        """
+        Stops recording, and returns the output and the names of the
+        datafiles written since the recorder was created.
+        """
+
+        sys.stdout = self._stdout
+
+        after = self._datafiles()
+
+        written = sorted([name for (name, modified) in after.iteritems()
+                          if self._before.get(name) != modified])
+
+        return (self._tee.getvalue(), written)
+
+def store(directory, key, recorder, simulation, max_size=DEFAULT_SIZE):
+    """
+    Stores the output and datafiles recorded by the specified recorder
+    and the trackers of the specified finished simulation in the cache
+    in the specified directory under the specified key, then evicts
+    entries past the specified number of bytes.
+    """
+
+    (output, written) = recorder.stop()
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # Builds the entry aside so that a reader never sees it partially
+    staging = tempfile.mkdtemp(prefix='.', dir=directory)
+
+    outfile = open(os.path.join(staging, _OUTPUT), 'wb')
+    outfile.write(output)
+    outfile.close()
+
+    os.mkdir(os.path.join(staging, _DATAFILES))
+
+    for name in written:
+        shutil.copyfile(os.path.join(DATAFILES, name), os.path.join(staging, _DATAFILES, name))
+
+    flows = dict([(name, vars(flow.getTracker()))
+                  for (name, flow) in simulation._measure_flows.iteritems()])
+
+    links = dict([(name, dict([(field, value) for (field, value)
+                               in vars(link.getTracker()).iteritems()
+                               if field != '_packet_entries']))
+                  for (name, link) in simulation._measure_links.iteritems()])
+
+    outfile = open(os.path.join(staging, _TRACKERS), 'wb')
+    cPickle.dump((flows, links), outfile, cPickle.HIGHEST_PROTOCOL)
+    outfile.close()
+
+    entry = os.path.join(directory, key)
+
+    # Keeps the entry of a concurrent run of the same key
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, True)
+
+    _evict(directory, max_size)
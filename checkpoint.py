@@ -0,0 +1,399 @@
+"""
+Checkpoints of a running simulation.
+
+A checkpoint holds only the state that changes while the simulation
+runs: the pending events and timers, the buffers, the devices, the
+flows with their congestion algorithms, and the trackers. Devices,
+ports and flows are referred to by index, and packets and events are
+stored once in flat tables, so that the state is made of plain values
+which are written with marshal and compressed.
+
+The topology itself is not stored, so a checkpoint must be restored
+into a simulation built from the same configuration.
+"""
+
+import marshal
+import os
+import zlib
+from collections import deque
+
+import clock
+from event import POOL
+from host import Host
+from packet import Packet
+
+_MAGIC = 'CS143CKPT'
+_VERSION = 2
+
+def _topology(simulation):
+    """
+    Returns the devices of the specified simulation sorted by name,
+    the ports of each device in order, and the flows of each device
+    sorted by destination.
+    """
+
+    devices = sorted(simulation._devices, key=str)
+
+    ports = []
+    flows = []
+
+    for device in devices:
+        device_ports = device.get_ports()
+        if isinstance(device, Host):
+            device_ports = [device_ports]
+
+        ports.extend(device_ports)
+
+        device_flows = device.get_flows()
+        for dest in sorted(device_flows, key=str):
+            flows.append(device_flows[dest])
+
+    return (devices, ports, flows)
+
+def _index(values):
+    """
+    Maps each of the specified values to its index.
+    """
+
+    return dict([(value, i) for (i, value) in enumerate(values)])
+
+def _get(values, i):
+    """
+    Returns the value of the specified index, or None if no index is
+    specified.
+    """
+
+    if i is None:
+        return None
+
+    return values[i]
+
+def _time_base():
+    """
+    Returns a description of the time base in use.
+    """
+
+    return (clock.uses_ticks(), clock.ticks(1))
+
+def save(simulation, filename):
+    """
+    Writes the state of the specified simulation to the specified
+    file, replacing it only once the checkpoint is complete.
+    """
+
+    (devices, ports, flows) = _topology(simulation)
+
+    device_index = _index(devices)
+    port_index = _index(ports)
+    link_index = dict([(port.conn(), p) for (p, port) in enumerate(ports)])
+    flow_index = _index(flows)
+
+    # Stores each packet and event once, keyed by identity
+    packets = []
+    packet_index = {}
+
+    events = []
+    event_index = {}
+
+    def lower_device(device):
+        """
+        Returns the index of the specified device, or None.
+        """
+
+        if device is None:
+            return None
+
+        return device_index[device]
+
+    def lower_packet(packet):
+        """
+        Returns the index of the specified packet in the table of
+        packets, adding it if necessary.
+        """
+
+        if packet is None:
+            return None
+
+        k = packet_index.get(id(packet))
+        if k is not None:
+            return k
+
+        costs = packet._routing
+        if costs is not None:
+            costs = [(device_index[dest], cost) for (dest, cost) in costs.iteritems()]
+
+        data = []
+        if packet._data is not None:
+            data = packet._data.items()
+
+        k = len(packets)
+        packet_index[id(packet)] = k
+
+        packets.append((packet._id, lower_device(packet._source),
+                        lower_device(packet._dest), packet._bits_size,
+                        packet._create_time, packet._ack, costs, data))
+
+        return k
+
+    def lower_event(event):
+        """
+        Returns the index of the specified event in the table of
+        events, adding it if necessary.
+        """
+
+        k = event_index.get(id(event))
+        if k is not None:
+            return k
+
+        k = len(events)
+        event_index[id(event)] = k
+
+        events.append((event._scheduled_time, port_index[event._port],
+                       event._action, lower_packet(event._packet)))
+
+        return k
+
+    # Drains the scheduler, then pushes the events back in the same
+    # order, which keeps the order of ties with later events
+    queue = simulation._event_queue
+
+    scheduled = []
+    while len(queue) > 0:
+        scheduled.append(queue.pop())
+
+    for event in scheduled:
+        simulation._schedule(event)
+
+    wheel = simulation._timers
+
+    state = {}
+
+    state['devices'] = [str(device) for device in devices]
+    state['time_base'] = _time_base()
+
+    state['now'] = simulation._now
+    state['incomplete'] = simulation._incomplete
+    state['finished'] = simulation._finished
+    state['processed'] = simulation._processed
+
+    state['now_queue'] = [lower_event(event) for event in simulation._now_queue]
+    state['scheduled'] = [lower_event(event) for event in scheduled]
+    state['channels'] = [(port_index[port], [lower_event(event) for event in channel])
+                         for (port, channel) in simulation._channels.iteritems()
+                         if channel]
+
+    state['tick'] = wheel._tick
+    # Keeps the timers in the order they were armed
+    timers = sorted(wheel._timers.iteritems(), key=lambda (key, timer): wheel._order[key])
+
+    state['timers'] = [(flow_index[key], tick, lower_event(event))
+                       for (key, (tick, event)) in timers]
+
+    state['buffers'] = [([lower_packet(packet) for packet in port.incoming()._deque],
+                         port.incoming()._curr_size,
+                         [lower_packet(packet) for packet in port.outgoing()._deque],
+                         port.outgoing()._curr_size)
+                        for port in ports]
+
+    # Only the entry times of the packets still waiting to be sent
+    # are ever looked up again
+    links = []
+    for port in ports:
+        tracker = port.conn().getTracker()
+
+        entries = tracker._packet_entries
+        waiting = [(lower_packet(packet), entries[packet])
+                   for packet in port.outgoing()._deque if packet in entries]
+
+        recorded = dict([(name, value) for (name, value) in vars(tracker).iteritems()
+                         if name != '_packet_entries'])
+
+        links.append((recorded, waiting))
+
+    state['links'] = links
+
+    state['flows'] = [(flow._window_size, flow._num_unack, flow._num_bits,
+                       flow._curr_seq_num, flow._unack_packets,
+                       flow._ack_counts.items(), flow._last_timeout,
+                       flow._last_duplicate,
+                       dict([(name, value) for (name, value) in vars(flow._algorithm).iteritems()
+                             if name != '_flow']),
+                       vars(flow.getTracker()))
+                      for flow in flows]
+
+    hosts = []
+    routers = []
+
+    for device in devices:
+        most_recent = [(link_index[link], time)
+                       for (link, time) in device._most_recent.iteritems()]
+
+        if isinstance(device, Host):
+            hosts.append((most_recent,
+                          [(device_index[source], num)
+                           for (source, num) in device._expected.iteritems()],
+                          [(flow_index[flow], timeout)
+                           for (flow, timeout) in device._timeouts.iteritems()]))
+
+        else:
+            algorithm = device._algorithm
+
+            routers.append((most_recent,
+                            [(device_index[dest], changed)
+                             for (dest, changed) in device._changed.iteritems()],
+                            device._next_update, device._should_update,
+                            [(device_index[dest], port_index[port])
+                             for (dest, port) in algorithm._routing_table.iteritems()],
+                            [(device_index[dest], cost)
+                             for (dest, cost) in algorithm._costs.iteritems()]))
+
+    state['hosts'] = hosts
+    state['routers'] = routers
+
+    state['packets'] = packets
+    state['events'] = events
+
+    data = zlib.compress(marshal.dumps((_VERSION, state)), 1)
+
+    # Writes to a temporary file first, so that an interrupted save
+    # leaves the previous checkpoint intact
+    temporary = filename + '.tmp'
+
+    with open(temporary, 'wb') as outfile:
+        outfile.write(_MAGIC)
+        outfile.write(data)
+
+    os.rename(temporary, filename)
+
+def restore(simulation, filename):
+    """
+    Replaces the state of the specified simulation, which must be
+    built from the same configuration and initialized, with the state
+    read from the specified file.
+    """
+
+    with open(filename, 'rb') as infile:
+        data = infile.read()
+
+    # Checks that the file is a checkpoint
+    if not data.startswith(_MAGIC):
+        raise ValueError, 'file must be a checkpoint'
+
+    (version, state) = marshal.loads(zlib.decompress(data[len(_MAGIC):]))
+
+    # Checks that the checkpoint has a known format
+    if version != _VERSION:
+        raise ValueError, 'checkpoint must have version %d' % _VERSION
+
+    # Checks that the checkpoint uses the same time base
+    if tuple(state['time_base']) != _time_base():
+        raise ValueError, 'checkpoint must use the same time base'
+
+    (devices, ports, flows) = _topology(simulation)
+
+    # Checks that the checkpoint matches the configuration
+    if (state['devices'] != [str(device) for device in devices]
+            or len(state['buffers']) != len(ports)
+            or len(state['flows']) != len(flows)):
+        raise ValueError, 'checkpoint must match the configuration'
+
+    links = [port.conn() for port in ports]
+
+    packets = []
+    for (seq, source, dest, size, created, ack, costs, data) in state['packets']:
+        packet = Packet()
+
+        packet._id = seq
+        packet._source = _get(devices, source)
+        packet._dest = _get(devices, dest)
+        packet._bits_size = size
+        packet._create_time = created
+        packet._ack = ack
+
+        if costs is not None:
+            packet._routing = dict([(devices[d], cost) for (d, cost) in costs])
+
+        if data:
+            packet._data = dict(data)
+
+        packets.append(packet)
+
+    events = [POOL.create(time, ports[p], action, _get(packets, k))
+              for (time, p, action, k) in state['events']]
+
+    # Discards the pending events of the simulation
+    queue = simulation._event_queue
+    while len(queue) > 0:
+        POOL.release(queue.pop())
+
+    for event in simulation._now_queue:
+        POOL.release(event)
+
+    for event in simulation._timers.expire():
+        POOL.release(event)
+
+    simulation._now = state['now']
+    simulation._incomplete = state['incomplete']
+    simulation._finished = state['finished']
+    simulation._processed = state['processed']
+
+    simulation._now_queue = deque([events[k] for k in state['now_queue']])
+
+    for k in state['scheduled']:
+        simulation._schedule(events[k])
+
+    simulation._channels = dict([(ports[p], deque([events[k] for k in channel]))
+                                 for (p, channel) in state['channels']])
+
+    wheel = simulation._timers
+    wheel._tick = state['tick']
+
+    for (f, tick, k) in state['timers']:
+        wheel._add(flows[f], tick, events[k])
+
+    for (port, (incoming, incoming_size, outgoing, outgoing_size)) in zip(ports, state['buffers']):
+        port.incoming()._deque = deque([packets[k] for k in incoming])
+        port.incoming()._curr_size = incoming_size
+        port.outgoing()._deque = deque([packets[k] for k in outgoing])
+        port.outgoing()._curr_size = outgoing_size
+
+    for (link, (recorded, waiting)) in zip(links, state['links']):
+        tracker = link.getTracker()
+
+        tracker.__dict__.update(recorded)
+        tracker._packet_entries = dict([(packets[k], time) for (k, time) in waiting])
+
+    for (flow, saved) in zip(flows, state['flows']):
+        (flow._window_size, flow._num_unack, flow._num_bits,
+         flow._curr_seq_num, flow._unack_packets, ack_counts,
+         flow._last_timeout, flow._last_duplicate,
+         algorithm, tracker) = saved
+
+        flow._ack_counts = dict(ack_counts)
+
+        flow._algorithm.__dict__.update(algorithm)
+        flow.getTracker().__dict__.update(tracker)
+
+    hosts = iter(state['hosts'])
+    routers = iter(state['routers'])
+
+    for device in devices:
+        if isinstance(device, Host):
+            (most_recent, expected, timeouts) = hosts.next()
+
+            device._expected = dict([(devices[source], num) for (source, num) in expected])
+            device._timeouts = dict([(flows[f], timeout) for (f, timeout) in timeouts])
+
+        else:
+            (most_recent, changed, next_update, should_update, routes, costs) = routers.next()
+
+            device._changed = dict([(devices[dest], value) for (dest, value) in changed])
+            device._next_update = next_update
+            device._should_update = should_update
+
+            algorithm = device._algorithm
+
+            algorithm._routing_table = dict([(devices[dest], ports[p]) for (dest, p) in routes])
+            algorithm._costs = dict([(devices[dest], cost) for (dest, cost) in costs])
+
+        device._most_recent = dict([(links[p], time) for (p, time) in most_recent])
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+
+"""
+Thin client of the simulation daemon.
+
+Takes the same arguments as setup.py, sends the configuration with
+them to a running daemon, and writes back the output of the run. It
+only imports the standard library, so that it starts much faster than
+setup.py, which imports numpy and matplotlib.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+
+# Size prefix of each message
+_HEADER = struct.Struct('!I')
+
+def default_socket():
+    """
+    Returns the default path of the socket of the daemon.
+    """
+
+    return os.path.join(tempfile.gettempdir(), 'simulator-%d.sock' % os.getuid())
+
+def _strings(value):
+    """
+    Returns the specified decoded JSON value with its strings encoded
+    back to UTF-8.
+    """
+
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+
+    if isinstance(value, list):
+        return [_strings(item) for item in value]
+
+    return value
+
+def send(connection, message):
+    """
+    Sends the specified message of strings, lists and None over the
+    specified connection.
+    """
+
+    data = json.dumps(message)
+
+    connection.sendall(_HEADER.pack(len(data)) + data)
+
+def _read(connection, size):
+    """
+    Returns the specified number of bytes read from the specified
+    connection.
+    """
+
+    chunks = []
+
+    while size > 0:
+        chunk = connection.recv(min(size, 1 << 16))
+
+        # Checks that the connection is still open
+        if not chunk:
+            raise EOFError, 'connection closed'
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return ''.join(chunks)
+
+def receive(connection):
+    """
+    Returns the next message received over the specified connection,
+    with its tuples as lists.
+
+    Messages are JSON, which only carries data, since anyone allowed to
+    connect to the socket can send one.
+    """
+
+    (size,) = _HEADER.unpack(_read(connection, _HEADER.size))
+
+    return _strings(json.loads(_read(connection, size)))
+
+def request(args, path=None):
+    """
+    Runs the configuration given by the specified setup.py arguments
+    on the daemon listening on the specified socket, and returns the
+    output of the run and its error, if any.
+
+    The datafiles are written relative to the current directory, as
+    setup.py would.
+    """
+
+    if path is None:
+        path = default_socket()
+
+    config = open(args[0], 'r')
+    text = config.read()
+    config.close()
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        connection.connect(path)
+
+        send(connection, (os.getcwd(), text, list(args[1:])))
+
+        return receive(connection)
+
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    path = None
+
+    for arg in list(args):
+        if arg.startswith('--socket='):
+            args.remove(arg)
+            path = arg[len('--socket='):]
+
+    (output, error) = request(args, path)
+
+    sys.stdout.write(output)
+
+    if error is not None:
+        sys.stderr.write(error)
+        sys.exit(1)
@@ -0,0 +1,98 @@
+"""
+Time base of the simulation.
+
+Times are float milliseconds by default. When ticks are used instead,
+times are ints counting a fixed number of ticks per millisecond, which
+keeps sums of delays exact and makes ties compare equal.
+"""
+
+NS_PER_MS = 1000000
+
+# Number of ticks per millisecond, or None when using milliseconds
+_ticks_per_ms = None
+
+def use_ticks(ticks_per_ms=None):
+    """
+    Uses the specified number of ticks per millisecond as the time
+    base, or float milliseconds if none is specified.
+    """
+
+    global _ticks_per_ms
+
+    if ticks_per_ms is not None:
+        # Checks that ticks_per_ms is an int
+        if not isinstance(ticks_per_ms, int):
+            raise TypeError, 'ticks per millisecond must be an int'
+
+        # Checks that ticks_per_ms is positive
+        elif ticks_per_ms <= 0:
+            raise ValueError, 'ticks per millisecond must be positive'
+
+    _ticks_per_ms = ticks_per_ms
+
+def uses_ticks():
+    """
+    Returns True if times are integer ticks, and False otherwise.
+    """
+
+    return _ticks_per_ms is not None
+
+def ticks(ms):
+    """
+    Converts the specified number of milliseconds to the time base.
+    """
+
+    if _ticks_per_ms is None:
+        return float(ms)
+
+    return int(round(ms * _ticks_per_ms))
+
+def ms(time):
+    """
+    Converts the specified time to milliseconds.
+    """
+
+    if _ticks_per_ms is None:
+        return time
+
+    return float(time) / float(_ticks_per_ms)
+
+def quantize(time):
+    """
+    Rounds the specified computed time to the time base.
+    """
+
+    if _ticks_per_ms is None:
+        return time
+
+    return int(round(time))
+
+def transmission(size, rate):
+    """
+    Returns the time to transmit the specified number of bits at the
+    specified rate in bits per millisecond.
+    """
+
+    if _ticks_per_ms is None:
+        return float(size) / float(rate)
+
+    return (size * _ticks_per_ms + rate // 2) // rate
+
+def coerce(time):
+    """
+    Checks the specified time and returns it as a value of the time
+    base.
+    """
+
+    # Checks that time is a number
+    if not isinstance(time, (int, long, float)):
+        raise TypeError, 'time must be a float or an int'
+
+    if _ticks_per_ms is None:
+        return float(time)
+
+    # Checks that time is a whole number of ticks
+    if isinstance(time, float) and not time.is_integer():
+        raise ValueError, 'time must be a whole number of ticks'
+
+    return int(time)
@@ -0,0 +1,1109 @@
+from bisect import bisect_left
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count, imap, islice, repeat
+from math import sqrt
+from operator import sub
+from time import time as wall_clock
+
+import clock
+from congestion.aimd import AIMD
+from congestion.fast import FAST
+from conn import Link
+from event import Event, POOL
+from flow import Flow
+from host import Host
+from packet import Packet
+from router import Router
+from routing.bellmanford import BellmanFord
+from simulation import BaseSimulation
+
+# Fields of a compiled packet, which is a plain list
+_SEQ = 0
+_SOURCE = 1
+_DEST = 2
+_SIZE = 3
+_CREATED = 4
+_ACK = 5
+_COSTS = 6
+_ENTERED = 7
+
+# Action of a receive event at the head of its arrival channel
+_ARRIVAL = 4
+
+# Kinds of congestion algorithm
+_AIMD = 0
+_FAST = 1
+
+class CompiledSimulation(BaseSimulation):
+    """
+    Simulation that runs on a compiled form of the network.
+
+    The devices are initialized as usual and then lowered into flat
+    lists indexed by device, port and flow number, with packets stored
+    as plain lists. The event loop binds these lists to locals and makes
+    no accessor calls. Once the run ends, the recorded statistics are
+    stored back into the trackers, so the results are the same as those
+    of Simulation.
+
+    The compiled engine supports the Bellman-Ford routing algorithm and
+    the AIMD and FAST congestion algorithms. It keeps its own binary heap
+    of future events, and does not print the per-packet trace.
+    """
+
+    def _lower(self, packet):
+        """
+        Returns the compiled form of the specified packet.
+        """
+
+        index = self._device_index
+
+        costs = None
+        if packet.routing() is not None:
+            costs = dict([(index[dest], cost)
+                          for (dest, cost) in packet.routing().iteritems()])
+
+        return [packet._id, index[packet._source], index[packet._dest],
+                packet._bits_size, packet._create_time,
+                packet.ack(), costs, None]
+
+    def _compile(self, events):
+        """
+        Lowers the initialized devices and the specified initial events
+        into flat lists.
+        """
+
+        devices = self._devices
+
+        self._device_index = dict([(device, d) for (d, device) in enumerate(devices)])
+
+        # Numbers the ports, where each port also numbers its outgoing link
+        ports = []
+        for device in devices:
+            if isinstance(device, Host):
+                ports.append(device._port)
+            elif isinstance(device, Router):
+                ports.extend(device._ports)
+            else:
+                raise TypeError, 'device must be a Host or Router instance'
+
+        self._ports = ports
+        self._port_index = dict([(port, p) for (p, port) in enumerate(ports)])
+
+        device_index = self._device_index
+        port_index = self._port_index
+
+        links = [port.conn() for port in ports]
+        self._links = links
+
+        self._port_device = [device_index[port.source()] for port in ports]
+        self._peer = [port_index[link.dest()] for link in links]
+        self._delay = [link.delay() for link in links]
+
+        # Precomputes the transmission time of each packet size
+        self._trans = [dict([(size, clock.transmission(size, link.rate()))
+                             for size in (Packet._DATA_SIZE, Packet._ACK_SIZE)])
+                       for link in links]
+
+        self._in_max = [port.incoming()._max_size for port in ports]
+        self._out_max = [port.outgoing()._max_size for port in ports]
+
+        # Copies the statistics recorded so far by the link trackers
+        trackers = [link.getTracker() for link in links]
+
+        self._link_sent = [list(tracker._times_sent) for tracker in trackers]
+        self._losses = [list(tracker._packet_losses) for tracker in trackers]
+        self._buffer_sizes = [list(tracker._buffer_sizes) for tracker in trackers]
+        self._queueing_delay = [tracker._queueing_delay for tracker in trackers]
+        self._queueing_times = [[time for (time, delay) in tracker._queueing_delays]
+                                for tracker in trackers]
+        self._queueing_delays = [[delay for (time, delay) in tracker._queueing_delays]
+                                 for tracker in trackers]
+
+        # Numbers the flows of every device
+        flows = []
+        owners = []
+
+        self._is_host = [isinstance(device, Host) for device in devices]
+        self._flows_of = []
+        self._flow_order = []
+
+        for (d, device) in enumerate(devices):
+            table = {}
+            order = []
+
+            for (dest, flow) in device._flows.iteritems():
+                table[device_index[dest]] = len(flows)
+                order.append((device_index[dest], len(flows)))
+
+                flows.append(flow)
+                owners.append(d)
+
+            self._flows_of.append(table)
+            self._flow_order.append(order)
+
+        self._flows = flows
+
+        self._owner = owners
+        self._flow_dest = [device_index[flow._dest_device] for flow in flows]
+
+        self._window = [flow._window_size for flow in flows]
+        self._unack = [flow._num_unack for flow in flows]
+        self._bits = [flow._num_bits for flow in flows]
+        self._curr_seq = [flow._curr_seq_num for flow in flows]
+        self._unack_packets = [list(flow._unack_packets) for flow in flows]
+        self._ack_counts = [dict(flow._ack_counts) for flow in flows]
+        self._last_timeout = [flow._last_timeout for flow in flows]
+        self._last_duplicate = [flow._last_duplicate for flow in flows]
+
+        # Lowers the state of the congestion algorithms
+        self._kind = []
+        self._gamma = []
+        self._alpha = []
+
+        for flow in flows:
+            algorithm = flow._algorithm
+
+            if isinstance(algorithm, FAST):
+                self._kind.append(_FAST)
+                self._gamma.append(algorithm._gamma)
+                self._alpha.append(algorithm._alpha)
+            elif isinstance(algorithm, AIMD):
+                self._kind.append(_AIMD)
+                self._gamma.append(None)
+                self._alpha.append(None)
+            else:
+                raise TypeError, 'congestion algorithm must be AIMD or FAST'
+
+        self._state = [flow._algorithm._state for flow in flows]
+        self._ssthresh = [flow._algorithm._ssthresh for flow in flows]
+
+        # Copies the statistics recorded so far by the flow trackers
+        trackers = [flow.getTracker() for flow in flows]
+
+        self._flow_sent = [list(tracker._times_sent) for tracker in trackers]
+        self._received = [list(tracker._times_received) for tracker in trackers]
+        self._window_sizes = [list(tracker._window_sizes) for tracker in trackers]
+        self._rtt_times = [[time for (time, rtt) in tracker._rtts] for tracker in trackers]
+        self._rtts = [[rtt for (time, rtt) in tracker._rtts] for tracker in trackers]
+
+        # Lowers the state of the hosts
+        self._host_port = [None] * len(devices)
+        self._expected = [None] * len(devices)
+        self._timeouts = [None] * len(flows)
+
+        for (d, device) in enumerate(devices):
+            if isinstance(device, Host):
+                self._host_port[d] = port_index[device._port]
+                self._expected[d] = dict([(device_index[source], num)
+                                          for (source, num) in device._expected.iteritems()])
+
+        # Lowers the state of the routers and their routing tables
+        self._routes = [None] * len(devices)
+        self._costs = [None] * len(devices)
+        self._next_update = [None] * len(devices)
+        self._should_update = [None] * len(devices)
+
+        for (d, device) in enumerate(devices):
+            if isinstance(device, Router):
+                algorithm = device._algorithm
+
+                # Checks that the routing algorithm is supported
+                if not isinstance(algorithm, BellmanFord):
+                    raise TypeError, 'routing algorithm must be Bellman-Ford'
+
+                self._routes[d] = dict([(device_index[dest], port_index[port])
+                                        for (dest, port) in algorithm._routing_table.iteritems()])
+                self._costs[d] = dict([(device_index[dest], cost)
+                                       for (dest, cost) in algorithm._costs.iteritems()])
+                self._next_update[d] = device._next_update
+                self._should_update[d] = device._should_update
+
+        # Lowers the initial events
+        self._initial = []
+
+        for event in events:
+            self._initial.append((event.scheduled(), port_index[event.port()],
+                                  event.action(), self._lower(event.packet())))
+
+            POOL.release(event)
+
+    def _run(self):
+        """
+        Runs the compiled event loop as a generator, which is sent the
+        bounds of each call to BaseSimulation._advance() and yields once
+        they are reached.
+        """
+
+        SEQ = _SEQ
+        SOURCE = _SOURCE
+        DEST = _DEST
+        SIZE = _SIZE
+        CREATED = _CREATED
+        ACK = _ACK
+        COSTS = _COSTS
+        ENTERED = _ENTERED
+
+        CREATE = Event._CREATE
+        RECEIVE = Event._RECEIVE
+        SEND = Event._SEND
+        TIMEOUT = Event._TIMEOUT
+        ARRIVAL = _ARRIVAL
+
+        DATA_SIZE = Packet._DATA_SIZE
+        ACK_SIZE = Packet._ACK_SIZE
+        NUM_DUPLICATES = Flow._NUM_DUPLICATES
+
+        # Converts the constants of the devices to the time base
+        margin = clock.ticks(Flow._MARGIN)
+        slack = clock.ticks(0.001)
+        update_every = clock.ticks(Router._UPDATE_EVERY)
+        cost_window = clock.ticks(Link._WINDOW)
+        epsilon = clock.ticks(BellmanFord._EPSILON)
+        fast_delay = clock.ticks(10)
+        default_variance = 10 * clock.ticks(1) ** 2
+
+        check_every = BaseSimulation._CHECK_EVERY
+
+        quantize = clock.quantize
+        ms = clock.ms
+
+        # Binds the compiled lists to locals
+        is_host = self._is_host
+        port_device = self._port_device
+        peer = self._peer
+        delay = self._delay
+        trans = self._trans
+
+        num_ports = len(port_device)
+
+        incoming = [deque() for p in xrange(num_ports)]
+        outgoing = [deque() for p in xrange(num_ports)]
+        in_size = [0] * num_ports
+        out_size = [0] * num_ports
+        in_max = self._in_max
+        out_max = self._out_max
+        most_recent = [None] * num_ports
+
+        link_sent = self._link_sent
+        losses = self._losses
+        buffer_sizes = self._buffer_sizes
+        queueing_delay = self._queueing_delay
+        queueing_times = self._queueing_times
+        queueing_delays = self._queueing_delays
+
+        flows_of = self._flows_of
+        flow_order = self._flow_order
+
+        owner = self._owner
+        flow_dest = self._flow_dest
+        window = self._window
+        unack = self._unack
+        bits = self._bits
+        curr_seq = self._curr_seq
+        unack_packets = self._unack_packets
+        ack_counts = self._ack_counts
+        last_timeout = self._last_timeout
+        last_duplicate = self._last_duplicate
+
+        kind = self._kind
+        state = self._state
+        ssthresh = self._ssthresh
+        gamma = self._gamma
+        alpha = self._alpha
+
+        flow_sent = self._flow_sent
+        received = self._received
+        window_sizes = self._window_sizes
+        rtt_times = self._rtt_times
+        rtts = self._rtts
+        min_rtt = [min(values) if values else -1 for values in rtts]
+
+        host_port = self._host_port
+        expected = self._expected
+        timeouts = self._timeouts
+
+        routes = self._routes
+        costs = self._costs
+        next_update = self._next_update
+        should_update = self._should_update
+
+        # Counts the flows of the hosts that have not yet completed
+        tracked = [is_host[d] for d in owner]
+
+        incomplete = [0]
+
+        # Runs until the queue empties if no host has a flow
+        num_tracked = tracked.count(True)
+
+        # Initializes the future events, the arrival channels and the
+        # events scheduled for the current time
+        heap = []
+        channels = [deque() for p in xrange(num_ports)]
+        now_queue = deque()
+        now = None
+
+        next_seq = count(1).next
+
+        # Initializes the retransmission timers as a heap whose stale
+        # entries are skipped
+        timers = {} # flow -> (time, packet, seq)
+        timer_heap = []
+
+        next_timer = count(1).next
+
+        def completed(f):
+            """
+            Returns True if the specified flow has completed, as
+            Flow.is_complete().
+            """
+
+            return (bits[f] is not None and bits[f] <= 0 and unack[f] == 0)
+
+        def notify(f, complete):
+            """
+            Updates the count of incomplete flows if the completion of
+            the specified flow changed from the specified value.
+            """
+
+            if tracked[f] and completed(f) != complete:
+                if complete:
+                    incomplete[0] += 1
+                else:
+                    incomplete[0] -= 1
+
+        def push(time, port, action, packet):
+            """
+            Pushes the specified event, as BaseSimulation.push(event).
+            """
+
+            if time == now:
+                now_queue.append((port, action, packet))
+
+            elif action == RECEIVE:
+                channel = channels[port]
+
+                # Only the head of the channel goes on the heap
+                if not channel or channel[-1] <= time:
+                    channel.append(time)
+
+                    if len(channel) == 1:
+                        heappush(heap, (time, next_seq(), port, ARRIVAL, None))
+
+                else:
+                    heappush(heap, (time, next_seq(), port, RECEIVE, None))
+
+            else:
+                heappush(heap, (time, next_seq(), port, action, packet))
+
+        def arm(f, time, packet):
+            """
+            Arms the retransmission timer of the specified flow.
+            """
+
+            seq = next_timer()
+
+            timers[f] = (time, packet, seq)
+            heappush(timer_heap, (time, seq, f))
+
+        def enqueue(time, port, packet):
+            """
+            Appends the specified packet to the outgoing queue of the
+            specified port and schedules its send event.
+            """
+
+            size = packet[SIZE]
+
+            if out_size[port] + size <= out_max[port]:
+                outgoing[port].append(packet)
+                out_size[port] += size
+
+            packet[ENTERED] = time
+
+            next_time = most_recent[port]
+            if next_time is None or next_time < time:
+                next_time = time
+
+            most_recent[port] = next_time + trans[port][size]
+
+            push(next_time, port, SEND, packet)
+
+        def mean_rtt(f):
+            """
+            Returns the average round trip time of the specified flow,
+            as FlowTracker.mean_rtt(since).
+            """
+
+            values = rtts[f]
+
+            if not values:
+                return -1
+
+            return (float(sum(reversed(values))) / float(len(values)))
+
+        def timeout(f, delay):
+            """
+            Returns the timeout length of the specified flow, as
+            Flow.timeout(delay).
+            """
+
+            values = rtts[f]
+
+            mean = mean_rtt(f)
+
+            rtt = mean
+            if mean == -1:
+                rtt = 3 * delay
+
+            variance = default_variance
+            if len(values) > 1:
+                deviations = imap(pow, imap(sub, reversed(values), repeat(mean)), repeat(2))
+                variance = float(sum(deviations)) / float(len(values))
+
+            return (rtt + 4 * sqrt(variance))
+
+        def rearm(time, f):
+            """
+            Re-arms the retransmission timer of the specified flow, as
+            Host._rearm(time, flow).
+            """
+
+            if not unack_packets[f]:
+                timers.pop(f, None)
+                return
+
+            length = timeouts[f]
+            if length is None:
+                length = quantize(timeout(f, delay[host_port[owner[f]]]))
+
+            packet = [unack_packets[f][0], owner[f], flow_dest[f], DATA_SIZE, time, False, None, None]
+
+            arm(f, time + length + slack, packet)
+
+        def ack_received(f):
+            """
+            Handles a received acknowledgment, as
+            CongestionAlgorithm.handle_ack_received().
+            """
+
+            cwnd = window[f]
+
+            # AIMD and FAST share the names of their states
+            if state[f] == AIMD._SS:
+                cwnd += 1
+
+                if ssthresh[f] != -1 and cwnd > ssthresh[f]:
+                    state[f] = AIMD._CA
+
+            elif state[f] == AIMD._CA:
+                if kind[f] == _FAST:
+                    lowest = min_rtt[f]
+                    if lowest == -1:
+                        lowest = 3 * fast_delay
+
+                    rtt = mean_rtt(f)
+                    if rtt == -1:
+                        rtt = 3 * fast_delay
+
+                    cwnd = max(min(2 * cwnd, (1 - gamma[f]) * cwnd + gamma[f] * ((float(lowest) / float(rtt)) * cwnd + alpha[f])), 1)
+
+                else:
+                    cwnd += 1.0 / float(cwnd)
+
+            window[f] = float(cwnd)
+
+        def analyze(action, f, time, packet, link):
+            """
+            Analyzes the specified event of the specified flow, as
+            Flow.analyze(event, link).
+            """
+
+            reset = False
+
+            seq_num = packet[SEQ]
+
+            window_sizes[f].append((time, window[f]))
+
+            if action == SEND and not packet[ACK]:
+                flow_sent[f].append((time, packet[SIZE], delay[link]))
+
+                unack_packets[f].append(seq_num)
+
+            elif action == RECEIVE and packet[ACK]:
+                if seq_num in unack_packets[f]:
+                    received[f].append(time)
+
+                    ack_received(f)
+
+                    unack_packets[f].remove(seq_num)
+                else:
+                    num_acks = ack_counts[f].get(seq_num, 0) + 1
+                    ack_counts[f][seq_num] = num_acks
+
+                    if num_acks == NUM_DUPLICATES:
+                        # Handles 3 duplicate acknowledgments received
+                        if time > (last_duplicate[f] + margin):
+                            print '[ATTN] [%.3f] 3 duplicate acks in %s' % (ms(time), state[f])
+
+                            if state[f] == AIMD._CA:
+                                cwnd = max(float(window[f]) / 2.0, 1)
+
+                                ssthresh[f] = float(cwnd)
+                                window[f] = float(cwnd + NUM_DUPLICATES)
+
+                            last_duplicate[f] = time
+
+                        unack_packets[f] = []
+                        curr_seq[f] = seq_num - 1
+
+                        reset = True
+
+                # Records the round trip time of the acknowledged packet
+                rtt = time - packet[CREATED]
+
+                rtt_times[f].append(time)
+                rtts[f].append(rtt)
+
+                if min_rtt[f] == -1 or rtt < min_rtt[f]:
+                    min_rtt[f] = rtt
+
+            elif action == TIMEOUT:
+                # Checks that packet was not already acknowledged
+                if seq_num in unack_packets[f]:
+                    unack_packets[f].remove(seq_num)
+
+                    if time > (last_timeout[f] + margin):
+                        print '[ATTN] [%.3f] timeout in %s' % (ms(time), state[f])
+
+                        cwnd = window[f]
+
+                        state[f] = AIMD._SS
+                        ssthresh[f] = float(max(float(cwnd) / 2.0, 1))
+                        window[f] = 1.0
+
+                        last_timeout[f] = time
+
+                    unack_packets[f] = []
+                    curr_seq[f] = seq_num - 1
+
+                    ack_counts[f] = {}
+
+                    reset = True
+
+            complete = completed(f)
+            unack[f] = len(unack_packets[f])
+            notify(f, complete)
+
+            window_sizes[f].append((time, window[f]))
+
+            return reset
+
+        def prepare(f, packet):
+            """
+            Attaches the next sequence number of the specified flow to
+            the specified packet, as Flow.prepare(packet).
+            """
+
+            curr_seq[f] += 1
+            packet[SEQ] = curr_seq[f]
+
+            if bits[f] is not None:
+                complete = completed(f)
+                bits[f] -= packet[SIZE]
+                notify(f, complete)
+
+        def find_cost(r, time, dest):
+            """
+            Computes the cost for the specified router to reach the
+            specified destination, as BellmanFord._find_cost(time, dest).
+            """
+
+            port = routes[r].get(dest)
+
+            if port is None:
+                return -1
+
+            static_cost = Link._STATIC * delay[port]
+
+            # Averages the queueing delays since the start of the window
+            times = queueing_times[port]
+            since = bisect_left(times, time - cost_window)
+
+            mean_delay = 0
+            if since < len(times):
+                num = len(times) - since
+                mean_delay = float(sum(islice(reversed(queueing_delays[port]), num))) / float(num)
+
+            dynamic_cost = Link._DYNAMIC * mean_delay
+
+            return (static_cost + dynamic_cost) + costs[r][dest]
+
+        def update(r, time, packet):
+            """
+            Updates the routing table of the specified router using the
+            specified packet, as BellmanFord.update(time, packet).
+            """
+
+            changed = False
+
+            next = packet[SOURCE]
+            next_cost = find_cost(r, time, next)
+
+            for (dest, cost) in packet[COSTS].iteritems():
+                if dest == r:
+                    continue
+
+                overall_cost = next_cost + cost
+                current_cost = find_cost(r, time, dest)
+
+                # Checks whether new or better route found
+                if current_cost == -1 or overall_cost < (current_cost - epsilon):
+                    costs[r][dest] = costs[r][next] + cost
+                    routes[r][dest] = routes[r][next]
+
+                    changed = True
+
+            return changed
+
+        def host_create(time, h, packet):
+            """
+            Handles create events of hosts.
+            """
+
+            f = flows_of[h].get(packet[DEST])
+
+            if (f is not None and window[f] > unack[f]
+                    and (bits[f] is None or bits[f] > 0)):
+                prepare(f, packet)
+
+                enqueue(time, host_port[h], packet)
+
+        def host_receive(time, h, packet):
+            """
+            Handles receive events of hosts.
+            """
+
+            # Checks that packet was destined for this host
+            if packet[DEST] != h:
+                return
+
+            dest = packet[SOURCE]
+            port = host_port[h]
+
+            # Handles acknowledgment received
+            if packet[ACK]:
+                f = flows_of[h].get(dest)
+
+                should_create = False
+
+                if f is not None:
+                    should_create = not window[f] > unack[f]
+                    analyze(RECEIVE, f, time, packet, None)
+
+                    rearm(time, f)
+
+                # Only create an event if previously unable to send
+                if should_create:
+                    push(time, port, CREATE, [None, h, dest, DATA_SIZE, time, False, None, None])
+
+            # Otherwise, creates an acknowledgment packet
+            else:
+                table = expected[h]
+
+                if dest not in table:
+                    table[dest] = packet[SEQ]
+
+                seq_num = table[dest]
+
+                if packet[SEQ] == seq_num:
+                    table[dest] += 1
+
+                enqueue(time, port, [seq_num, h, dest, ACK_SIZE, packet[CREATED], True, None, None])
+
+        def host_send(time, h, packet):
+            """
+            Handles the flow of send events of hosts, once the packet
+            was forwarded.
+            """
+
+            should_create = True
+
+            port = host_port[h]
+            dest = packet[DEST]
+
+            f = None
+            if packet[SOURCE] == h:
+                f = flows_of[h].get(dest)
+
+                if f is not None:
+                    analyze(SEND, f, time, packet, port)
+                    should_create = window[f] > unack[f]
+
+            if not packet[ACK]:
+                link_sent[port].append((time, packet[SIZE]))
+
+                # Arms the retransmission timer of the flow unless already running
+                if f is not None:
+                    length = quantize(timeout(f, delay[port]))
+                    timeouts[f] = length
+
+                    if f not in timers:
+                        arm(f, time + length + slack, packet)
+
+            # Only create an event if currently able to send
+            if should_create:
+                push(time + trans[port][packet[SIZE]], port, CREATE, [None, h, dest, DATA_SIZE, time, False, None, None])
+
+        def host_timeout(time, h, packet):
+            """
+            Handles timeout events of hosts.
+            """
+
+            reset = False
+            should_create = True
+
+            f = flows_of[h].get(packet[DEST])
+
+            if f is not None:
+                reset = analyze(TIMEOUT, f, time, packet, None)
+                should_create = window[f] > unack[f]
+
+                rearm(time, f)
+
+            # Only create an event if currently able to send
+            if reset and should_create:
+                push(time, host_port[h], CREATE, [None, h, packet[DEST], DATA_SIZE, time, False, None, None])
+
+        def router_create(time, r, packet):
+            """
+            Handles create events of routers.
+            """
+
+            dest = packet[DEST]
+
+            next_port = routes[r].get(dest)
+            if next_port is None:
+                raise ValueError, 'port must be specified'
+
+            f = flows_of[r].get(dest)
+
+            if f is not None and (bits[f] is None or bits[f] > 0):
+                prepare(f, packet)
+
+                # Adds routing and cost information to the packet
+                packet[COSTS] = dict([(known, find_cost(r, time, known)) for known in routes[r]])
+
+                enqueue(time, next_port, packet)
+
+        def router_receive(time, r, packet):
+            """
+            Handles receive events of routers.
+            """
+
+            # Forwards a packet destined for another device onward
+            if packet[DEST] != r:
+                next_port = routes[r].get(packet[DEST])
+
+                if next_port is not None:
+                    enqueue(time, next_port, packet)
+
+                return
+
+            dest = packet[SOURCE]
+
+            # Handles a hello acknowledgment
+            if packet[ACK]:
+                f = flows_of[r].get(dest)
+
+                if f is None:
+                    return
+
+                analyze(RECEIVE, f, time, packet, None)
+
+                next_time = time
+
+                if not should_update[r]:
+                    next_time = next_update[r]
+                    next_update[r] += update_every
+
+                should_update[r] = False
+
+                # Sends the next hello to every neighbor
+                for (neighbor, g) in flow_order[r]:
+                    push(next_time, routes[r].get(neighbor), CREATE, [None, r, neighbor, DATA_SIZE, time, False, None, None])
+
+            else:
+                changed = False
+
+                # Updates the routing and cost information if necessary
+                if packet[COSTS] is not None:
+                    changed = update(r, time, packet)
+
+                # Sends an acknowledgment to the source
+                enqueue(time, routes[r].get(dest), [packet[SEQ], r, dest, ACK_SIZE, packet[CREATED], True, None, None])
+
+                should_update[r] |= changed
+
+        def router_send(time, r, port, packet):
+            """
+            Handles the flow of send events of routers, once the packet
+            was forwarded.
+            """
+
+            if packet[SOURCE] == r:
+                f = flows_of[r].get(packet[DEST])
+
+                if f is not None:
+                    analyze(SEND, f, time, packet, port)
+
+            if not packet[ACK]:
+                link_sent[port].append((time, packet[SIZE]))
+
+        for (time, port, action, packet) in self._initial:
+            push(time, port, action, packet)
+
+        for f in xrange(len(owner)):
+            if tracked[f] and not completed(f):
+                incomplete[0] += 1
+
+        done = False
+
+        while True:
+            # Waits for the bounds of the next call
+            (until, max_events, deadline) = yield
+            processed = 0
+
+            # Loops through all events on the queue
+            while (now_queue or heap or timers) and not done:
+                # Stops once the number of events or the time is exhausted
+                if max_events is not None and processed >= max_events:
+                    break
+
+                if (deadline is not None and processed % check_every == 0
+                        and wall_clock() >= deadline):
+                    break
+
+                # Schedules the timers that expire before the head of the heap
+                if timers and not now_queue:
+                    head = None
+                    if heap:
+                        head = heap[0][0]
+
+                    while timer_heap:
+                        (time, seq, f) = timer_heap[0]
+
+                        # Skips over cancelled and re-armed timers
+                        timer = timers.get(f)
+                        if timer is None or timer[2] != seq:
+                            heappop(timer_heap)
+                            continue
+
+                        if head is not None and time >= head:
+                            break
+
+                        heappop(timer_heap)
+                        del timers[f]
+
+                        push(time, host_port[owner[f]], TIMEOUT, timer[1])
+
+                # Stops before the first event at or after the horizon
+                if until is not None:
+                    next_time = now
+                    if not now_queue:
+                        next_time = heap[0][0]
+
+                    if next_time >= until:
+                        break
+
+                # Pops the next event
+                if now_queue:
+                    (port, action, packet) = now_queue.popleft()
+                    time = now
+
+                else:
+                    (time, seq, port, action, packet) = heappop(heap)
+                    now = time
+
+                    # Replaces the head of the channel with the next arrival
+                    if action == ARRIVAL:
+                        channel = channels[port]
+                        channel.popleft()
+
+                        if channel:
+                            heappush(heap, (channel[0], next_seq(), port, ARRIVAL, None))
+
+                        action = RECEIVE
+
+                device = port_device[port]
+
+                if action == RECEIVE:
+                    queue = incoming[port]
+                    sizes = buffer_sizes[peer[port]]
+
+                    sizes.append((time, len(queue)))
+
+                    # Pops the packet off the head of the queue
+                    if queue:
+                        packet = queue.popleft()
+                        in_size[port] -= packet[SIZE]
+
+                        if is_host[device]:
+                            host_receive(time, device, packet)
+                        else:
+                            router_receive(time, device, packet)
+
+                    sizes.append((time, len(queue)))
+
+                elif action == SEND:
+                    dest = peer[port]
+                    queue = incoming[dest]
+                    sizes = buffer_sizes[port]
+
+                    sizes.append((time, len(queue)))
+
+                    # Pops the packet off the head of the queue
+                    if outgoing[port]:
+                        packet = outgoing[port].popleft()
+                        size = packet[SIZE]
+                        out_size[port] -= size
+
+                        # Updates the queueing delay when a packet is sent
+                        queueing_delay[port] = time - packet[ENTERED]
+                        queueing_times[port].append(time)
+                        queueing_delays[port].append(queueing_delay[port])
+
+                        # Forwards the packet onward if there is room
+                        if in_size[dest] + size <= in_max[dest]:
+                            queue.append(packet)
+                            in_size[dest] += size
+
+                            push(time + delay[port], dest, RECEIVE, None)
+
+                        else:
+                            losses[port].append(time + delay[port])
+
+                        if is_host[device]:
+                            host_send(time, device, packet)
+                        else:
+                            router_send(time, device, port, packet)
+
+                    sizes.append((time, len(queue)))
+
+                elif action == CREATE:
+                    if is_host[device]:
+                        host_create(time, device, packet)
+                    else:
+                        router_create(time, device, packet)
+
+                elif action == TIMEOUT:
+                    if is_host[device]:
+                        host_timeout(time, device, packet)
+                    else:
+                        f = flows_of[device].get(packet[DEST])
+
+                        if f is not None:
+                            analyze(TIMEOUT, f, time, packet, None)
+
+                processed += 1
+
+                # Checks for completion once the event has been processed
+                done = num_tracked and not incomplete[0]
+
+            self._now = now
+            self._finished = done or not (now_queue or heap or timers)
+            self._processed += processed
+
+            # Stores the state so that it can be inspected between calls
+            self._store()
+
+    def _store(self):
+        """
+        Stores the compiled state back into the devices, the flows and
+        the trackers.
+        """
+
+        devices = self._devices
+        ports = self._ports
+
+        for (p, link) in enumerate(self._links):
+            tracker = link.getTracker()
+
+            tracker._times_sent = self._link_sent[p]
+            tracker._packet_losses = self._losses[p]
+            tracker._buffer_sizes = self._buffer_sizes[p]
+            tracker._queueing_delay = self._queueing_delay[p]
+            tracker._queueing_delays = zip(self._queueing_times[p], self._queueing_delays[p])
+
+        for (f, flow) in enumerate(self._flows):
+            flow._window_size = self._window[f]
+            flow._num_unack = self._unack[f]
+            flow._num_bits = self._bits[f]
+            flow._curr_seq_num = self._curr_seq[f]
+            flow._unack_packets = self._unack_packets[f]
+            flow._ack_counts = self._ack_counts[f]
+            flow._last_timeout = self._last_timeout[f]
+            flow._last_duplicate = self._last_duplicate[f]
+
+            flow._algorithm._state = self._state[f]
+            flow._algorithm._ssthresh = self._ssthresh[f]
+
+            tracker = flow.getTracker()
+
+            tracker._times_sent = self._flow_sent[f]
+            tracker._times_received = self._received[f]
+            tracker._window_sizes = self._window_sizes[f]
+            tracker._rtts = zip(self._rtt_times[f], self._rtts[f])
+
+        for (d, device) in enumerate(devices):
+            if isinstance(device, Host):
+                device._expected = dict([(devices[source], num)
+                                         for (source, num) in self._expected[d].iteritems()])
+
+                for f in self._flows_of[d].values():
+                    if self._timeouts[f] is not None:
+                        device._timeouts[self._flows[f]] = self._timeouts[f]
+
+            elif isinstance(device, Router):
+                algorithm = device._algorithm
+
+                algorithm._routing_table = dict([(devices[dest], ports[p])
+                                                 for (dest, p) in self._routes[d].iteritems()])
+                algorithm._costs = dict([(devices[dest], cost)
+                                         for (dest, cost) in self._costs[d].iteritems()])
+
+                device._next_update = self._next_update[d]
+                device._should_update = self._should_update[d]
+
+    # Overrides BaseSimulation.push(event)
+    def push(self, event):
+        """
+        Collects the specified initial event of a device.
+        """
+
+        self._initial_events.append(event)
+
+    # Overrides BaseSimulation._initialize()
+    def _initialize(self):
+        """
+        Initializes each device, which pushes its first events, then
+        compiles the simulation and starts its event loop.
+        """
+
+        self._initial_events = []
+
+        for device in self._devices:
+            device.initialize()
+
+        self._compile(self._initial_events)
+
+        self._runner = self._run()
+        self._runner.next()
+
+    # Overrides BaseSimulation._advance(until, max_events, deadline)
+    def _advance(self, until=None, max_events=None, deadline=None):
+        """
+        Resumes the compiled event loop until any of the specified
+        bounds is reached.
+        """
+
+        self._runner.send((until, max_events, deadline))
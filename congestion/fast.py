@@ -1,3 +1,5 @@
+import clock
+
 from algorithm import CongestionAlgorithm
 from flow import Flow
 
@@ -54,8 +56,8 @@ def handle_ack_received(self):
             gamma = self._gamma
             alpha = self._alpha
 
-            min_rtt = self._flow.min_rtt(10) # TODO: somehow get link delay
-            rtt = self._flow.rtt(10) # TODO: somehow get link delay
+            min_rtt = self._flow.min_rtt(clock.ticks(10)) # TODO: somehow get link delay
+            rtt = self._flow.rtt(clock.ticks(10)) # TODO: somehow get link delay
 
             cwnd =  max(min(2 * cwnd, (1 - gamma) * cwnd + gamma * ((float(min_rtt) / float(rtt)) * cwnd + alpha)), 1)
 
@@ -1,5 +1,6 @@
 from math import sqrt
 
+import clock
 from buffer import Buffer
 from device import Device
 from trackers.link import LinkTracker
@@ -122,9 +123,8 @@ def delay(self, delay=None):
         if delay is None:
             return self._delay
 
-        # Checks that delay is a float
-        if not isinstance(delay, float):
-            raise TypeError, 'delay must be a float'
+        # Checks that delay is a number and converts to the time base
+        delay = clock.coerce(delay)
 
         self._delay = delay
         self._tracker.set_delay(delay)
@@ -144,7 +144,7 @@ def cost(self, time):
 
         static_cost = Link._STATIC * self.delay()
 
-        since = time - Link._WINDOW
+        since = time - clock.ticks(Link._WINDOW)
         dynamic_cost = Link._DYNAMIC * self.mean_queuing_delay(since)
 
         return (static_cost + dynamic_cost)
@@ -0,0 +1,312 @@
+"""
+Termination on the statistical convergence of the measured metrics.
+
+A run usually goes on until every flow sent all of its bits, even when
+only the steady state of the network is of interest. Instead, run()
+divides the simulated time into batches and keeps the mean of each
+batch for the rate of each measured flow, and for the buffer occupancy
+and the queueing delay of each measured link.
+
+The first batches are discarded as the warm-up, up to the point that
+minimizes the marginal standard error of the batches left (MSER). The
+rest are grouped into a fixed number of larger batches, whose means
+give a confidence interval for the steady state of each metric. The run
+stops once every interval is narrower than the requested precision,
+relative to its mean.
+"""
+
+from math import sqrt
+from time import time as wall_clock
+
+import clock
+from host import Host
+
+# Default length of a batch, in milliseconds
+_BATCH = 100
+
+# Number of batches that the confidence intervals are computed from
+_BATCHES = 20
+
+# Quantile of Student's t-distribution for a 95% confidence interval
+# with one less degree of freedom than the number of batches
+_T = 2.093
+
+class Series:
+    """
+    Builder for Series instances.
+    """
+
+    def __init__(self, name, records, rate=False, scale=1):
+        """
+        Creates a Series instance with the specified name, which reads
+        the specified list of records of a tracker that start with a
+        time and a value. Each batch averages the values, or sums them
+        over the milliseconds of the batch if rate is specified, and
+        multiplies the result by the specified scale.
+        """
+
+        self.name = name
+
+        self._records = records
+        self._rate = rate
+        self._scale = scale
+
+        # Number of records already read
+        self._read = 0
+
+        # Sums and counts of the records of each batch so far
+        self._sums = []
+        self._counts = []
+
+    def means(self, batch, batches):
+        """
+        Reads the records that arrived since the last call, and returns
+        the means of the specified number of complete batches of the
+        specified length.
+        """
+
+        sums = self._sums
+        counts = self._counts
+
+        # Reads the time and the value at the head of each record
+        for record in self._records[self._read:]:
+            index = int(record[0] // batch)
+
+            while len(sums) <= index:
+                sums.append(0.0)
+                counts.append(0)
+
+            sums[index] += record[1]
+            counts[index] += 1
+
+        self._read = len(self._records)
+
+        while len(sums) < batches:
+            sums.append(0.0)
+            counts.append(0)
+
+        means = []
+        last = 0.0
+
+        for i in xrange(batches):
+            if self._rate:
+                last = self._scale * sums[i] / clock.ms(batch)
+
+            # Carries the last mean over batches without records
+            elif counts[i] > 0:
+                last = self._scale * sums[i] / counts[i]
+
+            means.append(last)
+
+        return means
+
+def warmup(means):
+    """
+    Returns the number of batches at the start of the specified batch
+    means that belong to the warm-up, as the truncation that minimizes
+    the marginal standard error of the rest (MSER).
+    """
+
+    num = len(means)
+
+    best = 0
+    best_error = None
+
+    total = 0.0
+    squares = 0.0
+
+    # Considers truncating at most half of the batches, from the end
+    errors = [None] * (num // 2 + 1)
+
+    for d in xrange(num - 1, -1, -1):
+        total += means[d]
+        squares += means[d] * means[d]
+
+        if d < len(errors):
+            left = num - d
+            errors[d] = (squares - total * total / left) / (left * left)
+
+    for (d, error) in enumerate(errors):
+        if best_error is None or error < best_error:
+            best = d
+            best_error = error
+
+    return best
+
+def interval(means):
+    """
+    Returns the mean of the specified batch means and the half width of
+    its confidence interval, grouping them into as many batches as the
+    intervals are computed from.
+    """
+
+    size = len(means) // _BATCHES
+
+    # Drops the oldest batches that do not fill a group
+    means = means[len(means) - size * _BATCHES:]
+
+    groups = [sum(means[i * size:(i + 1) * size]) / size
+              for i in xrange(_BATCHES)]
+
+    mean = sum(groups) / _BATCHES
+    variance = sum([(group - mean) ** 2 for group in groups]) / (_BATCHES - 1)
+
+    return (mean, _T * sqrt(variance / _BATCHES))
+
+class Convergence:
+    """
+    Builder for Convergence instances.
+    """
+
+    def __init__(self, sim, precision, batch=_BATCH):
+        """
+        Creates a Convergence instance that follows the measured flows
+        and links of the specified simulation in batches of the
+        specified number of milliseconds, until every metric reaches
+        the specified relative precision.
+        """
+
+        # Checks that precision is a number
+        if not isinstance(precision, (int, float)):
+            raise TypeError, 'precision must be a float or an int'
+
+        # Checks that precision is positive
+        elif precision <= 0:
+            raise ValueError, 'precision must be positive'
+
+        # Checks that batch is a number
+        if not isinstance(batch, (int, float)):
+            raise TypeError, 'batch must be a float or an int'
+
+        # Checks that batch is positive
+        elif batch <= 0:
+            raise ValueError, 'batch must be positive'
+
+        self._precision = precision
+        self._batch = batch
+
+        # Waits for every flow to start before checking
+        self._start = 0
+
+        for device in sim._devices:
+            if isinstance(device, Host):
+                for flow in device.get_flows().values():
+                    self._start = max(self._start, clock.ms(flow.start()))
+
+        self._series = []
+
+        for (name, flow) in sorted(sim._measure_flows.items()):
+            tracker = flow.getTracker()
+            self._series.append(Series('%s flow rate' % name, tracker._times_sent, True))
+
+        for (name, link) in sorted(sim._measure_links.items()):
+            tracker = link.getTracker()
+            self._series.append(Series('%s buffer occupancy' % name, tracker._buffer_sizes))
+            self._series.append(Series('%s queueing delay' % name, tracker._queueing_delays, scale=clock.ms(1)))
+
+        # Milliseconds of warm-up and estimate of each metric, once every
+        # metric converged
+        self.warm_up = None
+        self.estimates = None
+
+    def check(self, now):
+        """
+        Returns True if every metric converged by the specified time in
+        milliseconds, and False otherwise.
+        """
+
+        batches = int(now // self._batch)
+
+        # Checks that the run is long enough for any interval
+        if batches < 2 * _BATCHES or now < self._start or not self._series:
+            return False
+
+        length = clock.ticks(self._batch)
+
+        series_means = [series.means(length, batches) for series in self._series]
+
+        # Discards the longest warm-up among the metrics
+        start = max([warmup(means) for means in series_means])
+
+        if batches - start < _BATCHES:
+            return False
+
+        estimates = []
+
+        for (series, means) in zip(self._series, series_means):
+            (mean, half_width) = interval(means[start:])
+
+            if half_width > self._precision * abs(mean):
+                return False
+
+            estimates.append((series.name, mean, half_width))
+
+        self.warm_up = start * self._batch
+        self.estimates = estimates
+
+        return True
+
+    def report(self):
+        """
+        Returns the lines that report the warm-up and the estimate of
+        each metric.
+        """
+
+        lines = ['warm-up %s' % self.warm_up]
+
+        for (name, mean, half_width) in self.estimates:
+            lines.append('%s %s +/- %s' % (name, mean, half_width))
+
+        return lines
+
+def run(sim, precision, batch=_BATCH, until=None, max_events=None, max_seconds=None):
+    """
+    Runs the specified simulation until every measured metric converged
+    to the specified relative precision, checking after every batch of
+    the specified number of milliseconds, or until completion or any of
+    the specified bounds, whichever comes first.
+
+    Returns the Convergence instance, which holds the estimates if the
+    metrics converged.
+    """
+
+    convergence = Convergence(sim, precision, batch)
+
+    deadline = None
+    if max_seconds is not None:
+        deadline = wall_clock() + max_seconds
+
+    processed = sim.processed()
+    horizon = sim.now()
+
+    while True:
+        horizon += batch
+
+        bound = horizon
+        if until is not None:
+            bound = min(bound, until)
+
+        remaining = None
+        if max_events is not None:
+            remaining = max_events - (sim.processed() - processed)
+
+        seconds = None
+        if deadline is not None:
+            seconds = deadline - wall_clock()
+
+        finished = sim.run(bound, remaining, seconds)
+
+        if convergence.check(bound):
+            break
+
+        # Stops at completion or at any of the bounds
+        if finished or bound < horizon:
+            break
+
+        if remaining is not None and sim.processed() - processed >= max_events:
+            break
+
+        if deadline is not None and wall_clock() >= deadline:
+            break
+
+    return convergence
@@ -0,0 +1,240 @@
+#!/usr/bin/python
+
+"""
+Daemon keeping warm worker processes that run simulations.
+
+The daemon imports the simulator once, including numpy and matplotlib,
+then forks a pool of workers that wait for requests on a Unix socket.
+Each request carries a configuration and the arguments of setup.py,
+and is answered with the output of the run. A worker serves a single
+request and exits, and the daemon forks a new one in its place, so
+that runs never share state while still skipping the startup of the
+interpreter and the imports.
+
+The per-packet trace is discarded, and the datafiles are written to
+the directory of the client.
+"""
+
+import errno
+import os
+import signal
+import socket
+import stat
+import sys
+import tempfile
+import traceback
+from cStringIO import StringIO
+from multiprocessing import cpu_count
+
+import client
+import setup
+
+def _check(message):
+    """
+    Checks the specified request, and returns its directory, its
+    configuration and its arguments.
+    """
+
+    # Checks that the request holds a directory, a configuration and
+    # the arguments
+    if not isinstance(message, list) or len(message) != 3:
+        raise TypeError, 'request must be a list of three items'
+
+    (cwd, text, args) = message
+
+    # Checks that cwd is a string
+    if not isinstance(cwd, str):
+        raise TypeError, 'directory must be a string'
+
+    # Checks that cwd is an existing absolute directory
+    elif not os.path.isabs(cwd) or not os.path.isdir(cwd):
+        raise ValueError, 'directory must be an existing absolute path'
+
+    # Checks that text is a string
+    if not isinstance(text, str):
+        raise TypeError, 'configuration must be a string'
+
+    # Checks that args is a list of strings
+    if not isinstance(args, list) or not all([isinstance(arg, str) for arg in args]):
+        raise TypeError, 'arguments must be a list of strings'
+
+    return (cwd, text, args)
+
+def _serve(listener):
+    """
+    Answers the next request on the specified listening socket.
+    """
+
+    (connection, address) = listener.accept()
+    listener.close()
+
+    try:
+        try:
+            (cwd, text, args) = _check(client.receive(connection))
+
+        except (TypeError, ValueError):
+            client.send(connection, ('', traceback.format_exc()))
+            return
+
+        (handle, path) = tempfile.mkstemp(suffix='.cfg')
+        os.write(handle, text)
+        os.close(handle)
+
+        output = StringIO()
+        sys.stdout = output
+
+        error = None
+
+        try:
+            os.chdir(cwd)
+            setup.main([path] + args)
+
+        except Exception:
+            error = traceback.format_exc()
+
+        finally:
+            sys.stdout = sys.__stdout__
+            os.remove(path)
+
+        client.send(connection, (output.getvalue(), error))
+
+    finally:
+        connection.close()
+
+def _spawn(listener):
+    """
+    Forks a worker answering the next request on the specified
+    listening socket, and returns its process id.
+    """
+
+    pid = os.fork()
+
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        # Discards the per-packet trace and any stray output
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+
+        try:
+            _serve(listener)
+        finally:
+            os._exit(0)
+
+    return pid
+
+def _terminate(signum, frame):
+    """
+    Stops the daemon on the specified signal.
+    """
+
+    sys.exit(0)
+
+def _in_use(path):
+    """
+    Returns True if a daemon answers on the socket of the specified
+    path, and False if the path is free or holds a socket left behind
+    by a daemon that was killed.
+    """
+
+    if not os.path.exists(path):
+        return False
+
+    # Keeps any file that is not a socket
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        return True
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        probe.connect(path)
+
+    except socket.error, error:
+        # Checks that nothing listens on the socket
+        if error.errno == errno.ECONNREFUSED:
+            return False
+
+        return True
+
+    finally:
+        probe.close()
+
+    return True
+
+def serve(path=None, processes=None):
+    """
+    Listens on the socket of the specified path and answers requests
+    with at most the specified number of workers at once, until
+    interrupted.
+
+    The socket is only accessible to the user running the daemon.
+    """
+
+    if path is None:
+        path = client.default_socket()
+
+    # Defaults to one worker per processor
+    if processes is None:
+        processes = cpu_count()
+
+    # Checks that processes is an int
+    if not isinstance(processes, int):
+        raise TypeError, 'number of processes must be an int'
+
+    # Checks that processes is positive
+    elif processes <= 0:
+        raise ValueError, 'number of processes must be positive'
+
+    # Checks that no other daemon uses the path
+    if _in_use(path):
+        raise ValueError, 'socket path is already in use'
+
+    # Only shows the socket once it listens, so that clients never
+    # find it refusing connections, replacing any socket left behind by
+    # a daemon that was killed
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # Creates the socket without access for other users
+    umask = os.umask(0177)
+
+    try:
+        listener.bind(path + '.%d' % os.getpid())
+    finally:
+        os.umask(umask)
+
+    listener.listen(64)
+
+    os.rename(path + '.%d' % os.getpid(), path)
+
+    signal.signal(signal.SIGTERM, _terminate)
+
+    workers = set()
+
+    try:
+        while True:
+            while len(workers) < processes:
+                workers.add(_spawn(listener))
+
+            (pid, status) = os.wait()
+            workers.discard(pid)
+
+    finally:
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+        listener.close()
+        os.remove(path)
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {}
+
+    for arg in args:
+        if arg.startswith('--socket='):
+            options['path'] = arg[len('--socket='):]
+
+        elif arg.startswith('--processes='):
+            options['processes'] = int(arg[len('--processes='):])
+
+    serve(**options)
@@ -14,6 +14,19 @@ def __init__(self, name):
 
         self._id = name
 
+        self._timers = None
+
+        self._queue = None
+        self._push = None
+
+    def __hash__(self):
+        """
+        Hashes the device by its name, so that the tables keyed by
+        devices are iterated in the same order from one run to the next.
+        """
+
+        return hash(self._id)
+
     def __str__(self):
         """
         Defines the pretty print representation for a Device instance.
@@ -30,6 +43,32 @@ def __repr__(self):
                 'id=%s'
                 ']') % (self._id)
 
+    def timers(self, timers=None):
+        """
+        timers()       -> returns the timer wheel
+
+        timers(timers) -> sets the timer wheel as the specified value
+        """
+
+        if timers is None:
+            return self._timers
+
+        self._timers = timers
+
+    def queue(self, queue=None):
+        """
+        queue()      -> returns the event queue
+
+        queue(queue) -> sets the event queue as the specified value,
+                        which spawned events are pushed into directly
+        """
+
+        if queue is None:
+            return self._queue
+
+        self._queue = queue
+        self._push = queue.push
+
     def enable(self, port):
         """
         Enables the device to use the specified port. Implemented in
@@ -40,14 +79,23 @@ def enable(self, port):
 
     def initialize(self):
         """
-        Initializes the device. Implemented in each subclass.
+        Initializes the device by pushing its first events. Implemented
+        in each subclass.
         """
 
         raise NotImplementedError, 'Device.initialize()'
 
+    def handlers(self):
+        """
+        Returns the handlers of the device, indexed by action code.
+        Implemented in each subclass.
+        """
+
+        raise NotImplementedError, 'Device.handlers()'
+
     def process(self, event):
         """
-        Processes the specified event. Implemented in each subclass.
+        Processes the specified event.
         """
-        
-        raise NotImplementedError, 'Device.process(event)'
+
+        self.handlers()[event.action()](event)
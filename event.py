@@ -1,15 +1,24 @@
+import clock
+
 from conn import Port
 from packet import Packet
 
-class Event:
+class Event(object):
     """
     Builder for Event instances.
     """
 
-    _CREATE = 'create'
-    _RECEIVE = 'receive'
-    _SEND = 'send'
-    _TIMEOUT = 'timeout'
+    __slots__ = ('_scheduled_time', '_port', '_action', '_packet', '_sequence')
+
+    _CREATE = 0
+    _RECEIVE = 1
+    _SEND = 2
+    _TIMEOUT = 3
+
+    # Action of an event released to the pool
+    _RELEASED = -1
+
+    _NAMES = ('create', 'receive', 'send', 'timeout')
 
     def __init__(self):
         """
@@ -22,13 +31,18 @@ def __init__(self):
         self._action = None
         self._packet = None
 
+        # Order of the push that put the event on the scheduler, which
+        # breaks ties between events of the same time
+        self._sequence = None
+
     def __lt__(self, other):
         """
         Defines the condition for when an Event instance is less than
         another.
         """
 
-        return (self.scheduled() < other.scheduled())
+        return ((self._scheduled_time, self._sequence)
+                < (other._scheduled_time, other._sequence))
 
     def __le__(self, other):
         """
@@ -44,10 +58,10 @@ def __eq__(self, other):
         another.
         """
 
-        return (self.scheduled() == other.scheduled()
-                and self.port() == other.port()
-                and self.action() == other.action()
-                and self.packet() == other.packet())
+        return (self._scheduled_time == other._scheduled_time
+                and self._port is other._port
+                and self._action == other._action
+                and self._packet is other._packet)
 
     def __ne__(self, other):
         """
@@ -63,7 +77,8 @@ def __gt__(self, other):
         than another.
         """
 
-        return (self.scheduled() > other.scheduled())
+        return ((self._scheduled_time, self._sequence)
+                > (other._scheduled_time, other._sequence))
 
     def __ge__(self, other):
         """
@@ -82,7 +97,7 @@ def __repr__(self):
                 'schedule=%s, '
                 'port=%s, '
                 'action=%s'
-                ']') % (self.scheduled(), self.port(), self.action())
+                ']') % (self.scheduled(), self.port(), Event._NAMES[self.action()])
 
     def scheduled(self, time=None):
         """
@@ -93,15 +108,14 @@ def scheduled(self, time=None):
         """
 
         if time is None:
-            return self._scheduled_time
+            # Checks that the event was not released to the pool
+            if self._action == Event._RELEASED:
+                raise ValueError, 'event was released once processed'
 
-        # Checks whether time is an int and converts to float
-        if isinstance(time, int):
-            time = float(time)
+            return self._scheduled_time
 
-        # Checks that time is a float
-        if not isinstance(time, float):
-            raise TypeError, 'time must be a float'
+        # Checks that time is a number and converts to the time base
+        time = clock.coerce(time)
 
         self._scheduled_time = time
 
@@ -113,6 +127,10 @@ def port(self, port=None):
         """
 
         if port is None:
+            # Checks that the event was not released to the pool
+            if self._action == Event._RELEASED:
+                raise ValueError, 'event was released once processed'
+
             return self._port
 
         # Checks that port is a Port instance
@@ -129,11 +147,19 @@ def action(self, action=None):
         """
 
         if action is None:
+            # Checks that the event was not released to the pool
+            if self._action == Event._RELEASED:
+                raise ValueError, 'event was released once processed'
+
             return self._action
 
-        # Checks that action is a string
-        if not isinstance(action, str):
-            raise TypeError, 'action must be a string'
+        # Checks that action is an int
+        if not isinstance(action, int):
+            raise TypeError, 'action must be an int'
+
+        # Checks that action is a known action code
+        elif not 0 <= action < len(Event._NAMES):
+            raise ValueError, 'action must be a known action code'
 
         self._action = action
 
@@ -145,6 +171,10 @@ def packet(self, packet=None):
         """
 
         if packet is None:
+            # Checks that the event was not released to the pool
+            if self._action == Event._RELEASED:
+                raise ValueError, 'event was released once processed'
+
             return self._packet
 
         # Checks that packet is a Packet instance
@@ -152,3 +182,71 @@ def packet(self, packet=None):
             raise TypeError, 'packet must be a Packet instance'
 
         self._packet = packet
+
+class EventPool:
+    """
+    Free list of processed Event instances.
+
+    A released event is handed out again by the next create(), so no
+    reference to an event may be kept once it was processed. In strict
+    mode, reading a released event raises a ValueError until it is
+    reused.
+    """
+
+    _MAX_SIZE = 4096
+
+    def __init__(self):
+        """
+        Creates an empty EventPool instance.
+        """
+
+        self._free = []
+
+    def __len__(self):
+        """
+        Returns the number of free Event instances.
+        """
+
+        return len(self._free)
+
+    def create(self, time, port, action, packet):
+        """
+        Returns an Event instance with the specified time, port, action
+        and packet, reusing a released instance when one is free.
+
+        The time is converted to the time base, and the other fields
+        are set without validation, so callers must pass a Port, an
+        action code and a Packet.
+        """
+
+        if self._free:
+            event = self._free.pop()
+        else:
+            event = Event()
+
+        event._scheduled_time = clock.coerce(time)
+        event._port = port
+        event._action = action
+        event._packet = packet
+        event._sequence = None
+
+        return event
+
+    def release(self, event):
+        """
+        Returns the specified processed event to the free list, after
+        which it must not be used.
+        """
+
+        # Marks the event so that the strict accessors reject it
+        event._action = Event._RELEASED
+
+        if len(self._free) < EventPool._MAX_SIZE:
+            # Drops the references held by the event
+            event._port = None
+            event._packet = None
+
+            self._free.append(event)
+
+# Pool shared by every device
+POOL = EventPool()
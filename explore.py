@@ -0,0 +1,397 @@
+#!/usr/bin/python
+
+"""
+Sweeps of a configuration over ranges of its parameters.
+
+The ranges are expanded into one configuration per combination of
+values, and each configuration is run to completion in a pool of
+processes. A summary of each run is appended to a tab-separated result
+table as soon as the run ends, and a failed run only fails its own row.
+Running the same sweep again with the same table skips the runs that
+already succeeded, so that an interrupted sweep can be resumed.
+"""
+
+import csv
+import os
+import traceback
+from itertools import product
+from multiprocessing import Pool, cpu_count
+from sys import argv
+
+import clock
+from compiled import CompiledSimulation
+from setup import Setup
+from simulation import Simulation
+
+# Section and field of each parameter in a configuration, and its type
+_PARAMETERS = {'rate':      ('# Connections', 3, int),
+               'delay':     ('# Connections', 4, float),
+               'buffer':    ('# Connections', 5, int),
+               'size':      ('# Flows',       3, int),
+               'start':     ('# Flows',       4, float),
+               'algorithm': ('# Flows',       5, str)}
+
+_OK = 'ok'
+_FAILED = 'failed'
+
+def _values(text, cast):
+    """
+    Returns the list of values of the specified type given by the
+    specified text, which separates values by commas. A numeric value
+    may also be a range written as first:last:step.
+    """
+
+    values = []
+
+    for item in text.split(','):
+        if cast is not str and ':' in item:
+            (first, last, step) = [cast(bound) for bound in item.split(':')]
+
+            # Checks that step is positive
+            if step <= 0:
+                raise ValueError, 'step must be positive'
+
+            # Steps by multiples so that float steps do not accumulate
+            # rounding errors
+            count = 0
+            while first + count * step <= last + step * 1e-9:
+                values.append(first + count * step)
+                count += 1
+
+        else:
+            values.append(cast(item))
+
+    return values
+
+def parse_range(parameter, text):
+    """
+    Returns the name of the connection or flow and the values of the
+    specified parameter given by the specified text, written as
+    name=values. The name * stands for every connection or flow.
+    """
+
+    # Checks that the parameter exists
+    if parameter not in _PARAMETERS:
+        raise ValueError, 'unknown parameter %s' % parameter
+
+    (name, values) = text.split('=', 1)
+
+    return (parameter, name, _values(values, _PARAMETERS[parameter][2]))
+
+def expand(filename, ranges):
+    """
+    Returns the values and the lines of the configuration of each run
+    of the sweep of the specified configuration file over the specified
+    ranges of parameters, in order.
+    """
+
+    lines = [line.strip() for line in open(filename, 'r')]
+
+    # Maps each line to its section
+    sections = []
+    section = None
+
+    for line in lines:
+        if line.startswith('#'):
+            section = line
+
+        sections.append(section)
+
+    # Checks that each range names a connection or flow
+    for (parameter, name, values) in ranges:
+        (target, field, cast) = _PARAMETERS[parameter]
+
+        if name != '*' and not [line for (line, section) in zip(lines, sections)
+                                if section == target and line.split(', ')[0] == name]:
+            raise ValueError, 'no %s named %s' % (target[2:-1].lower(), name)
+
+    runs = []
+
+    for combination in product(*[values for (parameter, name, values) in ranges]):
+        changed = list(lines)
+
+        for ((parameter, name, values), value) in zip(ranges, combination):
+            (target, field, cast) = _PARAMETERS[parameter]
+
+            for (i, line) in enumerate(changed):
+                fields = line.split(', ')
+
+                if (sections[i] == target and not line.startswith('#')
+                        and len(fields) > field and name in ('*', fields[0])):
+                    fields[field] = str(value)
+                    changed[i] = ', '.join(fields)
+
+        runs.append((combination, changed))
+
+    return runs
+
+def columns(filename, ranges):
+    """
+    Returns the columns of the result table of the sweep of the
+    specified configuration file over the specified ranges.
+    """
+
+    config = Setup(filename)
+
+    header = ['run']
+    header.extend(['%s:%s' % (parameter, name) for (parameter, name, values) in ranges])
+    header.extend(['status', 'events', 'time'])
+    header.extend(['throughput:%s' % name for name in sorted(config.flows)])
+
+    for name in sorted(config.links):
+        header.extend(['buffer:%s' % name, 'queueing:%s' % name])
+
+    header.append('error')
+
+    return header
+
+def _mean(values):
+    """
+    Returns the mean of the specified values, or None if there is none.
+    """
+
+    if not values:
+        return None
+
+    return float(sum(values)) / len(values)
+
+def _summary(sim):
+    """
+    Returns the average throughput of each measured flow, then the
+    average buffer occupancy and queueing delay of each measured link
+    of the specified simulation.
+    """
+
+    summary = []
+
+    for name in sorted(sim._measure_flows):
+        tracker = sim._measure_flows[name].getTracker()
+
+        rates = []
+        if tracker._times_sent:
+            rates = [rate for (time, rate) in tracker.get_flow_rate_data()]
+
+        summary.append(_mean(rates))
+
+    for name in sorted(sim._measure_links):
+        tracker = sim._measure_links[name].getTracker()
+
+        sizes = [size for (time, size) in tracker.get_buffer_occupancy_data()]
+
+        summary.append(_mean(sizes))
+        summary.append(tracker.get_average_queueing_delay(0))
+
+    return summary
+
+def _silence():
+    """
+    Discards the output of a worker process, including the per-packet
+    trace.
+    """
+
+    devnull = os.open(os.devnull, os.O_WRONLY)
+
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+def _run(task):
+    """
+    Runs the specified task of the sweep, and returns its index and
+    its status, number of events, time, summary and error.
+    """
+
+    (i, filename, engine, trusted, bounds) = task
+
+    try:
+        config = Setup(filename)
+
+        sim = engine(config.devices, config.flows, config.links, trusted=trusted)
+        sim.run(**bounds)
+        sim._rescale()
+
+        return (i, _OK, sim.processed(), sim.now(), _summary(sim), None)
+
+    except Exception:
+        error = traceback.format_exc().strip().splitlines()[-1]
+
+        return (i, _FAILED, None, None, None, error)
+
+def _format(value):
+    """
+    Returns the specified value as written to the result table.
+    """
+
+    if value is None:
+        return ''
+
+    return str(value)
+
+def _completed(results, header):
+    """
+    Returns the rows of the specified result table whose run succeeded,
+    after checking that the table has the specified columns.
+    """
+
+    if not os.path.exists(results):
+        return []
+
+    infile = open(results, 'rb')
+    rows = list(csv.reader(infile, delimiter='\t'))
+    infile.close()
+
+    # Checks that the table was written by the same sweep
+    if rows and rows[0] != header:
+        raise ValueError, 'result table was written by another sweep'
+
+    status = header.index('status')
+
+    return [row for row in rows[1:] if len(row) == len(header) and row[status] == _OK]
+
+def sweep(filename, ranges, results, engine=Simulation, trusted=False,
+          bounds=None, processes=None):
+    """
+    Runs every combination of the specified ranges of parameters of
+    the specified configuration file with the specified engine, in at
+    most the specified number of processes at once, and writes a row
+    of the specified result table for each run as soon as it ends.
+
+    The runs that already succeeded in the result table are skipped.
+    Returns the number of failed runs.
+    """
+
+    if bounds is None:
+        bounds = {}
+
+    # Defaults to one process per processor
+    if processes is None:
+        processes = cpu_count()
+
+    # Checks that processes is an int
+    if not isinstance(processes, int):
+        raise TypeError, 'number of processes must be an int'
+
+    # Checks that processes is positive
+    elif processes <= 0:
+        raise ValueError, 'number of processes must be positive'
+
+    header = columns(filename, ranges)
+    runs = expand(filename, ranges)
+
+    completed = _completed(results, header)
+    done = set([tuple(row[1:len(ranges) + 1]) for row in completed])
+
+    # Rewrites the table with the runs that succeeded
+    outfile = open(results, 'wb')
+    writer = csv.writer(outfile, delimiter='\t', lineterminator='\n')
+
+    writer.writerow(header)
+    writer.writerows(completed)
+    outfile.flush()
+
+    # Writes the configuration of each run left next to the table
+    directory = results + '.runs'
+    if not os.path.isdir(directory):
+        os.mkdir(directory)
+
+    tasks = []
+    values = {}
+
+    for (i, (combination, lines)) in enumerate(runs):
+        key = tuple([_format(value) for value in combination])
+        if key in done:
+            continue
+
+        path = os.path.join(directory, '%d.cfg' % i)
+
+        config = open(path, 'w')
+        config.write('\n'.join(lines) + '\n')
+        config.close()
+
+        tasks.append((i, path, engine, trusted, bounds))
+        values[i] = list(key)
+
+    failures = 0
+
+    pool = Pool(processes, _silence)
+
+    try:
+        replies = pool.imap_unordered(_run, tasks)
+
+        for (n, (i, status, events, now, summary, error)) in enumerate(replies):
+            # Leaves the metrics of a failed run empty
+            if status == _FAILED:
+                summary = [None] * (len(header) - len(values[i]) - 5)
+                failures += 1
+
+            row = [i] + values[i] + [status, events, now] + summary + [error]
+
+            writer.writerow([_format(value) for value in row])
+            outfile.flush()
+
+            print 'run %d (%d of %d) %s' % (i, n + 1, len(tasks), status)
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+        outfile.close()
+
+    return failures
+
+if __name__ == '__main__':
+    args = argv[1:]
+
+    # Uses integer nanosecond ticks as the time base, if specified
+    if '--ticks' in args:
+        args.remove('--ticks')
+        clock.use_ticks(clock.NS_PER_MS)
+
+    # Skips the checks of the accessors on the hot path, if specified
+    trusted = False
+
+    if '--trusted' in args:
+        args.remove('--trusted')
+        trusted = True
+
+    # Runs the compiled engine instead of the devices, if specified
+    engine = Simulation
+
+    if '--compiled' in args:
+        args.remove('--compiled')
+        engine = CompiledSimulation
+
+    # Bounds each run by simulated time, events or wall-clock time,
+    # if specified
+    bounds = {}
+    ranges = []
+    options = {}
+
+    for arg in list(args):
+        for (option, name, cast) in [('--until=', 'until', float),
+                                     ('--max-events=', 'max_events', int),
+                                     ('--max-seconds=', 'max_seconds', float)]:
+            if arg.startswith(option):
+                args.remove(arg)
+                bounds[name] = cast(arg[len(option):])
+
+        # Reads the ranges of the parameters, in the order given
+        if arg.startswith('--') and '=' in arg and arg[2:arg.index('=')] in _PARAMETERS:
+            args.remove(arg)
+            (parameter, text) = arg[2:].split('=', 1)
+            ranges.append(parse_range(parameter, text))
+
+        if arg.startswith('--results='):
+            args.remove(arg)
+            options['results'] = arg[len('--results='):]
+
+        if arg.startswith('--processes='):
+            args.remove(arg)
+            options['processes'] = int(arg[len('--processes='):])
+
+    filename = args[0]
+
+    failures = sweep(filename, ranges, options.get('results', 'results.tsv'),
+                     engine, trusted, bounds, options.get('processes'))
+
+    if failures:
+        print '%d runs failed' % failures
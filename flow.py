@@ -1,5 +1,6 @@
 from math import sqrt
 
+import clock
 from device import Device
 from event import Event
 from packet import Packet
@@ -25,10 +26,13 @@ def __init__(self, algorithm, window_size=1):
         #     raise TypeError, 'algorithm must be a CongestionAlgorithm instance'
 
         self._algorithm = algorithm
+
+        self._num_bits = None
+        self._observer = None
+
         self.window(window_size)
         self.unack(0)
 
-        self._num_bits = None
         self._start_time = None
         self._dest_device = None
 
@@ -37,8 +41,8 @@ def __init__(self, algorithm, window_size=1):
 
         self._ack_counts = {}
 
-        self._last_timeout = -Flow._MARGIN
-        self._last_duplicate = -Flow._MARGIN
+        self._last_timeout = -clock.ticks(Flow._MARGIN)
+        self._last_duplicate = -clock.ticks(Flow._MARGIN)
 
         self._tracker = FlowTracker()
 
@@ -96,6 +100,39 @@ def has_data(self):
 
         return (num_bits is None or num_bits > 0)
 
+    def is_complete(self):
+        """
+        Returns True if every bit of the flow was sent and acknowledged,
+        and False otherwise.
+        """
+
+        return (not self.has_data() and self._num_unack == 0)
+
+    def _notify(self, complete):
+        """
+        Notifies the observer if the completion of the flow changed from
+        the specified value.
+        """
+
+        if self._observer is None or self.is_complete() == complete:
+            return
+
+        if complete:
+            self._observer.flow_resumed(self)
+        else:
+            self._observer.flow_completed(self)
+
+    def oldest_unack(self):
+        """
+        Returns the sequence number of the oldest unacknowledged packet,
+        or None if every packet was acknowledged.
+        """
+
+        if not self._unack_packets:
+            return None
+
+        return self._unack_packets[0]
+
     def next_seq(self):
         """
         """
@@ -152,37 +189,13 @@ def analyze(self, event, link):
         windowsize = self.window()
         self._tracker.record_windowsize(time, windowsize)
 
-        if action == Event._SEND and not packet.has_datum(Packet._ACK):
+        if action == Event._SEND and not packet.ack():
             self._tracker.record_sent(time, packet.size(), link.delay())
 
             self._unack_packets.append(packet.seq())
 
-        elif action == Event._RECEIVE and packet.has_datum(Packet._ACK):
-            seq_num = packet.seq()
-
-            if seq_num in self._unack_packets:
-                self._tracker.record_received(time)
-
-                self._algorithm.handle_ack_received()
-
-                self._unack_packets.remove(seq_num)
-            else:
-                num_acks = self._ack_counts.get(seq_num, 0) + 1
-                self._ack_counts[seq_num] = num_acks
-
-                if num_acks == Flow._NUM_DUPLICATES:
-                    # Handles 3 duplicate acknowledgments received
-                    if time > (self._last_duplicate + Flow._MARGIN):
-                        print '[ATTN] [%.3f] 3 duplicate acks in %s' % (time, self._algorithm.state())
-
-                        self._algorithm.handle_duplicate_acks(Flow._NUM_DUPLICATES)
-
-                        self._last_duplicate = time
-
-                    self._unack_packets = []
-                    self._curr_seq_num = seq_num - 1
-
-                    reset = True
+        elif action == Event._RECEIVE and packet.ack():
+            reset = self._acknowledge(time, packet.seq())
 
             # if it's receiving an ack packet, record the round trip time 
             # for that packet
@@ -193,8 +206,8 @@ def analyze(self, event, link):
             if seq_num in self._unack_packets:
                 self._unack_packets.remove(seq_num)
 
-                if time > (self._last_timeout + Flow._MARGIN):
-                    print '[ATTN] [%.3f] timeout in %s' % (time, self._algorithm.state())
+                if time > (self._last_timeout + clock.ticks(Flow._MARGIN)):
+                    print '[ATTN] [%.3f] timeout in %s' % (clock.ms(time), self._algorithm.state())
 
                     self._algorithm.handle_timeout()
 
@@ -216,6 +229,41 @@ def analyze(self, event, link):
 
         return reset
         
+    def _acknowledge(self, time, seq_num):
+        """
+        Handles the acknowledgment of the specified sequence number
+        received at the specified time. Returns True if the flow was
+        reset by duplicate acknowledgments, and False otherwise.
+        """
+
+        reset = False
+
+        if seq_num in self._unack_packets:
+            self._tracker.record_received(time)
+
+            self._algorithm.handle_ack_received()
+
+            self._unack_packets.remove(seq_num)
+        else:
+            num_acks = self._ack_counts.get(seq_num, 0) + 1
+            self._ack_counts[seq_num] = num_acks
+
+            if num_acks == Flow._NUM_DUPLICATES:
+                # Handles 3 duplicate acknowledgments received
+                if time > (self._last_duplicate + clock.ticks(Flow._MARGIN)):
+                    print '[ATTN] [%.3f] 3 duplicate acks in %s' % (clock.ms(time), self._algorithm.state())
+
+                    self._algorithm.handle_duplicate_acks(Flow._NUM_DUPLICATES)
+
+                    self._last_duplicate = time
+
+                self._unack_packets = []
+                self._curr_seq_num = seq_num - 1
+
+                reset = True
+
+        return reset
+
     def prepare(self, packet):
         """
         Prepares the specified packet for sending.
@@ -273,7 +321,9 @@ def unack(self, num=None):
         elif num < 0:
             raise ValueError, 'number of unacknowledged packets must be nonnegative'
 
+        complete = self.is_complete()
         self._num_unack = num
+        self._notify(complete)
     
     def bits(self, num=None):
         """
@@ -293,7 +343,22 @@ def bits(self, num=None):
         elif num < 0:
             raise ValueError, 'number of bits must be nonnegative'
 
+        complete = self.is_complete()
         self._num_bits = num
+        self._notify(complete)
+
+    def observer(self, observer=None):
+        """
+        observer()         -> returns the observer notified when the flow
+                              completes or resumes
+
+        observer(observer) -> sets the observer as the specified value
+        """
+
+        if observer is None:
+            return self._observer
+
+        self._observer = observer
 
     def start(self, time=None):
         """
@@ -305,13 +370,8 @@ def start(self, time=None):
         if time is None:
             return self._start_time
 
-        # Checks whether time is an int and converts to a float
-        if isinstance(time, int):
-            time = float(time)
-
-        # Checks that time is a float
-        if not isinstance(time, float):
-            raise TypeError, 'scheduled time must be a float'
+        # Checks that time is a number and converts to the time base
+        time = clock.coerce(time)
 
         self._start_time = time
 
@@ -0,0 +1,406 @@
+"""
+Fluid model of the whole network.
+
+FluidSimulation estimates the equilibrium of a configuration in
+seconds, without any packet. The flows follow the shortest routes by
+delay, which the Bellman-Ford routing converges to when the links are
+not loaded, and are gathered in a routing matrix with a row per link
+and a column per flow. The windows of the flows and the queues of the
+links then evolve as ordinary differential equations, integrated over
+all the flows and links at once with NumPy:
+
+    x = min(w / T, a)                   sending rate of each flow
+    y = R x                             arrival rate at each link, where
+                                        each link passes on at most c
+    db/dt = y - c                       queue of each link, within its buffer
+    T = d + R' (b / c)                  round trip time of each flow
+
+where the links drop what arrives once their buffer is full. Every
+acknowledgment updates the window as the congestion algorithm does,
+and every loss decreases it as in the fluid model of TCP Reno. Over a
+step, the updates of the acknowledgments are applied in closed form,
+so that the windows stay stable however large the step.
+
+Once the run ends, the solution is stored in the trackers in the same
+form as the packets would have left it, so that the graphs of both
+engines can be compared directly. As with the packets, the buffer
+occupancy counts the packets on the wire, while the queue shows in the
+queueing delay.
+"""
+
+from heapq import heappush, heappop
+from time import time as wall_clock
+
+import numpy
+
+import clock
+from congestion.aimd import AIMD
+from congestion.fast import FAST
+from host import Host
+from packet import Packet
+from router import Router
+from simulation import BaseSimulation
+
+# Default length of a step of the integration, in milliseconds
+_STEP = 1
+
+class FluidSimulation(BaseSimulation):
+    """
+    Simulation that integrates a fluid model of the network.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler=None,
+                 trusted=False, step=_STEP):
+        """
+        Creates a FluidSimulation instance with the specified list of
+        devices, integrated in steps of the specified number of
+        milliseconds.
+
+        The fluid has no events, so the specified scheduler is only
+        used to check the arguments.
+        """
+
+        BaseSimulation.__init__(self, devices, measure_flows, measure_links,
+                            scheduler, trusted)
+
+        # Checks that step is a number
+        if not isinstance(step, (int, float)):
+            raise TypeError, 'step must be a float or an int'
+
+        # Checks that step is positive
+        elif step <= 0:
+            raise ValueError, 'step must be positive'
+
+        self._step = float(step)
+
+    def _ports_of(self, device):
+        """
+        Returns the list of ports of the specified device.
+        """
+
+        ports = device.get_ports()
+        if isinstance(device, Host):
+            ports = [ports]
+
+        return ports
+
+    def _route(self, source, dest):
+        """
+        Returns the list of links along the route of least delay from
+        the specified host to the specified device, through routers
+        only.
+        """
+
+        delays = {source: 0}
+        routes = {source: []}
+
+        # Breaks ties between equal delays by the names of the devices
+        heap = [(0, str(source), source)]
+
+        while heap:
+            (delay, name, device) = heappop(heap)
+
+            if device is dest:
+                return routes[device]
+
+            if delay > delays[device]:
+                continue
+
+            # Only routers forward the packets of other devices
+            if device is not source and not isinstance(device, Router):
+                continue
+
+            for port in self._ports_of(device):
+                link = port.conn()
+                neighbor = link.dest().source()
+
+                next_delay = delay + link.delay()
+
+                if neighbor not in delays or next_delay < delays[neighbor]:
+                    delays[neighbor] = next_delay
+                    routes[neighbor] = routes[device] + [link]
+
+                    heappush(heap, (next_delay, str(neighbor), neighbor))
+
+        raise ValueError, 'destination of flow must be reachable'
+
+    # Overrides BaseSimulation._initialize()
+    def _initialize(self):
+        """
+        Builds the routing matrix and the initial state of the fluid
+        from the flows of the hosts.
+        """
+
+        self._flows = []
+        self._links = []
+
+        # Maximum size of the queue of each link, in bits
+        buffers = []
+
+        routes = []
+
+        for device in self._devices:
+            if isinstance(device, Host):
+                for flow in device.get_flows().values():
+                    self._flows.append(flow)
+                    routes.append(self._route(device, flow.dest()))
+
+            for port in self._ports_of(device):
+                self._links.append(port.conn())
+                buffers.append(port.outgoing()._max_size)
+
+        link_index = dict([(link, l) for (l, link) in enumerate(self._links)])
+
+        num_flows = len(self._flows)
+        num_links = len(self._links)
+
+        self._routing = numpy.zeros((num_links, num_flows))
+
+        for (f, route) in enumerate(routes):
+            for link in route:
+                self._routing[link_index[link], f] = 1
+
+        # Links at each hop of each route, padded with an extra link
+        # that passes everything
+        num_hops = max([len(route) for route in routes] + [0])
+
+        self._hops = numpy.empty((num_flows, num_hops), dtype=int)
+        self._hops.fill(num_links)
+
+        for (f, route) in enumerate(routes):
+            self._hops[f, :len(route)] = [link_index[link] for link in route]
+
+        # Fraction of the arrivals that each link passes on, as of the
+        # last step
+        self._passed = numpy.ones(num_links + 1)
+
+        size = float(Packet._DATA_SIZE)
+
+        # Capacity, buffer and delay of each link, in packets and
+        # milliseconds
+        self._capacity = numpy.array([link.rate() / size for link in self._links])
+        self._buffer = numpy.array(buffers) / size
+        self._delay = numpy.array([clock.ms(link.delay()) for link in self._links])
+
+        # Round trip time of each flow without queueing, in
+        # milliseconds, counting the transmission of a packet per hop
+        self._base_rtt = self._routing.T.dot(2 * self._delay + 1 / self._capacity)
+
+        # Capacity of the link from the host of each flow, which only
+        # creates a packet once the last one was transmitted
+        self._access = numpy.array([self._capacity[link_index[route[0]]] for route in routes])
+
+        self._start = numpy.array([clock.ms(flow.start()) for flow in self._flows])
+        self._bits = numpy.array([float(flow.bits()) for flow in self._flows])
+
+        algorithms = [flow._algorithm for flow in self._flows]
+
+        self._fast = numpy.array([isinstance(algorithm, FAST) for algorithm in algorithms])
+        self._gamma = numpy.array([getattr(algorithm, '_gamma', 0.0) for algorithm in algorithms])
+        self._alpha = numpy.array([getattr(algorithm, '_alpha', 0.0) for algorithm in algorithms])
+
+        self._window = numpy.array([flow.window() for flow in self._flows])
+        self._ssthresh = numpy.array([algorithm.ssthresh() for algorithm in algorithms])
+        self._slow_start = numpy.array([algorithm.state() in (AIMD._SS, FAST._SS)
+                                        for algorithm in algorithms])
+
+        self._queue = numpy.zeros(num_links)
+
+        self._time = 0.0
+
+        # Solution at each step, stored in the trackers once the run
+        # ends
+        self._times = []
+        self._active = []
+        self._windows = []
+        self._rtts = []
+        self._sent = []
+        self._carried = []
+        self._queues = []
+
+    # Overrides BaseSimulation._advance()
+    def _advance(self, until=None, max_events=None, deadline=None):
+        """
+        Integrates the fluid until every flow completed, or until the
+        specified time, the specified number of steps or the specified
+        wall-clock deadline is reached.
+        """
+
+        routing = self._routing
+        capacity = self._capacity
+        buffer_size = self._buffer
+        base_rtt = self._base_rtt
+        access = self._access
+        hops = self._hops
+        gamma = self._gamma
+        alpha = self._alpha
+        fast = self._fast
+
+        step = self._step
+        size = float(Packet._DATA_SIZE)
+
+        if until is not None:
+            until = clock.ms(until)
+
+        processed = 0
+
+        while (self._bits > 0).any():
+            # Stops once the number of steps or the time is exhausted
+            if max_events is not None and processed >= max_events:
+                break
+
+            if (deadline is not None and processed % BaseSimulation._CHECK_EVERY == 0
+                    and wall_clock() >= deadline):
+                break
+
+            if until is not None and self._time >= until:
+                break
+
+            time = self._time
+            window = self._window
+            queue = self._queue
+
+            active = (self._start <= time) & (self._bits > 0)
+
+            rtt = base_rtt + routing.T.dot(queue / capacity)
+            rate = numpy.where(active, numpy.minimum(window / rtt, access), 0)
+
+            # Thins the rate of each flow at each hop by what the links
+            # before could pass on
+            upstream = numpy.cumprod(self._passed[hops], axis=1)
+            thinned = rate[:, None] * numpy.hstack((numpy.ones((len(rate), 1)), upstream[:, :-1]))
+
+            arrival = numpy.bincount(hops.ravel(), thinned.ravel(), len(capacity) + 1)[:-1]
+
+            self._passed[:-1] = numpy.minimum(capacity / numpy.maximum(arrival, 1e-12), 1)
+
+            # Drops the fluid arriving at a full buffer
+            full = (queue >= buffer_size) & (arrival > capacity)
+            dropped = numpy.where(full, (arrival - capacity) / numpy.maximum(arrival, 1e-12), 0)
+
+            loss = numpy.minimum(routing.T.dot(dropped), 1)
+
+            # Acknowledgments and losses of each flow over the step
+            acks = rate * (1 - loss) * step
+            losses = rate * loss * step
+
+            # Applies one acknowledgment at a time for FAST TCP, which
+            # moves the window a fraction gamma of the way towards its
+            # target, and whose closed form over many is exact for a
+            # constant round trip time
+            queueing = 1 - base_rtt / rtt
+            fraction = numpy.where(queueing > 1e-9,
+                                   -numpy.expm1(acks * numpy.log1p(-gamma * queueing))
+                                   / numpy.maximum(queueing, 1e-9),
+                                   acks * gamma)
+            fast_window = window + (alpha - queueing * window) * fraction
+
+            # Grows the window by 1 / w per acknowledgment for AIMD
+            aimd_window = numpy.sqrt(window * window + 2 * acks)
+
+            next_window = numpy.where(fast, fast_window, aimd_window)
+
+            # Grows the window by one per acknowledgment in slow start,
+            # until the slow start threshold or the first loss
+            slow_start = self._slow_start
+            next_window = numpy.where(slow_start, window + acks, next_window)
+
+            exceeded = slow_start & (self._ssthresh != -1) & (next_window > self._ssthresh)
+            lost = slow_start & (losses > 0)
+
+            next_window = numpy.where(lost, next_window / 2, next_window)
+            self._slow_start = slow_start & ~(exceeded | lost)
+
+            # Halves the window in congestion avoidance at the rate of
+            # the losses
+            next_window = numpy.where(slow_start, next_window,
+                                      next_window * numpy.exp(-losses / 2))
+
+            self._window = numpy.where(active, numpy.maximum(next_window, 1), window)
+
+            # Fills the queues by what exceeds the capacity
+            carried = numpy.where(queue > 0, capacity, numpy.minimum(arrival, capacity))
+            self._queue = numpy.clip(queue + (arrival - capacity) * step, 0, buffer_size)
+
+            self._bits = numpy.maximum(self._bits - acks * size, 0)
+
+            self._times.append(time)
+            self._active.append(active)
+            self._windows.append(self._window)
+            self._rtts.append(rtt)
+            self._sent.append(rate * step * size)
+            self._carried.append(carried)
+            self._queues.append(queue)
+
+            self._time = time + step
+
+            processed += 1
+
+        self._now = clock.ticks(self._time)
+        self._processed += processed
+
+        for (f, flow) in enumerate(self._flows):
+            flow.window(float(self._window[f]))
+
+            if self._bits[f] == 0:
+                flow.bits(0)
+                flow.unack(0)
+
+        self._finished = not (self._bits > 0).any()
+
+        self._store()
+
+    def _store(self):
+        """
+        Stores the solution so far in the trackers of the flows and the
+        links, in the time base.
+        """
+
+        if not self._times:
+            return
+
+        scale = clock.ticks(1)
+        size = float(Packet._DATA_SIZE)
+
+        times = numpy.array(self._times) * scale
+        active = numpy.array(self._active)
+        windows = numpy.array(self._windows)
+        rtts = numpy.array(self._rtts) * scale
+        sent = numpy.array(self._sent)
+        carried = numpy.array(self._carried)
+        queues = numpy.array(self._queues)
+
+        step = self._step * scale
+
+        for (f, flow) in enumerate(self._flows):
+            tracker = flow.getTracker()
+            mask = active[:, f]
+
+            flow_times = times[mask].tolist()
+
+            tracker._window_sizes = zip(flow_times, windows[mask, f].tolist())
+            tracker._rtts = zip(flow_times, rtts[mask, f].tolist())
+            tracker._times_sent = [(time, bits, step) for (time, bits)
+                                   in zip(flow_times, sent[mask, f].tolist())]
+
+        link_times = times.tolist()
+
+        for (l, link) in enumerate(self._links):
+            tracker = link.getTracker()
+
+            # Counts the packets on the wire, as the packets would
+            on_wire = carried[:, l] * self._delay[l]
+            queueing = queues[:, l] / self._capacity[l] * scale
+
+            tracker._times_sent = zip(link_times, (carried[:, l] * self._step * size).tolist())
+            tracker._buffer_sizes = zip(link_times, on_wire.tolist())
+            tracker._queueing_delays = zip(link_times, queueing.tolist())
+            tracker._queueing_delay = queueing[-1]
+
+    # Overrides BaseSimulation.push(event)
+    def push(self, event):
+        """
+        The fluid has no events.
+        """
+
+        raise NotImplementedError, 'the fluid model has no events'
@@ -1,8 +1,9 @@
 import sys
 
+import clock
 from conn import Port
 from device import Device
-from event import Event
+from event import Event, POOL
 from flow import Flow
 from packet import Packet
 from router import Router
@@ -26,6 +27,12 @@ def __init__(self, identifier):
         self._most_recent = {}
         self._expected = {}
 
+        self._timeouts = {}
+
+        # Packets of the timeouts armed by _rearm(), which no other
+        # event holds
+        self._timeout_packets = {}
+
     def get_flows(self):
         return self._flows
 
@@ -83,7 +90,7 @@ def _create_ack(self, packet):
         ack.set_create_time(packet.get_create_time())
         ack.seq(num)
         ack.size(Packet._ACK_SIZE)
-        ack.datum(Packet._ACK, True)
+        ack.ack(True)
 
         return ack
 
@@ -93,13 +100,7 @@ def _create_event(self, time, port, action, packet):
         and packet.
         """
 
-        event = Event()
-        event.scheduled(time)
-        event.port(port)
-        event.action(action)
-        event.packet(packet)
-
-        return event
+        return POOL.create(time, port, action, packet)
 
     # Overrides Device.initialize()
     def initialize(self):
@@ -111,8 +112,6 @@ def initialize(self):
         if self._port is None:
             raise ValueError, 'port must be specified'
 
-        events = []
-
         # Iterates through each flow
         for (dest, flow) in self._flows.iteritems():
             # Creates a packet to send
@@ -121,9 +120,7 @@ def initialize(self):
             packet.set_create_time(flow.start())
             # Creates a create event for the starting time of the flow
             create_event = self._create_event(flow.start(), self._port, Event._CREATE, packet)
-            events.append(create_event)
-
-        return events
+            self._push(create_event)
 
     def _schedule(self, time, packet, link):
         """
@@ -133,18 +130,61 @@ def _schedule(self, time, packet, link):
 
         next_time = max(self._most_recent.get(link, time), time)
 
-        trans_delay = float(packet.size()) / float(link.rate())
+        trans_delay = clock.transmission(packet.size(), link.rate())
         self._most_recent[link] = next_time + trans_delay
 
         return next_time
 
+    def _rearm(self, time, flow):
+        """
+        Re-arms the retransmission timer of the specified flow for its
+        oldest unacknowledged packet, or cancels the timer if every
+        packet was acknowledged.
+        """
+
+        seq_num = flow.oldest_unack()
+
+        timeout_event = self._timers.cancel(flow)
+
+        if seq_num is None:
+            # Recycles the cancelled timeout, which was never processed
+            if timeout_event is not None:
+                POOL.release(timeout_event)
+
+            return
+
+        # Reuses the timeout length computed when last sending
+        timeout = self._timeouts.get(flow)
+        if timeout is None:
+            timeout = clock.quantize(flow.timeout(self._port.conn().delay()))
+
+        expiry = time + timeout + clock.ticks(0.001)
+
+        # Moves the cancelled timeout to its new time, unless its packet
+        # is a data packet that may still be in flight
+        if timeout_event is not None and timeout_event.packet() is self._timeout_packets.get(flow):
+            packet = timeout_event.packet()
+            timeout_event.scheduled(expiry)
+
+        else:
+            if timeout_event is not None:
+                POOL.release(timeout_event)
+
+            packet = self._create_packet(self, flow.dest())
+            self._timeout_packets[flow] = packet
+
+            timeout_event = self._create_event(expiry, self._port, Event._TIMEOUT, packet)
+
+        packet.seq(seq_num)
+        packet.set_create_time(time)
+
+        self._timers.arm(flow, timeout_event)
+
     def _handle_create(self, event):
         """
         Handles create events.
         """
 
-        events = []
-
         time = event.scheduled()
         packet = event.packet()
 
@@ -164,17 +204,13 @@ def _handle_create(self, event):
             send_time = self._schedule(time, packet, link)
 
             send_event = self._create_event(send_time, self._port, Event._SEND, packet)
-            events.append(send_event)
-
-        return events
+            self._push(send_event)
 
     def _handle_receive(self, event):
         """
         Handles receive events.
         """
 
-        events = []
-
         time = event.scheduled()
         packet = event.packet()
 
@@ -183,7 +219,7 @@ def _handle_receive(self, event):
             dest = packet.source()
 
             # Handles acknowledgment received
-            if packet.has_datum(Packet._ACK):
+            if packet.ack():
                 # Updates packet statistics of the flow
                 flow = self._flows.get(dest)
 
@@ -193,6 +229,8 @@ def _handle_receive(self, event):
                     should_create = not flow.is_able()
                     flow.analyze(event, None)
 
+                    self._rearm(time, flow)
+
                 # Only create an event if previously unable to send
                 if should_create:
                     next_packet = self._create_packet(self, dest)
@@ -200,7 +238,7 @@ def _handle_receive(self, event):
 
                     # Creates a create event for the current time
                     create_event = self._create_event(time, self._port, Event._CREATE, next_packet)
-                    events.append(create_event)
+                    self._push(create_event)
 
             # Otherwise, creates an acknowledgment packet
             else:
@@ -224,17 +262,13 @@ def _handle_receive(self, event):
 
                 # Creates a send event for the current time
                 ack_event = self._create_event(send_time, self._port, Event._SEND, ack)
-                events.append(ack_event)
-
-        return events
+                self._push(ack_event)
 
     def _handle_send(self, event):
         """
         Handles send events.
         """
 
-        events = []
-
         time = event.scheduled()
         port = event.port()
         packet = event.packet()
@@ -256,7 +290,7 @@ def _handle_send(self, event):
 
             # Creates a receive event for a propagation delay later
             receive_event = self._create_event(time + prop_delay, dest, Event._RECEIVE, packet)
-            events.append(receive_event)
+            self._push(receive_event)
 
         should_create = True
 
@@ -268,7 +302,7 @@ def _handle_send(self, event):
                 flow.analyze(event, link)
                 should_create = flow.is_able()
 
-        if event.action() == Event._SEND and not packet.has_datum(Packet._ACK):
+        if event.action() == Event._SEND and not packet.ack():
             # Notifies the link that a packet was sent
             link.record_sent(time, packet.size())
 
@@ -276,33 +310,35 @@ def _handle_send(self, event):
         next_packet = self._create_packet(self, packet.dest())
         next_packet.set_create_time(time)
 
-        # Creates a timeout event for a timeout length later
+        # Arms the retransmission timer of the flow unless already running
         flow = self._flows.get(next_packet.dest())
-        if flow is not None:
-            timeout_event = self._create_event(time + flow.timeout(link.delay()) + 0.001, self._port, Event._TIMEOUT, packet)
-            events.append(timeout_event)
+        if (flow is not None and packet.source() == self
+                and not packet.ack()):
+            timeout = clock.quantize(flow.timeout(link.delay()))
+            self._timeouts[flow] = timeout
+
+            if not self._timers.armed(flow):
+                timeout_event = self._create_event(time + timeout + clock.ticks(0.001), self._port, Event._TIMEOUT, packet)
+                self._timers.arm(flow, timeout_event)
 
         # Creates a create event for a tranmission delay later
-        trans_delay = float(packet.size()) / float(link.rate())
+        trans_delay = clock.transmission(packet.size(), link.rate())
 
         # Only create an event if currently able to send
         if should_create:
             # Creates a create event for the current time
             create_event = self._create_event(time + trans_delay, self._port, Event._CREATE, next_packet)
-            events.append(create_event)
-
-        return events
+            self._push(create_event)
 
     def _handle_timeout(self, event):
         """
         Handles timeout events.
         """
 
-        events = []
-
         time = event.scheduled()
         packet = event.packet()
 
+        reset = False
         should_create = True
 
         # Updates packet statistics of flow
@@ -312,70 +348,83 @@ def _handle_timeout(self, event):
             reset = flow.analyze(event, None)
             should_create = flow.is_able()
 
+            self._rearm(time, flow)
+
         # Creates the next packet to send
         next_packet = self._create_packet(self, packet.dest())
         next_packet.set_create_time(time)
 
         if reset:
-            print >> sys.stderr, '[%.3f] Host %s timeout packet %s' % (time, self, packet)
+            print >> sys.stderr, '[%.3f] Host %s timeout packet %s' % (clock.ms(time), self, packet)
 
             # Only create an event if currently able to send
             if should_create:
                 # Creates a create event for the current time
                 create_event = self._create_event(time, self._port, Event._CREATE, next_packet)
-                events.append(create_event)
-
-        return events
+                self._push(create_event)
 
-    # Overrides Device.process(event)
-    def process(self, event):
+    def _receive(self, event):
         """
-        Processes the specified event.
+        Pops the packet at the head of the incoming queue and handles
+        it.
         """
 
-        events = []
-
         time = event.scheduled()
         port = event.port()
-        action = event.action()
         link = port.conn()
 
-        if action == Event._CREATE:
-            events.extend(self._handle_create(event))
+        link.dest().conn().record_buffer_size(time, len(port.incoming()))
 
-        elif action == Event._RECEIVE:
-            link.dest().conn().record_buffer_size(time, len(port.incoming()))
+        # Processes an incoming packet
+        if port.incoming():
+            # Pops the packet off the head of the queue
+            packet = port.incoming().popleft() # append right, pop left
+            event.packet(packet)
 
-            # Processes an incoming packet
-            if port.incoming():
-                # Pops the packet off the head of the queue
-                packet = port.incoming().popleft() # append right, pop left
-                event.packet(packet)
+            print >> sys.stderr, '[%.3f] Host %s received packet %s' % (clock.ms(time), self, packet)
 
-                print >> sys.stderr, '[%.3f] Host %s received packet %s' % (time, self, packet)
+            self._handle_receive(event)
 
-                events.extend(self._handle_receive(event))
+        link.dest().conn().record_buffer_size(time, len(port.incoming()))
 
-            link.dest().conn().record_buffer_size(time, len(port.incoming()))
+    def _send(self, event):
+        """
+        Pops the packet at the head of the outgoing queue and handles
+        it.
+        """
 
-        elif action == Event._SEND:
-            link.record_buffer_size(time, len(port.conn().dest().incoming()))
+        time = event.scheduled()
+        port = event.port()
+        link = port.conn()
 
-            # Processes an outgoing packet
-            if port.outgoing():
-                # Pops the packet off the head of the queue
-                packet = port.outgoing().popleft() # append right, pop left
-                event.packet(packet)
+        link.record_buffer_size(time, len(link.dest().incoming()))
 
-                port.conn().update_queueing_delay(packet, time)
+        # Processes an outgoing packet
+        if port.outgoing():
+            # Pops the packet off the head of the queue
+            packet = port.outgoing().popleft() # append right, pop left
+            event.packet(packet)
 
-                print >> sys.stderr, '[%.3f] Host %s sent packet %s' % (time, self, packet)
+            # Updates the queueing delay when a packet is sent
+            link.update_queueing_delay(packet, time)
 
-                events.extend(self._handle_send(event))
+            print >> sys.stderr, '[%.3f] Host %s sent packet %s' % (clock.ms(time), self, packet)
+
+            self._handle_send(event)
+
+        link.record_buffer_size(time, len(link.dest().incoming()))
+
+    # Overrides Device.handlers()
+    def handlers(self):
+        """
+        Returns the handlers of the host, indexed by action code.
+        """
 
-            link.record_buffer_size(time, len(port.conn().dest().incoming()))
+        handlers = [None] * len(Event._NAMES)
 
-        elif action == Event._TIMEOUT:
-            events.extend(self._handle_timeout(event))
+        handlers[Event._CREATE] = self._handle_create
+        handlers[Event._RECEIVE] = self._receive
+        handlers[Event._SEND] = self._send
+        handlers[Event._TIMEOUT] = self._handle_timeout
 
-        return events
+        return handlers
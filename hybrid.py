@@ -0,0 +1,376 @@
+"""
+Hybrid fluid and packet simulation of background flows.
+
+Only the flows listed under the measurables of a configuration need
+the fidelity of packets. HybridSimulation runs the other flows of the
+hosts as fluid rate processes instead: every step, each of them sends
+its window of packets per round trip time along its route, and its
+window follows the packets acknowledged and lost in that step as the
+congestion algorithm would have it.
+
+The fluid shares the links with the packets. Its bits take their turn
+in the transmissions of the sending device, so the packets queue
+behind them, and the bits still queued count against the outgoing
+buffer, so the packets are dropped when it fills. In turn, the fluid
+waits for the packets queued ahead of it, and what does not fit in the
+buffer is lost.
+
+The acknowledgments of the fluid are not delayed by a round trip, and
+the lost fluid is not charged to the links downstream, so the fluid is
+only as accurate as its step is short compared to the round trip times.
+"""
+
+from math import ceil, floor, sqrt
+from time import time as wall_clock
+
+import clock
+from congestion.aimd import AIMD
+from congestion.fast import FAST
+from flow import Flow
+from host import Host
+from packet import Packet
+from router import Router
+from simulation import Simulation
+
+# Default length of a step of the fluid, in milliseconds
+_STEP = 5
+
+class HybridSimulation(Simulation):
+    """
+    Simulation that runs the flows that are not measured as fluid.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler=None,
+                 trusted=False, step=_STEP):
+        """
+        Creates a HybridSimulation instance with the specified list of
+        devices, where the flows of the hosts that are not measured
+        are updated as fluid every specified number of milliseconds.
+        """
+
+        Simulation.__init__(self, devices, measure_flows, measure_links,
+                            scheduler, trusted)
+
+        # Checks that step is a number
+        if not isinstance(step, (int, float)):
+            raise TypeError, 'step must be a float or an int'
+
+        # Checks that step is positive
+        elif step <= 0:
+            raise ValueError, 'step must be positive'
+
+        self._step = float(step)
+
+        measured = set(measure_flows.values())
+
+        # Maps each fluid flow to its source host
+        self._fluid = {}
+
+        for device in devices:
+            if isinstance(device, Host):
+                for flow in device.get_flows().values():
+                    if flow not in measured:
+                        self._fluid[flow] = device
+
+        # Acknowledgments received but not yet applied to the window,
+        # and the time each finished flow drains its last bits
+        self._acks = {}
+        self._drained = {}
+
+        # Fluid bits held in each outgoing buffer
+        self._reserved = {}
+
+        self._next_step = clock.ticks(0)
+
+    # Overrides Simulation._initialize()
+    def _initialize(self):
+        """
+        Initializes the simulation, without the packets of the fluid
+        flows.
+        """
+
+        # Hides the fluid flows from their hosts while they create their
+        # first packets, and leaves the hosts as they were given
+        for (flow, host) in self._fluid.iteritems():
+            del host.get_flows()[flow.dest()]
+
+        try:
+            Simulation._initialize(self)
+        finally:
+            for (flow, host) in self._fluid.iteritems():
+                host.get_flows()[flow.dest()] = flow
+
+    # Overrides Simulation._advance()
+    def _advance(self, until=None, max_events=None, deadline=None):
+        """
+        Processes events as Simulation._advance() does, and updates
+        the fluid flows at the end of each step.
+        """
+
+        processed = self._processed
+
+        while True:
+            bound = self._next_step
+            if until is not None:
+                bound = min(bound, until)
+
+            remaining = None
+            if max_events is not None:
+                remaining = max_events - (self._processed - processed)
+
+            Simulation._advance(self, bound, remaining, deadline)
+
+            # Stops once every flow completed
+            if self._num_flows > 0 and not self._incomplete:
+                self._finished = True
+                break
+
+            # Stops once the number of events or the time is exhausted
+            if remaining is not None and self._processed - processed >= remaining:
+                break
+
+            if deadline is not None and wall_clock() >= deadline:
+                break
+
+            # Stops at the horizon unless a step ends there
+            if bound < self._next_step:
+                break
+
+            # Stops once neither events nor fluid are left
+            if self._finished and not self._active():
+                break
+
+            self._update(bound)
+
+            self._next_step = bound + clock.ticks(self._step)
+            self._finished = False
+
+    def _active(self):
+        """
+        Returns True if a fluid flow has yet to complete, and False
+        otherwise.
+        """
+
+        for flow in self._fluid:
+            if not flow.is_complete():
+                return True
+
+        return False
+
+    def _route(self, host, dest):
+        """
+        Returns the list of ports that the packets from the specified
+        host to the specified device are sent from, or None if the
+        device is not reachable yet.
+        """
+
+        port = host.get_ports()
+        route = [port]
+
+        device = port.conn().dest().source()
+
+        while isinstance(device, Router):
+            port = device._algorithm.next(dest)
+
+            # Checks that the device is reachable without a loop
+            if port is None or len(route) > len(self._devices):
+                return None
+
+            route.append(port)
+
+            device = port.conn().dest().source()
+
+        if device is not dest:
+            return None
+
+        return route
+
+    def _backlog(self, port, time):
+        """
+        Returns the time left to transmit what is queued on the
+        specified port at the specified time.
+        """
+
+        most_recent = port.source()._most_recent.get(port.conn(), time)
+
+        return max(most_recent - time, 0)
+
+    def _update(self, time):
+        """
+        Sends the fluid of one step from the specified time, and
+        updates the fluid flows by what they got acknowledged and lost.
+        """
+
+        step = self._step
+
+        # Finds the rate of each active fluid flow from its window and
+        # the round trip time along its route
+        rates = {}
+        loads = {}
+
+        for (flow, host) in self._fluid.iteritems():
+            if flow.start() > time or flow.is_complete():
+                continue
+
+            if not flow.has_data():
+                # Completes the flow once its last bits drained
+                if time >= self._drained.get(flow, time):
+                    flow.unack(0)
+
+                continue
+
+            route = self._route(host, flow.dest())
+            if route is None:
+                continue
+
+            base_rtt = 0.0
+            queueing = 0.0
+
+            for port in route:
+                link = port.conn()
+
+                base_rtt += clock.ms(2 * link.delay()) + float(Packet._DATA_SIZE) / link.rate()
+                queueing += clock.ms(self._backlog(port, time))
+
+            rtt = base_rtt + queueing
+
+            bits = min(flow.window() * Packet._DATA_SIZE * step / rtt, flow.bits())
+
+            rates[flow] = (route, bits, base_rtt, rtt)
+
+            for port in route:
+                loads[port] = loads.get(port, 0.0) + bits
+
+        # Queues the fluid on each port behind the packets, and drops
+        # what does not fit in its outgoing buffer
+        losses = {}
+
+        # Also releases the fluid held in buffers that get no more load
+        for port in self._reserved:
+            loads.setdefault(port, 0.0)
+
+        for (port, load) in loads.iteritems():
+            link = port.conn()
+            outgoing = port.outgoing()
+            rate = link.rate()
+
+            reserved = self._reserved.get(port, 0)
+            packet_bits = outgoing.size() - reserved
+
+            queued = clock.ms(self._backlog(port, time)) * rate
+            fluid_bits = max(queued - packet_bits, 0)
+
+            room = max(outgoing._max_size - packet_bits - fluid_bits, 0) + rate * step
+            losses[port] = 0.0
+            if load > room:
+                losses[port] = (load - room) / load
+
+            accepted = int(round(min(load, room)))
+
+            most_recent = port.source()._most_recent
+            most_recent[link] = max(most_recent.get(link, time), time) + clock.transmission(accepted, rate)
+
+            if accepted > 0:
+                link.record_sent(time, accepted)
+
+            # Holds the fluid still queued in the outgoing buffer
+            queued = clock.ms(self._backlog(port, time)) * rate
+            fluid_bits = min(max(queued - packet_bits, 0), max(outgoing._max_size - packet_bits, 0))
+
+            self._reserved[port] = int(fluid_bits)
+            outgoing._curr_size += int(fluid_bits) - reserved
+
+        # Updates the window and the bits of each fluid flow
+        for (flow, (route, bits, base_rtt, rtt)) in rates.iteritems():
+            delivered = 1.0
+
+            for port in route:
+                delivered *= 1 - losses[port]
+
+            acked = self._acks.get(flow, 0.0) + bits * delivered / Packet._DATA_SIZE
+
+            if acked >= 1:
+                self._acknowledge(flow, int(acked), base_rtt, rtt)
+
+            self._acks[flow] = acked - int(acked)
+
+            if delivered < 1:
+                self._lose(flow, time)
+
+            flow.bits(max(flow.bits() - int(ceil(bits * delivered)), 0))
+            flow.unack(int(ceil(flow.window())))
+
+            if not flow.has_data():
+                self._drained[flow] = time + clock.ticks(rtt)
+
+    def _acknowledge(self, flow, num, base_rtt, rtt):
+        """
+        Updates the window of the specified fluid flow for the specified
+        number of received acknowledgments at once, given its round trip
+        times without and with queueing.
+        """
+
+        algorithm = flow._algorithm
+        cwnd = flow.window()
+
+        # Grows the window by one per acknowledgment in slow start, up to
+        # the acknowledgment that exceeds the threshold
+        if algorithm.state() == algorithm._SS:
+            ssthresh = algorithm.ssthresh()
+
+            count = num
+            if ssthresh != -1:
+                count = min(num, max(int(floor(ssthresh - cwnd)) + 1, 1))
+
+            cwnd += count
+            num -= count
+
+            if ssthresh != -1 and cwnd > ssthresh:
+                algorithm.state(algorithm._CA)
+
+        if num > 0 and isinstance(algorithm, FAST):
+            # Follows FAST TCP with the round trip times of the fluid, as
+            # the flow has no packets to measure them, where each update
+            # is linear once the window no longer doubles
+            gamma = algorithm._gamma
+            scale = 1 - gamma + gamma * base_rtt / rtt
+            offset = gamma * algorithm._alpha
+
+            while num > 0 and scale * cwnd + offset > 2 * cwnd:
+                cwnd = max(2 * cwnd, 1)
+                num -= 1
+
+            if scale < 1:
+                cwnd = offset / (1 - scale) + (scale ** num) * (cwnd - offset / (1 - scale))
+            else:
+                cwnd += num * offset
+
+            cwnd = max(cwnd, 1)
+
+        # Grows the window by the inverse of the window per
+        # acknowledgment in congestion avoidance, so that its square
+        # grows by about two
+        elif num > 0:
+            cwnd = sqrt(cwnd * cwnd + 2 * num)
+
+        flow.window(cwnd)
+
+    def _lose(self, flow, time):
+        """
+        Updates the window of the specified fluid flow for fluid lost
+        at the specified time, as a timeout in slow start and as
+        duplicate acknowledgments otherwise, at most once per margin.
+        """
+
+        algorithm = flow._algorithm
+
+        if algorithm.state() in (AIMD._SS, FAST._SS):
+            if time > flow._last_timeout + clock.ticks(Flow._MARGIN):
+                algorithm.handle_timeout()
+
+                flow._last_timeout = time
+
+        elif time > flow._last_duplicate + clock.ticks(Flow._MARGIN):
+            algorithm.handle_duplicate_acks(Flow._NUM_DUPLICATES)
+
+            flow._last_duplicate = time
@@ -0,0 +1,423 @@
+"""
+Lockstep runs of many parameter variants of one simulation.
+
+Each varied parameter is replaced by a Varied value, which holds the
+value of every variant in an array along the variant axis. Arithmetic
+on varied values is carried out for every variant at once, so a single
+run processes the events of all the variants while they agree.
+
+The variants only diverge once a decision depends on which of them is
+run, such as a comparison whose outcome differs between them, or a
+conversion to a plain number. The process then forks a child for each
+other outcome, and each process goes on with the variants that share
+its outcome, so that the events before the first divergence are only
+processed once. A forked child waits for one of a fixed number of slots
+before going on, and a process frees its slot once its variants are
+done, which caps the number of processes running at once.
+
+Only the varied parameters and the values computed from them are held
+in arrays. The devices, packets and events are the plain objects of the
+simulation, shared by the variants while they agree, so the sweep forks
+on divergence rather than keeping the whole state of the network along
+the variant axis. A sweep saves the events processed before the
+variants diverge, such as the warm-up before a varied buffer fills up,
+while each process pays the overhead of NumPy on the varied values it
+still holds after a split.
+"""
+
+import cPickle
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+from multiprocessing import Semaphore, cpu_count
+from operator import add, sub, mul, div, truediv, floordiv, mod, pow
+from operator import lt, le, gt, ge, eq, ne
+
+import numpy
+
+# Variants followed by the current process, or None outside of a sweep
+_lanes = None
+
+# Processes forked by the current process
+_children = []
+
+# Slots of the processes allowed to run at once, or None outside of a
+# sweep
+_slots = None
+
+def _flip(op):
+    """
+    Returns the specified binary operator with its operands swapped.
+    """
+
+    return lambda first, second: op(second, first)
+
+def _values(value):
+    """
+    Returns the values of the specified varied or plain value along the
+    variant axis.
+    """
+
+    if isinstance(value, Varied):
+        return value._values
+
+    return value
+
+def _wrap(values):
+    """
+    Returns the specified values along the variant axis as a plain
+    value if the current variants agree on it, and as a Varied value
+    otherwise.
+    """
+
+    if _lanes is not None:
+        lanes = values[_lanes]
+    else:
+        lanes = values
+
+    if (lanes == lanes[0]).all():
+        return lanes[0].item()
+
+    return Varied(values)
+
+def _split(outcomes):
+    """
+    Returns the outcome of the current process among the specified
+    outcomes of the current variants, after forking a child for each
+    other outcome.
+    """
+
+    global _lanes, _children
+
+    lanes = _lanes
+
+    groups = {}
+    for (lane, outcome) in zip(lanes, outcomes):
+        groups.setdefault(outcome, []).append(lane)
+
+    # Orders the outcomes by their first variant, which the current
+    # process keeps
+    order = sorted(groups, key=lambda outcome: groups[outcome][0])
+
+    for outcome in order[1:]:
+        # Flushes the output so that the children do not repeat it
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+
+        if pid == 0:
+            _lanes = numpy.array(groups[outcome])
+            _children = []
+
+            # Waits for a free slot before going on
+            _slots.acquire()
+
+            return outcome
+
+        _children.append(pid)
+
+    _lanes = numpy.array(groups[order[0]])
+
+    return order[0]
+
+def _decide(values):
+    """
+    Returns the value of the current variants among the specified
+    values along the variant axis, splitting the variants if they
+    disagree on it.
+    """
+
+    if _lanes is None:
+        lanes = values
+    else:
+        lanes = values[_lanes]
+
+    if (lanes == lanes[0]).all():
+        return lanes[0].item()
+
+    return _split([value.item() for value in lanes])
+
+class Varied(object):
+    """
+    Value of a parameter that differs between the variants of a sweep.
+    """
+
+    def __init__(self, values):
+        """
+        Creates a Varied instance with the specified list of values,
+        one per variant.
+        """
+
+        self._values = numpy.asarray(values)
+
+    def __repr__(self):
+        """
+        Defines the string representation for a Varied instance.
+        """
+
+        return repr(self._resolve())
+
+    def __str__(self):
+        """
+        Defines the string representation for a Varied instance.
+        """
+
+        return str(self._resolve())
+
+    def __reduce__(self):
+        """
+        Pickles the value of the current variants.
+        """
+
+        return (_identity, (self._resolve(),))
+
+    def _resolve(self):
+        """
+        Returns the value of the current variants.
+        """
+
+        return _decide(self._values)
+
+    def _apply(self, op, other):
+        """
+        Returns the specified binary operator applied to the value and
+        the specified value, for every variant.
+        """
+
+        return _wrap(op(self._values, _values(other)))
+
+    def _compare(self, op, other):
+        """
+        Returns the outcome of the specified comparison of the value
+        and the specified value for the current variants, splitting the
+        variants if they disagree on it.
+        """
+
+        return bool(_decide(op(self._values, _values(other))))
+
+    def __float__(self):
+        """
+        Returns the value of the current variants as a float.
+        """
+
+        return float(self._resolve())
+
+    def __int__(self):
+        """
+        Returns the value of the current variants as an int.
+        """
+
+        return int(self._resolve())
+
+    def __nonzero__(self):
+        """
+        Returns the truth of the value of the current variants.
+        """
+
+        return bool(self._resolve())
+
+    def __hash__(self):
+        """
+        Varied values are not hashable, since hashing would split the
+        variants wherever the value is used as a key.
+        """
+
+        raise TypeError, 'varied values are not hashable'
+
+    def __neg__(self):
+        """
+        Returns the negated value of every variant.
+        """
+
+        return _wrap(-self._values)
+
+    def __abs__(self):
+        """
+        Returns the absolute value of every variant.
+        """
+
+        return _wrap(abs(self._values))
+
+def _arithmetic(op):
+    """
+    Returns the method of Varied that applies the specified binary
+    operator for every variant.
+    """
+
+    return lambda self, other: self._apply(op, other)
+
+def _comparison(op):
+    """
+    Returns the method of Varied that applies the specified comparison
+    for the current variants.
+    """
+
+    return lambda self, other: self._compare(op, other)
+
+for (name, op) in [('add', add), ('sub', sub), ('mul', mul), ('div', div),
+                   ('truediv', truediv), ('floordiv', floordiv), ('mod', mod),
+                   ('pow', pow)]:
+    setattr(Varied, '__%s__' % name, _arithmetic(op))
+    setattr(Varied, '__r%s__' % name, _arithmetic(_flip(op)))
+
+for (name, op) in [('lt', lt), ('le', le), ('gt', gt), ('ge', ge),
+                   ('eq', eq), ('ne', ne)]:
+    setattr(Varied, '__%s__' % name, _comparison(op))
+
+def _identity(value):
+    """
+    Returns the specified value.
+    """
+
+    return value
+
+def _finish(simulation, collect, directory):
+    """
+    Splits the current variants into one process each, and writes the
+    collected result of each variant to the specified directory.
+    """
+
+    lane = _split(list(_lanes))
+
+    try:
+        data = cPickle.dumps((True, collect(simulation)), cPickle.HIGHEST_PROTOCOL)
+
+    except Exception:
+        data = cPickle.dumps((False, traceback.format_exc()), cPickle.HIGHEST_PROTOCOL)
+
+    outfile = open(os.path.join(directory, str(lane)), 'wb')
+    outfile.write(data)
+    outfile.close()
+
+def sweep(simulation, settings, collect, processes=None):
+    """
+    Runs the specified simulation to completion for every variant of
+    the specified settings at once, with at most the specified number
+    of processes running at once, and returns the results of the
+    specified collect function for each variant, in order.
+
+    Each setting is an object, the name of one of its attributes and
+    the list of values the attribute takes in each variant.
+    """
+
+    global _lanes, _children, _slots
+
+    # Checks that settings is a list
+    if not isinstance(settings, list):
+        raise TypeError, 'settings must be a list'
+
+    # Checks that collect is callable
+    if not callable(collect):
+        raise TypeError, 'collect must be callable'
+
+    num_variants = None
+
+    for (obj, name, values) in settings:
+        # Checks that each setting has a list of values
+        if not isinstance(values, list):
+            raise TypeError, 'values must be a list'
+
+        # Checks that every setting has the same number of variants
+        if num_variants is not None and len(values) != num_variants:
+            raise ValueError, 'settings must have the same number of values'
+
+        num_variants = len(values)
+
+    # Checks that there is at least one variant
+    if not num_variants:
+        raise ValueError, 'settings must have at least one value'
+
+    # Defaults to one process per processor
+    if processes is None:
+        processes = cpu_count()
+
+    # Checks that processes is an int
+    if not isinstance(processes, int):
+        raise TypeError, 'number of processes must be an int'
+
+    # Checks that processes is positive
+    elif processes <= 0:
+        raise ValueError, 'number of processes must be positive'
+
+    # Varied values do not pass the type checks of the strict accessors
+    trusted = simulation._trusted
+    simulation._trusted = True
+
+    originals = [getattr(obj, name) for (obj, name, values) in settings]
+
+    for (obj, name, values) in settings:
+        setattr(obj, name, Varied(values))
+
+    directory = tempfile.mkdtemp()
+
+    _lanes = numpy.arange(num_variants)
+    _children = []
+
+    _slots = Semaphore(processes)
+    _slots.acquire()
+
+    root = os.getpid()
+
+    try:
+        try:
+            try:
+                simulation.run()
+
+            except Exception:
+                failure = cPickle.dumps((False, traceback.format_exc()), cPickle.HIGHEST_PROTOCOL)
+
+                for lane in _lanes:
+                    outfile = open(os.path.join(directory, str(lane)), 'wb')
+                    outfile.write(failure)
+                    outfile.close()
+
+            else:
+                _finish(simulation, collect, directory)
+
+        finally:
+            # Frees the slot of the process for the waiting children
+            _slots.release()
+
+        # Waits for the children, which wait for their own
+        for pid in _children:
+            os.waitpid(pid, 0)
+
+    finally:
+        # Exits the children without returning into the caller
+        if os.getpid() != root:
+            os._exit(0)
+
+        _lanes = None
+        _children = []
+        _slots = None
+
+        for ((obj, name, values), original) in zip(settings, originals):
+            setattr(obj, name, original)
+
+        simulation._trusted = trusted
+
+    outcomes = []
+
+    for lane in xrange(num_variants):
+        path = os.path.join(directory, str(lane))
+
+        # Checks that the variant wrote its result before exiting
+        if not os.path.exists(path):
+            outcomes.append((False, 'variant exited without a result'))
+            continue
+
+        infile = open(path, 'rb')
+        outcomes.append(cPickle.loads(infile.read()))
+        infile.close()
+
+    shutil.rmtree(directory)
+
+    # Reports the first failure once every variant has exited
+    for (i, (succeeded, value)) in enumerate(outcomes):
+        if not succeeded:
+            raise RuntimeError, 'variant %d failed:\n%s' % (i, value)
+
+    return [value for (succeeded, value) in outcomes]
@@ -1,11 +1,23 @@
 from device import Device
 
-class Packet:
+# Default argument of Packet.routing(), which tells reading the routing
+# information apart from removing it
+_READ = object()
+
+class Packet(object):
     """
     Builder for Packet instances.
+
+    The header fields are slots, so that the packets held in buffers
+    and events stay small. Other data is kept in a table of the packet
+    that is only created when first needed.
     """
 
+    __slots__ = ('_id', '_source', '_dest', '_bits_size', '_create_time',
+                 '_ack', '_routing', '_data')
+
     _ACK = 'ack'
+    _ROUTING = 'routing'
 
     _DATA_SIZE = 8000
     _ACK_SIZE = 512
@@ -22,8 +34,12 @@ def __init__(self):
         self._dest = None
         self._create_time = None
 
-        # Initializes the packet data
-        self._data = {}
+        # Initializes the header flags and payload
+        self._ack = False
+        self._routing = None
+
+        # Creates the table of other data on demand
+        self._data = None
 
     def set_create_time(self, time):
         self._create_time = time
@@ -41,7 +57,7 @@ def __repr__(self):
                 'source=%s, '
                 'dest=%s, '
                 'data=%s'
-                ']') % (self.seq(), self.source(), self.dest(), self._data)
+                ']') % (self.seq(), self.source(), self.dest(), dict(self.data()))
 
     def seq(self, num=None):
         """
@@ -107,13 +123,50 @@ def size(self, bits=None):
 
         self._bits_size = bits
 
+    def ack(self, flag=None):
+        """
+        ack()     -> returns True if the packet is an acknowledgment, and
+                     False otherwise
+
+        ack(flag) -> sets whether the packet is an acknowledgment
+        """
+
+        if flag is None:
+            return self._ack
+
+        # Checks that flag is a bool
+        if not isinstance(flag, bool):
+            raise TypeError, 'flag must be a bool'
+
+        self._ack = flag
+
+    def routing(self, payload=_READ):
+        """
+        routing()        -> returns the routing information, or None if
+                            the packet carries none
+
+        routing(payload) -> sets the routing information as the
+                            specified value, or removes it if None
+        """
+
+        if payload is _READ:
+            return self._routing
+
+        self._routing = payload
+
     def has_datum(self, key):
         """
         Returns True if the packet contains a datum for the specified
         key, and False otherwise.
         """
 
-        return key in self._data
+        if key == Packet._ACK:
+            return self._ack
+
+        elif key == Packet._ROUTING:
+            return self._routing is not None
+
+        return self._data is not None and key in self._data
 
     def datum(self, key, value=None):
         """
@@ -123,7 +176,41 @@ def datum(self, key, value=None):
         datum(key, value) -> adds the specified key-value pair
         """
 
+        if key == Packet._ACK:
+            return self.ack(value)
+
+        elif key == Packet._ROUTING:
+            if value is None:
+                return self.routing()
+
+            return self.routing(value)
+
         if value is None:
+            if self._data is None:
+                raise KeyError, key
+
             return self._data[key]
 
+        if self._data is None:
+            self._data = {}
+
         self._data[key] = value
+
+    def data(self):
+        """
+        Returns the list of key-value pairs of the packet data, with
+        the header flags and payload under their keys.
+        """
+
+        data = []
+
+        if self._ack:
+            data.append((Packet._ACK, True))
+
+        if self._routing is not None:
+            data.append((Packet._ROUTING, self._routing))
+
+        if self._data is not None:
+            data.extend(self._data.iteritems())
+
+        return data
@@ -0,0 +1,1872 @@
+"""
+Parallel simulation across processes.
+
+The devices are split into partitions, each run by a forked process
+that owns the events of its devices. A packet sent over a link between
+two partitions is passed to the receiving partition as a timestamped
+message. Since a packet takes the propagation delay of its link to
+arrive, every partition can run a window as long as the shortest such
+delay past the earliest pending event before messages are exchanged,
+as in the YAWNS protocol.
+
+The sending partition keeps a shadow of the incoming buffer at the
+other end of each link between partitions, which it fills when sending
+and drains when the packet is received, so that drops and buffer
+occupancy are decided by the partition that records them.
+
+The sequential engine breaks ties between events of the same time by
+the order they were pushed in, which follows the order of the events
+that pushed them. Each partition keys its events by the time of the
+event that pushed them, the position of that event among the events
+of its time, and the order of the push, and a message carries the key
+of its packet to the receiving partition. A time at which a single
+partition processed events is ordered by that partition alone, so
+after each window the coordinator only merges the events of the times
+that several partitions processed, and sends back their positions.
+Expired timers are keyed by the last event their partition processed
+before them, which matches the sequential engine unless a timer
+expires at the very time of an event of another partition.
+
+Once no incomplete flow has data left to send, the last flow may
+complete within a window. Each partition then forks a standby copy of
+itself before running the window, and the coordinator finds the event
+after which no flow is incomplete. The partitions that ran past that
+event hand over to their standbys, which replay the window up to it,
+so that every partition stops where the sequential engine would.
+
+A configuration may also hold several connected components that share
+no link and no flow. Since no packet ever goes from one component to
+another, each group of components runs to the completion of its own
+flows in a forked process without any message, then runs up to the
+time the last flow of every component completed.
+"""
+
+import marshal
+import os
+import struct
+import sys
+from bisect import bisect_left, bisect_right
+from collections import deque
+from heapq import heapify, heappush, heappop
+from itertools import count
+from multiprocessing import cpu_count
+from time import time as wall_clock
+
+import clock
+from event import Event, POOL
+from host import Host
+from packet import Packet
+from router import Router
+from scheduling.algorithm import Scheduler
+from simulation import BaseSimulation
+from timer import TimerWheel
+
+# Requests sent to the partitions
+_POLL = 0
+_STEP = 1
+_RANK = 2
+_REPLAY = 3
+_GATHER = 4
+_STOP = 5
+
+# Time of the key of the events pushed by the initialization of the
+# devices, before any event
+_INIT = -1
+
+# Kinds of blocks of events, where expired timers run after every
+# other block of their time
+_PUSHED = 0
+_EXPIRED = 1
+
+def _ports_of(device):
+    """
+    Returns the list of ports of the specified device.
+    """
+
+    ports = device.get_ports()
+    if isinstance(device, Host):
+        ports = [ports]
+
+    return ports
+
+def _partition(devices, num_partitions):
+    """
+    Splits the specified devices into at most the specified number of
+    partitions of similar size.
+
+    Routers are split in breadth-first order, so that neighbors tend
+    to share a partition, and each host joins the partition of the
+    router it is connected to.
+    """
+
+    devices = sorted(devices, key=str)
+
+    def neighbors(device):
+        """
+        Returns the devices directly connected to the specified device.
+        """
+
+        return [port.conn().dest().source() for port in _ports_of(device)]
+
+    # Attaches each host to a router it is connected to, if any
+    members = {}
+
+    for device in devices:
+        if isinstance(device, Router):
+            members[device] = [device]
+
+    for device in devices:
+        if not isinstance(device, Router):
+            routers = [neighbor for neighbor in neighbors(device)
+                       if isinstance(neighbor, Router)]
+
+            if routers:
+                members[routers[0]].append(device)
+            else:
+                members[device] = [device]
+
+    # Orders the groups breadth-first from the first of each component
+    order = []
+    seen = set()
+
+    for device in devices:
+        if device not in members or device in seen:
+            continue
+
+        seen.add(device)
+        queue = deque([device])
+
+        while queue:
+            unit = queue.popleft()
+            order.append(unit)
+
+            for member in members[unit]:
+                for neighbor in sorted(neighbors(member), key=str):
+                    if neighbor in members and neighbor not in seen:
+                        seen.add(neighbor)
+                        queue.append(neighbor)
+
+    # Cuts the order into partitions of similar numbers of devices
+    partitions = [[]]
+    total = float(len(devices))
+    weight = 0
+
+    for unit in order:
+        if partitions[-1] and weight >= total * len(partitions) / num_partitions:
+            partitions.append([])
+
+        partitions[-1].extend(members[unit])
+        weight += len(members[unit])
+
+    return partitions
+
+def _components(devices):
+    """
+    Returns the lists of the specified devices that are connected by a
+    link or a flow, in the order of the specified devices.
+    """
+
+    parents = dict([(device, device) for device in devices])
+
+    def find(device):
+        """
+        Returns the device that stands for the component of the
+        specified device.
+        """
+
+        while parents[device] is not device:
+            parents[device] = parents[parents[device]]
+            device = parents[device]
+
+        return device
+
+    def union(first, second):
+        """
+        Merges the components of the specified devices.
+        """
+
+        parents[find(first)] = find(second)
+
+    for device in devices:
+        for port in _ports_of(device):
+            union(device, port.conn().dest().source())
+
+        if isinstance(device, Host):
+            for flow in device.get_flows().values():
+                union(device, flow.dest())
+
+    components = {}
+    for device in devices:
+        components.setdefault(find(device), []).append(device)
+
+    return sorted(components.values(), key=lambda component: min(map(str, component)))
+
+def _group(components, num_groups):
+    """
+    Splits the specified components into at most the specified number
+    of groups of similar numbers of devices, largest component first.
+    """
+
+    groups = [[] for i in xrange(min(num_groups, len(components)))]
+
+    for component in sorted(components, key=len, reverse=True):
+        min(groups, key=len).extend(component)
+
+    return groups
+
+def _pack(packet):
+    """
+    Returns the fields of the specified packet as plain values.
+    """
+
+    costs = packet._routing
+    if costs is not None:
+        costs = [(str(dest), cost) for (dest, cost) in costs.iteritems()]
+
+    data = []
+    if packet._data is not None:
+        data = packet._data.items()
+
+    return (packet._id, str(packet._source), str(packet._dest),
+            packet._bits_size, packet._create_time, packet._ack, costs, data)
+
+def _unpack(fields, devices):
+    """
+    Returns a packet with the specified fields, whose devices are
+    looked up by name in the specified dictionary.
+    """
+
+    (seq, source, dest, size, created, ack, costs, data) = fields
+
+    packet = Packet()
+
+    packet._id = seq
+    packet._source = devices[source]
+    packet._dest = devices[dest]
+    packet._bits_size = size
+    packet._create_time = created
+    packet._ack = ack
+
+    if costs is not None:
+        packet._routing = _Costs([(devices[name], cost) for (name, cost) in costs])
+
+    if data:
+        packet._data = dict(data)
+
+    return packet
+
+class _Costs(dict):
+    """
+    Costs carried by a routing packet from another partition, which
+    are iterated in the order the sending partition iterated them, as
+    the order decides between routes of equal cost.
+    """
+
+    def __init__(self, items):
+        """
+        Creates a _Costs instance with the specified list of
+        destinations and costs.
+        """
+
+        dict.__init__(self, items)
+
+        self._order = [dest for (dest, cost) in items]
+
+    def __iter__(self):
+        """
+        Iterates through the destinations.
+        """
+
+        return iter(self._order)
+
+    def __repr__(self):
+        """
+        Defines the string representation for a _Costs instance.
+        """
+
+        return '{%s}' % ', '.join(['%r: %r' % (dest, self[dest]) for dest in self._order])
+
+    def iterkeys(self):
+        """
+        Iterates through the destinations.
+        """
+
+        return iter(self._order)
+
+    def iteritems(self):
+        """
+        Iterates through the destinations and costs.
+        """
+
+        return iter([(dest, self[dest]) for dest in self._order])
+
+    def keys(self):
+        """
+        Returns the list of destinations.
+        """
+
+        return list(self._order)
+
+    def items(self):
+        """
+        Returns the list of destinations and costs.
+        """
+
+        return [(dest, self[dest]) for dest in self._order]
+
+def _next_time(simulation):
+    """
+    Returns the time of the next event of the specified simulation, or
+    None if there is none.
+    """
+
+    if simulation._now_queue:
+        return simulation._now
+
+    times = [event.scheduled() for (tick, event) in simulation._timers._timers.values()]
+
+    if len(simulation._event_queue) > 0:
+        times.append(simulation._event_queue.peek())
+
+    if not times:
+        return None
+
+    return min(times)
+
+def _trackers(simulation, flow_names, link_names):
+    """
+    Returns the state of the trackers of the specified measured flows
+    and links of the specified simulation.
+    """
+
+    flows = [(name, vars(simulation._measure_flows[name].getTracker()))
+             for name in flow_names]
+
+    links = [(name, dict([(key, value) for (key, value)
+                          in vars(simulation._measure_links[name].getTracker()).iteritems()
+                          if key != '_packet_entries']))
+             for name in link_names]
+
+    return (flows, links)
+
+def _ignore(time, size):
+    """
+    Discards a record meant for the tracker of another partition.
+    """
+
+    pass
+
+class _Pipe:
+    """
+    Pair of file descriptors carrying length-prefixed values.
+    """
+
+    def __init__(self, read_fd, write_fd):
+        """
+        Creates a _Pipe instance reading from and writing to the
+        specified file descriptors.
+        """
+
+        self._read_fd = read_fd
+        self._write_fd = write_fd
+
+    def _read(self, size):
+        """
+        Reads exactly the specified number of bytes, or returns None
+        if the other end was closed.
+        """
+
+        chunks = []
+
+        while size > 0:
+            chunk = os.read(self._read_fd, size)
+            if not chunk:
+                return None
+
+            chunks.append(chunk)
+            size -= len(chunk)
+
+        return ''.join(chunks)
+
+    def send(self, value):
+        """
+        Writes the specified value.
+        """
+
+        data = marshal.dumps(value)
+        data = struct.pack('<I', len(data)) + data
+
+        while data:
+            data = data[os.write(self._write_fd, data):]
+
+    def receive(self):
+        """
+        Reads the next value, or returns None if the other end was
+        closed.
+        """
+
+        header = self._read(4)
+        if header is None:
+            return None
+
+        (size,) = struct.unpack('<I', header)
+
+        return marshal.loads(self._read(size))
+
+    def close(self):
+        """
+        Closes both file descriptors.
+        """
+
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+def _translate(positions, i, time, position):
+    """
+    Returns the final position of an event of the partition of the
+    specified index at the specified time, given its provisional
+    position and the final positions of the times that several
+    partitions processed in the last window.
+    """
+
+    final = positions.get((i, time))
+
+    if final is None:
+        return position
+
+    return final[position]
+
+class _KeyHeap(Scheduler):
+    """
+    Future event set of a partition, which breaks ties between events
+    of the same time by the key of the event that pushed them, then by
+    the order they were pushed in by that event.
+    """
+
+    def __init__(self, partition):
+        """
+        Creates an empty _KeyHeap instance for the specified
+        partition.
+        """
+
+        self._partition = partition
+
+        self._heap = [] # [time, parent, push, seq, event]
+        self._seq = count(1).next
+
+        self._popped = None
+
+    # Overrides Scheduler.__len__()
+    def __len__(self):
+        """
+        Returns the number of scheduled events.
+        """
+
+        return len(self._heap)
+
+    # Overrides Scheduler.push(time, event)
+    def push(self, time, event):
+        """
+        Schedules the specified event at the specified time.
+        """
+
+        (parent, push) = self._partition._key(event)
+
+        heappush(self._heap, [time, parent, push, self._seq(), event])
+
+    # Overrides Scheduler.peek()
+    def peek(self):
+        """
+        Returns the time of the next event.
+        """
+
+        return self._heap[0][0]
+
+    # Overrides Scheduler.pop()
+    def pop(self):
+        """
+        Removes and returns the next event.
+        """
+
+        self._popped = heappop(self._heap)
+
+        return self._popped[4]
+
+    def popped(self):
+        """
+        Returns the key of the parent and the push order of the most
+        recently popped event.
+        """
+
+        return (self._popped[1], self._popped[2])
+
+    def reorder(self):
+        """
+        Restores the order of the heap once the keys of some parents
+        were given their final positions.
+        """
+
+        heapify(self._heap)
+
+class _HorizonWheel(TimerWheel):
+    """
+    Timer wheel of a partition, which leaves the timers at or after the
+    end of the current window armed, since a message may still cancel
+    them.
+    """
+
+    def __init__(self, partition, resolution):
+        """
+        Creates a _HorizonWheel instance for the specified partition
+        with the specified tick resolution.
+        """
+
+        TimerWheel.__init__(self, resolution)
+
+        self._partition = partition
+
+    # Overrides TimerWheel.expire(until)
+    def expire(self, until=None):
+        """
+        Removes and returns the events of every timer that expires
+        strictly before both the specified time and the end of the
+        current window.
+        """
+
+        horizon = self._partition._horizon
+
+        if horizon is not None and (until is None or horizon < until):
+            until = horizon
+
+        return TimerWheel.expire(self, until)
+
+class _Output:
+    """
+    Standard output or error of a process, which tags what is written
+    with the position of the current event in the order of the output.
+    """
+
+    softspace = 0
+
+    def __init__(self, simulation, stream):
+        """
+        Creates an _Output instance for the specified simulation, which
+        stands for the standard output if stream is 0, and for the
+        standard error if stream is 1.
+        """
+
+        self._simulation = simulation
+        self._stream = stream
+
+    def write(self, text):
+        """
+        Records the specified text.
+        """
+
+        self._simulation._output.append((self._simulation._tag(), self._stream, text))
+
+    def flush(self):
+        """
+        Does nothing, as the text is sent with each reply.
+        """
+
+        pass
+
+def _write(output):
+    """
+    Writes the specified text to the standard output or error, each
+    given as the last two values of an entry.
+    """
+
+    for entry in output:
+        if entry[-2]:
+            sys.stderr.write(entry[-1])
+        else:
+            sys.stdout.write(entry[-1])
+
+class _Partition(BaseSimulation):
+    """
+    Simulation of the devices of one partition, run in a forked
+    process.
+
+    Each event processed is keyed by its time and its position among
+    the events of its time, in a list that the events it pushes keep
+    as the key of their parent. The positions of a time that other
+    partitions also processed are provisional until the coordinator
+    sends their final values back.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, owners, index,
+                 trusted):
+        """
+        Creates a _Partition instance owning the devices mapped to the
+        specified index.
+        """
+
+        BaseSimulation.__init__(self, devices, measure_flows, measure_links,
+                            _KeyHeap(self), trusted)
+
+        self._owners = owners
+        self._index = index
+
+        self._named = dict([(str(device), device) for device in devices])
+
+        self._ports = []
+        for device in sorted(devices, key=str):
+            self._ports.extend(_ports_of(device))
+
+        self._port_index = dict([(port, p) for (p, port) in enumerate(self._ports)])
+
+        self._flows = []
+        for device in devices:
+            if isinstance(device, Host) and self._owns(device):
+                self._flows.extend(device.get_flows().values())
+
+        # Expires timers only up to the end of the window
+        self._horizon = None
+
+        self._timers = _HorizonWheel(self, clock.ticks(1))
+
+        for device in devices:
+            device.timers(self._timers)
+
+        # Key of the current event and order of its next push
+        self._record = None
+        self._push = 0
+
+        # Key of the next event pushed, if forced
+        self._forced = None
+
+        # Key of the latest arrival popped on each port fed by another
+        # partition
+        self._arrivals = {}
+
+        # Times processed in the window, with their numbers of events,
+        # and the keys and blocks of these events
+        self._times = []
+        self._counts = []
+        self._records = []
+        self._blocks = []
+        self._block_times = []
+
+        # Index of the first key of each time asked for by the
+        # coordinator
+        self._starts = {}
+
+        self._changes = []
+        self._outbox = []
+        self._output = []
+
+        # Number of receive events processed for other partitions
+        self._shadowed = 0
+
+        # Process and pipe of the copy of the partition kept while a
+        # window may run past the completion of the last flow
+        self._standby = None
+
+    def _owns(self, device):
+        """
+        Returns True if the specified device belongs to the partition,
+        and False otherwise.
+        """
+
+        return self._owners[device] == self._index
+
+    def _tag(self):
+        """
+        Returns the key of the current event, which orders what it
+        writes.
+        """
+
+        return self._record
+
+    def _key(self, event):
+        """
+        Returns the key of the parent and the push order of the
+        specified event, which is being pushed onto the scheduler.
+        """
+
+        if self._forced is not None:
+            return self._forced
+
+        key = (self._record, self._push)
+        self._push += 1
+
+        return key
+
+    # Overrides BaseSimulation.flow_completed(flow)
+    def flow_completed(self, flow):
+        """
+        Notes that the specified flow has completed with the current
+        event.
+        """
+
+        self._changes.append((self._record, -1))
+
+        BaseSimulation.flow_completed(self, flow)
+
+    # Overrides BaseSimulation.flow_resumed(flow)
+    def flow_resumed(self, flow):
+        """
+        Notes that the specified flow has data to send or acknowledge
+        again with the current event.
+        """
+
+        self._changes.append((self._record, 1))
+
+        BaseSimulation.flow_resumed(self, flow)
+
+    # Overrides BaseSimulation._initialize()
+    def _initialize(self):
+        """
+        Initializes the devices of the partition, and builds the table
+        of handlers, which drains the shadow buffers of the links to
+        other partitions.
+        """
+
+        # Keys the first events of each device in the order the devices
+        # are initialized, before any other event
+        for (i, device) in enumerate(self._devices):
+            if self._owns(device):
+                self._record = [_INIT, i]
+                self._push = 1
+
+                device.initialize()
+
+        shadow = [None] * len(Event._NAMES)
+        shadow[Event._RECEIVE] = self._shadow_receive
+
+        self._handlers = {}
+
+        for device in self._devices:
+            if not self._owns(device):
+                continue
+
+            handlers = device.handlers()
+
+            for port in _ports_of(device):
+                self._handlers[port] = handlers
+
+                peer = port.conn().dest()
+                if not self._owns(peer.source()):
+                    self._handlers[peer] = shadow
+
+        # Drops the records that other partitions make themselves
+        for device in self._devices:
+            if not self._owns(device):
+                for port in _ports_of(device):
+                    port.conn().getTracker().record_buffer_size = _ignore
+
+    # Overrides BaseSimulation._pop()
+    def _pop(self):
+        """
+        Pops the next event off of the event queue, keys it with its
+        position among the events of its time, and records the block of
+        events it starts, or adds it to the current block.
+        """
+
+        start = len(self._records)
+
+        if self._now_queue:
+            time = self._now
+
+            # Expired timers start a block of their own, keyed by the
+            # event they followed
+            if self._now_queue[0].action() == Event._TIMEOUT:
+                self._blocks.append((time, start, _EXPIRED, self._record, self._push,
+                                     -1, False))
+                self._block_times.append(time)
+
+        else:
+            time = self._event_queue.peek()
+
+        if self._times and self._times[-1] == time:
+            position = self._counts[-1]
+            self._counts[-1] += 1
+        else:
+            position = 0
+            self._times.append(time)
+            self._counts.append(1)
+
+        self._record = [time, position]
+        self._records.append(self._record)
+
+        # Reserves the first push for the next arrival of a channel
+        self._push = 0
+
+        if self._now_queue:
+            event = BaseSimulation._pop(self)
+
+        else:
+            event = BaseSimulation._pop(self)
+
+            (parent, push) = self._event_queue.popped()
+
+            p = -1
+            shadow = False
+
+            # Notes the arrivals on the links between partitions
+            if event.action() == Event._RECEIVE:
+                port = event.port()
+
+                if not self._owns(port.source()):
+                    shadow = True
+                    p = self._port_index[port]
+
+                elif not self._owns(port.conn().dest().source()):
+                    p = self._port_index[port]
+                    self._arrivals[port] = self._record
+
+            self._blocks.append((time, start, _PUSHED, parent, push, p, shadow))
+            self._block_times.append(time)
+
+        self._push = 1
+
+        return event
+
+    def _shadow_receive(self, event):
+        """
+        Pops the packet at the head of the shadow buffer of the
+        specified receive event, and records the buffer size as the
+        receiving device would.
+        """
+
+        time = event.scheduled()
+        queue = event.port().incoming()
+
+        record = event.port().conn().dest().conn().record_buffer_size
+
+        record(time, len(queue))
+
+        if queue:
+            queue.popleft()
+
+        record(time, len(queue))
+
+        self._shadowed += 1
+
+    # Overrides BaseSimulation.push(event)
+    def push(self, event):
+        """
+        Pushes the specified event onto the event queue, and sends a
+        message for the receive events of other partitions, which are
+        kept as shadows.
+        """
+
+        if event.action() == Event._RECEIVE:
+            device = event.port().source()
+
+            if not self._owns(device):
+                self._outbox.append((self._owners[device], event.scheduled(),
+                                     self._record, self._push,
+                                     self._port_index[event.port()],
+                                     _pack(event.packet())))
+
+        BaseSimulation.push(self, event)
+
+    def _blocks_at(self, times):
+        """
+        Returns the blocks of events of each of the specified times,
+        where a block is an event popped off the scheduler followed by
+        the events it spawned for the same time, with its key.
+        """
+
+        reply = []
+
+        for time in times:
+            first = bisect_left(self._block_times, time)
+            last = bisect_right(self._block_times, time)
+
+            self._starts[time] = self._blocks[first][1]
+
+            blocks = []
+
+            for k in xrange(first, last):
+                (time, start, kind, parent, push, p, shadow) = self._blocks[k]
+
+                end = len(self._records)
+                if k + 1 < len(self._blocks):
+                    end = self._blocks[k + 1][1]
+
+                blocks.append(((kind, parent[0], parent[1], push), end - start, p, shadow))
+
+            reply.append(blocks)
+
+        return reply
+
+    def _relabel(self, positions):
+        """
+        Gives the events of the specified times of the last window
+        their final positions.
+        """
+
+        for (time, final) in positions:
+            start = self._starts[time]
+
+            for (k, position) in enumerate(final):
+                self._records[start + k][1] = position
+
+        # Shadows take the positions of their arrivals, which may move
+        # them past other events of the partition
+        self._event_queue.reorder()
+
+    def _clear(self):
+        """
+        Forgets the events processed in the last window.
+        """
+
+        self._times = []
+        self._counts = []
+        self._records = []
+        self._blocks = []
+        self._block_times = []
+
+        self._starts = {}
+
+    def _deliver(self, messages):
+        """
+        Appends the packets of the specified messages to the incoming
+        buffers of their ports, and pushes their receive events.
+        """
+
+        for (time, parent_time, parent_position, push, p, fields) in messages:
+            port = self._ports[p]
+            packet = _unpack(fields, self._named)
+
+            port.incoming().append(packet)
+
+            # A packet sent while the previous arrival on the port was
+            # pending is scheduled once that arrival is popped
+            parent = [parent_time, parent_position]
+            last = self._arrivals.get(port)
+
+            if not self._channels.get(port) and last is not None and last > parent:
+                self._forced = (last, 0)
+            else:
+                self._forced = (parent, push)
+
+            self.push(POOL.create(time, port, Event._RECEIVE, packet))
+
+            self._forced = None
+
+    def _report(self):
+        """
+        Returns the state of the partition sent with each reply.
+        """
+
+        incomplete = [flow for flow in self._flows if not flow.is_complete()]
+        draining = not [flow for flow in incomplete if flow.has_data()]
+
+        changes = [(record[0], record[1], change) for (record, change) in self._changes]
+
+        outbox = [(j, time, record[0], record[1], push, p, fields)
+                  for (j, time, record, push, p, fields) in self._outbox]
+
+        output = [(record[0], record[1], stream, text)
+                  for (record, stream, text) in self._output]
+
+        (self._changes, self._outbox, self._output) = ([], [], [])
+
+        return (len(incomplete), draining, _next_time(self),
+                self._processed - self._shadowed, self._now,
+                self._times, self._counts, changes, outbox, output)
+
+    def _fork_standby(self):
+        """
+        Forks a copy of the partition that waits until it is told how
+        many events of the window to replay, or until it is dismissed.
+
+        Returns None in the partition, and the number of events to
+        replay in the copy once the partition hands over to it.
+        """
+
+        (read_fd, write_fd) = os.pipe()
+
+        pid = os.fork()
+
+        if pid:
+            os.close(read_fd)
+            self._standby = (pid, write_fd)
+
+            return None
+
+        os.close(write_fd)
+
+        data = os.read(read_fd, 8)
+        os.close(read_fd)
+
+        # Exits once dismissed
+        if len(data) < 8:
+            os._exit(0)
+
+        return struct.unpack('<q', data)[0]
+
+    def _dismiss(self):
+        """
+        Stops the standby copy of the partition, if any.
+        """
+
+        if self._standby is not None:
+            (pid, write_fd) = self._standby
+            self._standby = None
+
+            os.close(write_fd)
+            os.waitpid(pid, 0)
+
+    def _hand_over(self, max_events):
+        """
+        Tells the standby copy of the partition to replay the specified
+        number of events of the window and to serve in its place, then
+        exits.
+        """
+
+        (pid, write_fd) = self._standby
+
+        os.write(write_fd, struct.pack('<q', max_events))
+        os._exit(0)
+
+    def _step(self, until, speculative):
+        """
+        Processes the events scheduled before the specified time. If
+        speculative, the last flow may complete within the window, so a
+        standby copy of the partition is kept to replay the window up
+        to the completing event.
+        """
+
+        self._horizon = until
+        self._finished = False
+
+        # Completion is decided by the coordinator
+        self._incomplete = len([flow for flow in self._flows if not flow.is_complete()]) + 1
+
+        max_events = None
+        if speculative:
+            max_events = self._fork_standby()
+
+        self._advance(until, max_events)
+
+        return self._report()
+
+    def serve(self, pipe):
+        """
+        Initializes the partition and answers the requests read from
+        the specified pipe until told to stop.
+
+        Each request to run carries the final positions of the times
+        of the previous window that other partitions also processed,
+        if any, and the messages for the partition.
+        """
+
+        sys.stdout = _Output(self, 0)
+        sys.stderr = _Output(self, 1)
+
+        self._initialize()
+
+        while True:
+            request = pipe.receive()
+
+            if request is None or request[0] == _STOP:
+                break
+
+            action = request[0]
+
+            if action == _RANK:
+                pipe.send(self._blocks_at(request[1]))
+                continue
+
+            if action == _REPLAY:
+                self._hand_over(request[1])
+
+            # Keeps the window run as is
+            self._dismiss()
+
+            (positions, messages) = request[1:3]
+
+            if positions:
+                self._relabel(positions)
+
+            self._clear()
+            self._deliver(messages)
+
+            if action == _POLL:
+                pipe.send(self._report())
+
+            elif action == _STEP:
+                pipe.send(self._step(*request[3:]))
+
+            elif action == _GATHER:
+                pipe.send(_trackers(self, *request[3:]))
+
+        self._dismiss()
+
+class _Group(BaseSimulation):
+    """
+    Simulation of a group of connected components, run in a forked
+    process.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler,
+                 trusted):
+        """
+        Creates a _Group instance with the specified list of devices.
+        """
+
+        BaseSimulation.__init__(self, devices, measure_flows, measure_links,
+                            scheduler, trusted)
+
+        self._output = []
+
+    def _tag(self):
+        """
+        Returns the time of the current event, which orders what it
+        writes.
+        """
+
+        return self._now
+
+    def _report(self):
+        """
+        Returns the state of the group sent with each reply.
+        """
+
+        output = self._output
+        self._output = []
+
+        return (self._incomplete, self._finished, _next_time(self), self._now,
+                self._processed, output)
+
+    def _run(self, until, max_events, deadline, waiting):
+        """
+        Processes events until the flows of the group complete, or
+        until any of the specified bounds is reached. If waiting, the
+        flows of other groups are still incomplete, so the events of
+        the group are processed past the completion of its own flows.
+        """
+
+        if waiting:
+            self._finished = False
+            self._incomplete += 1
+
+        self._advance(until, max_events, deadline)
+
+        if waiting:
+            self._incomplete -= 1
+
+        return self._report()
+
+    def serve(self, pipe):
+        """
+        Initializes the group and answers the requests read from the
+        specified pipe until told to stop.
+        """
+
+        sys.stdout = _Output(self, 0)
+
+        self._prepare()
+
+        while True:
+            request = pipe.receive()
+
+            if request is None or request[0] == _STOP:
+                break
+
+            if request[0] == _POLL:
+                pipe.send(self._report())
+
+            elif request[0] == _STEP:
+                pipe.send(self._run(*request[1:]))
+
+            elif request[0] == _GATHER:
+                pipe.send(_trackers(self, *request[1:]))
+
+class ParallelSimulation(BaseSimulation):
+    """
+    Simulation that runs partitions of the devices in parallel
+    processes.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler=None,
+                 trusted=False, partitions=2):
+        """
+        Creates a ParallelSimulation instance with the specified list
+        of devices split into the specified number of partitions.
+
+        Each partition orders its events with its own heap, so the
+        specified scheduler is only used to check the arguments.
+        """
+
+        BaseSimulation.__init__(self, devices, measure_flows, measure_links,
+                            scheduler, trusted)
+
+        # Checks that partitions is an int
+        if not isinstance(partitions, int):
+            raise TypeError, 'number of partitions must be an int'
+
+        # Checks that partitions is positive
+        elif partitions <= 0:
+            raise ValueError, 'number of partitions must be positive'
+
+        self._trusted = trusted
+
+        self._partitions = _partition(devices, partitions)
+
+        self._owners = {}
+        for (i, owned) in enumerate(self._partitions):
+            for device in owned:
+                self._owners[device] = i
+
+        # Finds the shortest delay of the links between partitions,
+        # and of every link
+        lookahead = None
+        shortest = None
+
+        for device in devices:
+            for port in _ports_of(device):
+                link = port.conn()
+                delay = link.delay()
+
+                if shortest is None or delay < shortest:
+                    shortest = delay
+
+                if self._owners[link.dest().source()] != self._owners[device]:
+                    if lookahead is None or delay < lookahead:
+                        lookahead = delay
+
+        # Checks that the partitions have lookahead
+        if lookahead is not None and lookahead <= 0:
+            raise ValueError, 'links between partitions must have a positive delay'
+
+        # No flow can complete within a window shorter than a round
+        # trip unless it already sent all of its data, so the windows
+        # that may run past the completion are those that start once
+        # every incomplete flow is draining
+        self._width = lookahead
+        if shortest is not None and shortest > 0 and self._num_flows > 0:
+            if self._width is None or 2 * shortest < self._width:
+                self._width = 2 * shortest
+
+        self._lps = []
+
+    # Overrides BaseSimulation._initialize()
+    def _initialize(self):
+        """
+        Forks a process for each partition, which initializes its
+        devices, and reads their first state.
+        """
+
+        num_lps = len(self._partitions)
+
+        self._incompletes = [0] * num_lps
+        self._drainings = [True] * num_lps
+        self._next_times = [None] * num_lps
+        self._lp_processed = [0] * num_lps
+        self._nows = [None] * num_lps
+
+        self._inboxes = [[] for i in xrange(num_lps)]
+        self._positions = [None] * num_lps
+
+        for i in xrange(num_lps):
+            (down_read, down_write) = os.pipe()
+            (up_read, up_write) = os.pipe()
+
+            # Flushes the output so that the children do not repeat it
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            pid = os.fork()
+
+            if pid == 0:
+                os.close(down_write)
+                os.close(up_read)
+
+                # Closes the pipes of the partitions forked before
+                for (other, pipe) in self._lps:
+                    pipe.close()
+
+                try:
+                    partition = _Partition(self._devices, self._measure_flows,
+                                           self._measure_links, self._owners, i,
+                                           self._trusted)
+                    partition.serve(_Pipe(down_read, up_write))
+                finally:
+                    os._exit(0)
+
+            os.close(down_read)
+            os.close(up_write)
+
+            self._lps.append((pid, _Pipe(up_read, down_write)))
+
+        for i in xrange(num_lps):
+            self._request(i, _POLL)
+
+        self._collect(range(num_lps))
+
+    def _request(self, i, action, *args):
+        """
+        Sends the specified request to the partition of the specified
+        index, with the final positions of the times of its previous
+        window that other partitions also processed, and its messages.
+        """
+
+        self._lps[i][1].send((action, self._positions[i], self._inboxes[i]) + args)
+
+        self._positions[i] = None
+        self._inboxes[i] = []
+
+    def _receive(self, i):
+        """
+        Returns the reply of the partition of the specified index.
+        """
+
+        reply = self._lps[i][1].receive()
+
+        # Checks that the partition is still running
+        if reply is None:
+            raise RuntimeError, 'partition %d exited unexpectedly' % i
+
+        return reply
+
+    def _update(self, i, reply):
+        """
+        Notes the state of the partition of the specified index from
+        the specified reply.
+        """
+
+        (self._incompletes[i], self._drainings[i], self._next_times[i],
+         self._lp_processed[i], self._nows[i]) = reply[:5]
+
+    def _merge(self, time, runs, positions):
+        """
+        Orders the events of the specified time as the sequential
+        engine would have processed them, and adds the final position
+        of each event of each partition to the specified dictionary.
+
+        Each run holds the index of a partition and its blocks of
+        events, where a block is an event popped off the scheduler
+        followed by the events it spawned for the same time.
+        """
+
+        ordered = []
+
+        for (i, blocks) in runs:
+            n = 0
+
+            for ((kind, parent_time, parent_position, push), size, p, shadow) in blocks:
+                # Shadows are ordered by their arrivals
+                if not shadow:
+                    parent_position = _translate(positions, i, parent_time, parent_position)
+
+                    ordered.append(((kind, parent_time, parent_position, push), i, n, size, p))
+
+                n += size
+
+            positions[(i, time)] = [None] * n
+
+        ordered.sort()
+
+        arrivals = {}
+        position = 0
+
+        for (key, i, n, size, p) in ordered:
+            final = positions[(i, time)]
+
+            for q in xrange(size):
+                final[n + q] = position + q
+
+            if p >= 0:
+                arrivals.setdefault(p, deque()).append(position)
+
+            position += size
+
+        # Gives each shadow the position of its arrival, as a link
+        # delivers its packets in order
+        for (i, blocks) in runs:
+            n = 0
+
+            for (key, size, p, shadow) in blocks:
+                if shadow:
+                    positions[(i, time)][n] = arrivals[p].popleft()
+
+                n += size
+
+    def _rank(self, replies):
+        """
+        Returns the final positions of the events of the times that
+        several of the partitions of the specified replies processed,
+        by partition and time.
+        """
+
+        # Finds the times processed by more than one partition
+        seen = set()
+        shared = set()
+
+        for (i, reply) in replies:
+            times = set(reply[5])
+
+            shared |= seen & times
+            seen |= times
+
+        positions = {}
+
+        if not shared:
+            return positions
+
+        runs = {}
+
+        for (i, reply) in replies:
+            times = sorted(shared.intersection(reply[5]))
+
+            if times:
+                self._lps[i][1].send((_RANK, times))
+
+                for (time, blocks) in zip(times, self._receive(i)):
+                    runs.setdefault(time, []).append((i, blocks))
+
+        # Ranks the earlier times first, as they key the later ones
+        for time in sorted(shared):
+            self._merge(time, runs[time], positions)
+
+        return positions
+
+    def _completion(self, incomplete, replies, positions):
+        """
+        Returns the key of the event after which no flow is
+        incomplete, given the specified number of incomplete flows
+        before the window, or None if every partition ran the window
+        before the last flow completed.
+        """
+
+        first = None
+        changes = []
+
+        for (i, reply) in replies:
+            times = reply[5]
+
+            if times and (first is None or times[0] < first[0]):
+                first = (times[0], 0)
+
+            changes.extend([((time, _translate(positions, i, time, position)), change)
+                            for (time, position, change) in reply[7]])
+
+        # Completion is checked once the first event was processed
+        if not incomplete:
+            return first
+
+        changes.sort()
+
+        for (k, (key, change)) in enumerate(changes):
+            incomplete += change
+
+            if not incomplete and (k + 1 == len(changes) or changes[k + 1][0] != key):
+                return key
+
+        return None
+
+    def _replay(self, last, replies, positions):
+        """
+        Replaces the partitions of the specified replies that ran past
+        the event of the specified key by their standby copies, which
+        replay the window up to that event.
+        """
+
+        (last_time, last_position) = last
+
+        replayed = []
+
+        for (i, reply) in replies:
+            (times, counts) = reply[5:7]
+
+            max_events = 0
+
+            for (time, num_events) in zip(times, counts):
+                if time < last_time:
+                    max_events += num_events
+
+                elif time == last_time:
+                    final = positions.get((i, time))
+
+                    if final is None:
+                        max_events += last_position + 1
+                    else:
+                        max_events += len([position for position in final
+                                           if position <= last_position])
+
+            if max_events < sum(counts):
+                self._lps[i][1].send((_REPLAY, max_events))
+                replayed.append(i)
+
+        for i in replayed:
+            self._update(i, self._receive(i))
+
+    def _collect(self, indices, speculative=False):
+        """
+        Reads the replies of the partitions of the specified indices to
+        a window, orders the events of the times that several of them
+        processed, routes their messages and writes their output.
+
+        If speculative, the partitions that ran past the completion of
+        the last flow replay the window up to it, and what they did
+        after it is dropped.
+        """
+
+        incomplete = sum(self._incompletes)
+
+        replies = [(i, self._receive(i)) for i in indices]
+
+        for (i, reply) in replies:
+            self._update(i, reply)
+
+        positions = self._rank(replies)
+
+        last = None
+        if speculative:
+            last = self._completion(incomplete, replies, positions)
+
+        if last is not None:
+            self._replay(last, replies, positions)
+            self._finished = True
+
+        output = []
+
+        for (i, reply) in replies:
+            (outbox, lines) = reply[8:]
+
+            for (j, time, parent_time, parent_position, push, p, fields) in outbox:
+                parent = (parent_time, _translate(positions, i, parent_time, parent_position))
+
+                if last is None or parent <= last:
+                    self._inboxes[j].append((time, parent[0], parent[1], push, p, fields))
+
+            for (k, (time, position, stream, text)) in enumerate(lines):
+                key = (time, _translate(positions, i, time, position))
+
+                if last is None or key <= last:
+                    output.append((key, i, k, stream, text))
+
+            self._positions[i] = [(time, final) for ((j, time), final)
+                                  in positions.iteritems() if j == i]
+
+        self._processed = sum(self._lp_processed)
+
+        nows = [now for now in self._nows if now is not None]
+        if nows:
+            self._now = max(nows)
+
+        # Writes the output in the order it was written sequentially
+        output.sort()
+
+        _write(output)
+
+    def _next_start(self):
+        """
+        Returns the time of the earliest pending event or message, or
+        None if there is none.
+        """
+
+        times = [time for time in self._next_times if time is not None]
+
+        for inbox in self._inboxes:
+            times.extend([message[0] for message in inbox])
+
+        if not times:
+            return None
+
+        return min(times)
+
+    # Overrides BaseSimulation._advance(until, max_events, deadline)
+    def _advance(self, until=None, max_events=None, deadline=None):
+        """
+        Runs windows of the partitions in parallel until completion,
+        or until the next event is scheduled at or after the specified
+        time. The specified number of events and wall-clock deadline
+        are checked between windows.
+        """
+
+        processed = self._processed
+        tracked = self._num_flows > 0
+
+        while not self._finished:
+            # Stops once the number of events or the time is exhausted
+            if max_events is not None and self._processed - processed >= max_events:
+                break
+
+            if deadline is not None and wall_clock() >= deadline:
+                break
+
+            start = self._next_start()
+
+            if start is None:
+                self._finished = True
+                break
+
+            # Stops before the first event at or after the horizon
+            if until is not None and start >= until:
+                break
+
+            end = until
+            if self._width is not None and (end is None or start + self._width < end):
+                end = start + self._width
+
+            # Keeps a standby copy of each partition once the last flow
+            # may complete within the window
+            speculative = tracked and False not in self._drainings
+
+            for i in xrange(len(self._lps)):
+                self._request(i, _STEP, end, speculative)
+
+            self._collect(range(len(self._lps)), speculative)
+
+    def _gather(self):
+        """
+        Copies the trackers of the measured flows and links back from
+        the partitions that own them.
+        """
+
+        flow_names = [[] for owned in self._partitions]
+        link_names = [[] for owned in self._partitions]
+
+        for device in self._devices:
+            if isinstance(device, Host):
+                for flow in device.get_flows().values():
+                    for (name, measured) in self._measure_flows.iteritems():
+                        if measured is flow:
+                            flow_names[self._owners[device]].append(name)
+
+        # The tracker of a link is kept by the device sending on it
+        for (name, link) in self._measure_links.iteritems():
+            sender = link.dest().conn().dest().source()
+            link_names[self._owners[sender]].append(name)
+
+        for i in xrange(len(self._lps)):
+            self._request(i, _GATHER, flow_names[i], link_names[i])
+
+            (flows, links) = self._receive(i)
+
+            for (name, state) in flows:
+                self._measure_flows[name].getTracker().__dict__.update(state)
+
+            for (name, state) in links:
+                self._measure_links[name].getTracker().__dict__.update(state)
+
+    def _stop(self):
+        """
+        Stops the processes of the partitions.
+        """
+
+        for (pid, pipe) in self._lps:
+            pipe.send((_STOP,))
+            pipe.close()
+
+            os.waitpid(pid, 0)
+
+        self._lps = []
+
+    # Overrides BaseSimulation._finalize()
+    def _finalize(self):
+        """
+        Gathers the trackers from the partitions, stops them, and
+        finalizes the simulation.
+        """
+
+        if self._lps:
+            self._gather()
+            self._stop()
+
+        return BaseSimulation._finalize(self)
+
+class ComponentSimulation(ParallelSimulation):
+    """
+    Simulation that runs groups of the connected components of the
+    devices in parallel processes.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler=None,
+                 trusted=False, processes=None):
+        """
+        Creates a ComponentSimulation instance with the specified list
+        of devices, whose connected components are split into at most
+        the specified number of groups, one per processor by default.
+        """
+
+        BaseSimulation.__init__(self, devices, measure_flows, measure_links,
+                            scheduler, trusted)
+
+        # Defaults to one group per processor
+        if processes is None:
+            processes = cpu_count()
+
+        # Checks that processes is an int
+        if not isinstance(processes, int):
+            raise TypeError, 'number of processes must be an int'
+
+        # Checks that processes is positive
+        elif processes <= 0:
+            raise ValueError, 'number of processes must be positive'
+
+        self._trusted = trusted
+
+        self._partitions = _group(_components(devices), processes)
+
+        self._owners = {}
+        for (i, owned) in enumerate(self._partitions):
+            for device in owned:
+                self._owners[device] = i
+
+        self._lps = []
+
+    # Overrides ParallelSimulation._initialize()
+    def _initialize(self):
+        """
+        Forks a process for each group, which initializes its devices,
+        and reads their first state.
+        """
+
+        num_lps = len(self._partitions)
+
+        self._incompletes = [0] * num_lps
+        self._lp_finished = [False] * num_lps
+        self._next_times = [None] * num_lps
+        self._lp_processed = [0] * num_lps
+
+        # Keeps the order of the devices within each group
+        groups = [[device for device in self._devices if self._owners[device] == i]
+                  for i in xrange(num_lps)]
+
+        for i in xrange(num_lps):
+            (down_read, down_write) = os.pipe()
+            (up_read, up_write) = os.pipe()
+
+            # Flushes the output so that the children do not repeat it
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            pid = os.fork()
+
+            if pid == 0:
+                os.close(down_write)
+                os.close(up_read)
+
+                # Closes the pipes of the groups forked before
+                for (other, pipe) in self._lps:
+                    pipe.close()
+
+                # Orders the events of the group with the copy of the
+                # scheduler, which is still empty
+                try:
+                    group = _Group(groups[i], self._measure_flows,
+                                   self._measure_links, self._event_queue,
+                                   self._trusted)
+                    group.serve(_Pipe(down_read, up_write))
+                finally:
+                    os._exit(0)
+
+            os.close(down_read)
+            os.close(up_write)
+
+            self._lps.append((pid, _Pipe(up_read, down_write)))
+
+        for i in xrange(num_lps):
+            self._request(i, _POLL)
+
+        self._collect(range(num_lps), [])
+
+    # Overrides ParallelSimulation._request(i, action, *args)
+    def _request(self, i, action, *args):
+        """
+        Sends the specified request to the group of the specified
+        index.
+        """
+
+        self._lps[i][1].send((action,) + args)
+
+    # Overrides ParallelSimulation._collect(indices, speculative)
+    def _collect(self, indices, output):
+        """
+        Reads the replies of the groups of the specified indices, and
+        appends what they wrote to the specified list.
+        """
+
+        for i in indices:
+            (incomplete, finished, next_time, now, processed, lines) = self._receive(i)
+
+            self._incompletes[i] = incomplete
+            self._lp_finished[i] = finished
+            self._next_times[i] = next_time
+            self._lp_processed[i] = processed
+
+            if now is not None and (self._now is None or now > self._now):
+                self._now = now
+
+            output.extend([(time, i, k, stream, text)
+                           for (k, (time, stream, text)) in enumerate(lines)])
+
+        self._processed = sum(self._lp_processed)
+
+    def _run_groups(self, indices, until, max_events, deadline, waiting, output):
+        """
+        Runs the groups of the specified indices in parallel with the
+        specified bounds, and appends what they wrote to the specified
+        list.
+        """
+
+        for i in indices:
+            self._request(i, _STEP, until, max_events, deadline, waiting)
+
+        self._collect(indices, output)
+
+    # Overrides ParallelSimulation._advance(until, max_events, deadline)
+    def _advance(self, until=None, max_events=None, deadline=None):
+        """
+        Runs the groups in parallel until completion, or until any of
+        the specified bounds is reached. The specified number of events
+        bounds the events of each group.
+        """
+
+        tracked = self._num_flows > 0
+        num_lps = len(self._lps)
+
+        output = []
+
+        while not self._finished:
+            # Runs the groups until their own flows complete, or until
+            # their events run out if no host has a flow
+            if tracked:
+                running = [i for i in xrange(num_lps) if self._incompletes[i]]
+            else:
+                running = [i for i in xrange(num_lps) if not self._lp_finished[i]]
+
+            self._run_groups(running, until, max_events, deadline, False, output)
+
+            if not tracked:
+                self._finished = False not in self._lp_finished
+                break
+
+            idle = [i for i in xrange(num_lps) if i not in running or not self._incompletes[i]]
+
+            # Brings the other groups up to the time the last flow
+            # completed, as the sequential engine would have processed
+            # their events until then
+            if not sum(self._incompletes):
+                self._run_groups(idle, self._now, None, None, True, output)
+
+                # A flow may have resumed in the meantime
+                self._finished = not sum(self._incompletes)
+                continue
+
+            # Otherwise, brings the groups whose flows completed up to
+            # the earliest event left by the bounds of the others
+            times = [self._next_times[i] for i in running
+                     if self._incompletes[i] and self._next_times[i] is not None]
+
+            if until is not None:
+                times.append(until)
+
+            if times:
+                self._run_groups(idle, min(times), max_events, deadline, True, output)
+
+            break
+
+        # Writes the output in the order of its time, then of its group
+        output.sort()
+
+        _write(output)
@@ -1,9 +1,10 @@
 import sys
 
+import clock
 from congestion.aimd import AIMD
 from conn import Port
 from device import Device
-from event import Event
+from event import Event, POOL
 from flow import Flow
 from routing.algorithm import RoutingAlgorithm
 from packet import Packet
@@ -90,7 +91,7 @@ def _create_ack(self, packet):
         ack.set_create_time(packet.get_create_time())
         ack.seq(num)
         ack.size(Packet._ACK_SIZE)
-        ack.datum(Packet._ACK, True)
+        ack.ack(True)
 
         return ack
 
@@ -100,13 +101,7 @@ def _create_event(self, time, port, action, packet):
         and packet.
         """
 
-        event = Event()
-        event.scheduled(time)
-        event.port(port)
-        event.action(action)
-        event.packet(packet)
-
-        return event
+        return POOL.create(time, port, action, packet)
 
     # Overrides Device.initialize()
     def initialize(self):
@@ -114,8 +109,6 @@ def initialize(self):
         Initializes the router.
         """
 
-        events = []
-
         # Creates a flow for each neighbor of the router
         for dest in self.neighbors():
             if not isinstance(dest, Router):
@@ -148,11 +141,9 @@ def initialize(self):
 
             # Creates an event for the starting time of the flow
             create_event = self._create_event(flow.start(), port, Event._CREATE, packet)
-            events.append(create_event)
-
-        self._next_update += Router._UPDATE_EVERY
+            self._push(create_event)
 
-        return events
+        self._next_update += clock.ticks(Router._UPDATE_EVERY)
 
     def _schedule(self, time, packet, link):
         """
@@ -162,7 +153,7 @@ def _schedule(self, time, packet, link):
 
         next_time = max(self._most_recent.get(link, time), time)
 
-        trans_delay = float(packet.size()) / float(link.rate())
+        trans_delay = clock.transmission(packet.size(), link.rate())
         self._most_recent[link] = next_time + trans_delay
 
         return next_time
@@ -172,8 +163,6 @@ def _handle_create(self, event):
         Handles create events.
         """
 
-        events = []
-
         time = event.scheduled()
         packet = event.packet()
 
@@ -201,17 +190,13 @@ def _handle_create(self, event):
             send_time = self._schedule(time, packet, link)
 
             routing_event = self._create_event(send_time, next_port, Event._SEND, packet)
-            events.append(routing_event)
-
-        return events
+            self._push(routing_event)
 
     def _handle_receive(self, event):
         """
         Handles receive events.
         """
 
-        events = []
-
         time = event.scheduled()
         packet = event.packet()
 
@@ -220,7 +205,7 @@ def _handle_receive(self, event):
             dest = packet.source()
 
             # TODO: handle acknowledgment received
-            if packet.has_datum(Packet._ACK):
+            if packet.ack():
                 # Updates packet statistics of flow
                 flow = self._flows.get(dest)
 
@@ -234,7 +219,7 @@ def _handle_receive(self, event):
                     # if not self._changed[dest]:
                     if not self._should_update:
                         next_time = self._next_update
-                        self._next_update += Router._UPDATE_EVERY
+                        self._next_update += clock.ticks(Router._UPDATE_EVERY)
 
                     self._changed[dest] = False
                     self._should_update = False
@@ -248,13 +233,13 @@ def _handle_receive(self, event):
 
                         # Creates a create event for the current time
                         create_event = self._create_event(next_time, next_port, Event._CREATE, next_packet)
-                        events.append(create_event)
+                        self._push(create_event)
 
             else:
                 changed = False
 
                 # Updates the routing and cost information if necessary
-                if packet.has_datum(self._algorithm._TYPE):
+                if packet.routing() is not None:
                     changed = self._algorithm.update(time, packet)
 
                 next_port = self._algorithm.next(dest)
@@ -270,7 +255,7 @@ def _handle_receive(self, event):
                 send_time = self._schedule(time, ack, link)
 
                 ack_event = self._create_event(send_time, next_port, Event._SEND, ack)
-                events.append(ack_event)
+                self._push(ack_event)
 
                 self._changed[dest] = changed
                 self._should_update |= changed
@@ -291,17 +276,13 @@ def _handle_receive(self, event):
 
                 # Creates a send event at the current time
                 next_event = self._create_event(send_time, next_port, Event._SEND, packet)
-                events.append(next_event)
-        
-        return events
+                self._push(next_event)
 
     def _handle_send(self, event):
         """
         Handles send events.
         """
 
-        events = []
-
         time = event.scheduled()
         port = event.port()
         packet = event.packet()
@@ -317,7 +298,7 @@ def _handle_send(self, event):
             queue.append(packet) # append right, pop left
             
             spawned_event = self._create_event(time + prop_delay, dest, Event._RECEIVE, packet)
-            events.append(spawned_event)
+            self._push(spawned_event)
         
         else: # no room, record the dropped packet
             link.record_packet_loss(time+prop_delay)
@@ -330,23 +311,19 @@ def _handle_send(self, event):
                 flow.analyze(event, link)
                 # print >> sys.stderr, 'Router %s has sent %d packets at %s%s' % (self, len(flow._tracker._times_sent), flow.dest(), flow._tracker._times_sent)
 
-        if event.action() == Event._SEND and not packet.has_datum(Packet._ACK):
+        if event.action() == Event._SEND and not packet.ack():
             link.record_sent(time, packet.size())
 
         # TODO: create timeout event at timeout length later
 
         # TODO: create send event at tranmission delay later
-        trans_delay = float(packet.size()) / float(link.rate())
-
-        return events
+        trans_delay = clock.transmission(packet.size(), link.rate())
 
     def _handle_timeout(self, event):
         """
         Handles timeout events.
         """
 
-        events = []
-
         time = event.scheduled()
         port = event.port()
         packet = event.packet()
@@ -361,61 +338,68 @@ def _handle_timeout(self, event):
 
         # TODO: necessary to create send event at current time?
 
-        return events
-
-    # Overrides Device.process(event)
-    def process(self, event):
+    def _receive(self, event):
         """
-        Processes the specified event.
+        Pops the packet at the head of the incoming queue and handles
+        it.
         """
 
-        events = []
-
         time = event.scheduled()
-        action = event.action()
         port = event.port()
         link = port.conn()
 
-        if action == Event._CREATE:
-            events.extend(self._handle_create(event))
+        link.dest().conn().record_buffer_size(time, len(port.incoming()))
+
+        # Processes all received packets
+        if port.incoming():
+            # Pops the packet off the head of the queue
+            packet = port.incoming().popleft() # append right, pop left
+            event.packet(packet)
+
+            print >> sys.stderr, '[%.3f] Router %s received packet %s' % (clock.ms(time), self, packet)
 
-        elif action == Event._RECEIVE:
-            link.dest().conn().record_buffer_size(time, len(port.incoming()))
+            self._handle_receive(event)
 
-            # Processes all received packets
-            if port.incoming():
-                # Pops the packet off the head of the queue
-                packet = port.incoming().popleft() # append right, pop left
-                event.packet(packet)
+        link.dest().conn().record_buffer_size(time, len(port.incoming()))
 
-                print >> sys.stderr, '[%.3f] Router %s received packet %s' % (time, self, packet)
+    def _send(self, event):
+        """
+        Pops the packet at the head of the outgoing queue and handles
+        it.
+        """
 
-                events.extend(self._handle_receive(event))
+        time = event.scheduled()
+        port = event.port()
+        link = port.conn()
 
-            link.dest().conn().record_buffer_size(time, len(port.incoming()))
+        link.record_buffer_size(time, len(link.dest().incoming()))
 
-        elif action == Event._SEND:
-            link.record_buffer_size(time, len(port.conn().dest().incoming()))
+        # Processes at most one outgoing packet
+        if port.outgoing():
+            # Pops the packet off the head of the queue
+            packet = port.outgoing().popleft() # append right, pop left
+            event.packet(packet)
 
-            # Processes at most one outgoing packet
-            if port.outgoing():
-                # Pops the packet off the head of the queue
-                packet = port.outgoing().popleft() # append right, pop left
-                event.packet(packet)
+            # Updates the queueing delay when a packet is sent
+            link.update_queueing_delay(packet, time)
 
-                link = port.conn()
-                dest = link.dest().source()
+            print >> sys.stderr, '[%.3f] Router %s sent packet %s' % (clock.ms(time), self, packet)
 
-                # Updates the queueing delay when a packet is sent
-                link.update_queueing_delay(packet, time)
+            self._handle_send(event)
 
-                print >> sys.stderr, '[%.3f] Router %s sent packet %s' % (time, self, packet)
+        link.record_buffer_size(time, len(link.dest().incoming()))
 
-                events.extend(self._handle_send(event))
+    # Overrides Device.handlers()
+    def handlers(self):
+        """
+        Returns the handlers of the router, indexed by action code.
+        """
 
-            link.record_buffer_size(time, len(port.conn().dest().incoming()))
+        handlers = [None] * len(Event._NAMES)
 
-        elif action == Event._TIMEOUT:
-            events.extend(self._handle_timeout(event))
+        handlers[Event._CREATE] = self._handle_create
+        handlers[Event._RECEIVE] = self._receive
+        handlers[Event._SEND] = self._send
+        handlers[Event._TIMEOUT] = self._handle_timeout
 
-        return events
+        return handlers
@@ -1,5 +1,6 @@
 import sys
 
+import clock
 from algorithm import RoutingAlgorithm
 from device import Device
 from packet import Packet
@@ -10,7 +11,6 @@ class BellmanFord(RoutingAlgorithm):
     Logic for Bellman-Ford algorithm.
     """
 
-    _COSTS = 'costs'
     _TYPE = 'bellman-ford'
 
     _EPSILON = 1
@@ -75,8 +75,7 @@ def prepare(self, time, packet):
         for dest in self._routing_table:
             costs[dest] = self._find_cost(time, dest)
 
-        packet.datum(BellmanFord._COSTS, costs)
-        packet.datum(BellmanFord._TYPE, True)
+        packet.routing(costs)
 
     # Overrides RoutingAlgorithm.update(packet)
     def update(self, time, packet):
@@ -93,7 +92,7 @@ def update(self, time, packet):
         next = packet.source() # from reference point of this instance
         next_cost = self._find_cost(time, next)
 
-        costs = packet.datum(BellmanFord._COSTS) # TODO: handle when no data found
+        costs = packet.routing() # TODO: handle when no data found
 
         # Iterates through each destination and cost from the packet data
         for (dest, cost) in costs.iteritems():
@@ -104,7 +103,7 @@ def update(self, time, packet):
             current_cost = self._find_cost(time, dest)
 
             # Checks whether new or better route found
-            if current_cost == -1 or overall_cost < (current_cost - BellmanFord._EPSILON):
+            if current_cost == -1 or overall_cost < (current_cost - clock.ticks(BellmanFord._EPSILON)):
                 # Updates cost to destination
                 self._costs[dest] = self._costs[next] + cost
 
@@ -113,6 +112,6 @@ def update(self, time, packet):
 
                 changed = True
 
-                print >> sys.stderr, '[%.3f] Router %s choosing route to %s using %s because %s' % (time, self._router, dest, next, packet)
+                print >> sys.stderr, '[%.3f] Router %s choosing route to %s using %s because %s' % (clock.ms(time), self._router, dest, next, packet)
 
         return changed
@@ -0,0 +1,39 @@
+class Scheduler:
+    """
+    Base class for future event sets.
+
+    Events are ordered by scheduled time, and events scheduled for the
+    same time are returned in the order they were pushed.
+    """
+
+    def __len__(self):
+        """
+        Returns the number of scheduled events.
+        Implemented in each subclass.
+        """
+
+        raise NotImplementedError, 'Scheduler.__len__()'
+
+    def push(self, time, event):
+        """
+        Schedules the specified event at the specified time.
+        Implemented in each subclass.
+        """
+
+        raise NotImplementedError, 'Scheduler.push(time, event)'
+
+    def peek(self):
+        """
+        Returns the time of the next event.
+        Implemented in each subclass.
+        """
+
+        raise NotImplementedError, 'Scheduler.peek()'
+
+    def pop(self):
+        """
+        Removes and returns the next event.
+        Implemented in each subclass.
+        """
+
+        raise NotImplementedError, 'Scheduler.pop()'
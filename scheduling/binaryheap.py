@@ -0,0 +1,52 @@
+from heapq import heappush, heappop
+
+from algorithm import Scheduler
+
+class BinaryHeap(Scheduler):
+    """
+    Future event set backed by a binary heap of (time, seq, event)
+    entries.
+    """
+
+    _TYPE = 'heap'
+
+    def __init__(self):
+        """
+        Creates an empty BinaryHeap instance.
+        """
+
+        self._heap = []
+        self._seq = 0
+
+    # Overrides Scheduler.__len__()
+    def __len__(self):
+        """
+        Returns the number of scheduled events.
+        """
+
+        return len(self._heap)
+
+    # Overrides Scheduler.push(time, event)
+    def push(self, time, event):
+        """
+        Schedules the specified event at the specified time.
+        """
+
+        self._seq += 1
+        heappush(self._heap, (time, self._seq, event))
+
+    # Overrides Scheduler.peek()
+    def peek(self):
+        """
+        Returns the time of the next event.
+        """
+
+        return self._heap[0][0]
+
+    # Overrides Scheduler.pop()
+    def pop(self):
+        """
+        Removes and returns the next event.
+        """
+
+        return heappop(self._heap)[2]
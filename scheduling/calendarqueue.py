@@ -0,0 +1,161 @@
+from bisect import insort
+
+from algorithm import Scheduler
+
+class CalendarQueue(Scheduler):
+    """
+    Future event set backed by a calendar queue.
+
+    Events are hashed by time into a circular array of buckets, each
+    covering one day of the specified width. The number of buckets and
+    their width are recomputed as the queue grows and shrinks, so that
+    each bucket holds only a few events.
+    """
+
+    _TYPE = 'calendar'
+
+    _MIN_BUCKETS = 2
+    _SAMPLE_SIZE = 25
+
+    def __init__(self, num_buckets=2, width=1.0):
+        """
+        Creates an empty CalendarQueue instance with the specified
+        number of buckets and the specified bucket width.
+        """
+
+        self._seq = 0
+        self._size = 0
+
+        self._build(num_buckets, float(width), [])
+
+    def _build(self, num_buckets, width, entries):
+        """
+        Rebuilds the calendar with the specified number of buckets and
+        bucket width, and inserts the specified entries.
+        """
+
+        self._num_buckets = num_buckets
+        self._width = width
+        self._buckets = [[] for i in xrange(num_buckets)]
+
+        # Index of the day containing the most recent event
+        self._day = 0
+
+        if entries:
+            self._day = int(entries[0][0] // width)
+
+        for entry in entries:
+            self._buckets[int(entry[0] // width) % num_buckets].append(entry)
+
+        for bucket in self._buckets:
+            bucket.sort()
+
+    def _resize(self, num_buckets):
+        """
+        Resizes the calendar to the specified number of buckets,
+        estimating the bucket width from the earliest events.
+        """
+
+        entries = []
+        for bucket in self._buckets:
+            entries.extend(bucket)
+
+        entries.sort()
+
+        width = self._width
+
+        # Estimates the width as three times the average separation
+        sample = [entry[0] for entry in entries[:CalendarQueue._SAMPLE_SIZE]]
+        if len(sample) > 1:
+            average = float(sample[-1] - sample[0]) / float(len(sample) - 1)
+
+            # Ignores large separations when estimating the width
+            gaps = [b - a for (a, b) in zip(sample, sample[1:])
+                    if b - a <= 2 * average]
+            if gaps and sum(gaps) > 0:
+                width = 3.0 * float(sum(gaps)) / float(len(gaps))
+
+        self._build(num_buckets, width, entries)
+
+    def _find(self):
+        """
+        Returns the index of the bucket containing the next event, and
+        advances the current day to it.
+        """
+
+        day = self._day
+
+        # Searches one year ahead for an event within its day
+        for i in xrange(self._num_buckets):
+            bucket = self._buckets[(day + i) % self._num_buckets]
+
+            if bucket and int(bucket[0][0] // self._width) <= day + i:
+                self._day = day + i
+                return (day + i) % self._num_buckets
+
+        # Otherwise, falls back to a direct search
+        index = min([i for i in xrange(self._num_buckets) if self._buckets[i]],
+                    key=lambda i: self._buckets[i][0])
+
+        self._day = int(self._buckets[index][0][0] // self._width)
+
+        return index
+
+    # Overrides Scheduler.__len__()
+    def __len__(self):
+        """
+        Returns the number of scheduled events.
+        """
+
+        return self._size
+
+    # Overrides Scheduler.push(time, event)
+    def push(self, time, event):
+        """
+        Schedules the specified event at the specified time.
+        """
+
+        self._seq += 1
+
+        day = int(time // self._width)
+
+        # Rewinds the calendar when scheduling before the current day
+        if day < self._day or self._size == 0:
+            self._day = day
+
+        insort(self._buckets[day % self._num_buckets], (time, self._seq, event))
+        self._size += 1
+
+        # Doubles the number of buckets when the calendar gets crowded
+        if self._size > 2 * self._num_buckets:
+            self._resize(2 * self._num_buckets)
+
+    # Overrides Scheduler.peek()
+    def peek(self):
+        """
+        Returns the time of the next event.
+        """
+
+        if self._size == 0:
+            raise IndexError, 'peek from an empty calendar queue'
+
+        return self._buckets[self._find()][0][0]
+
+    # Overrides Scheduler.pop()
+    def pop(self):
+        """
+        Removes and returns the next event.
+        """
+
+        if self._size == 0:
+            raise IndexError, 'pop from an empty calendar queue'
+
+        (time, seq, event) = self._buckets[self._find()].pop(0)
+        self._size -= 1
+
+        # Halves the number of buckets when the calendar gets sparse
+        if (self._num_buckets > CalendarQueue._MIN_BUCKETS
+                and self._size < self._num_buckets / 2):
+            self._resize(self._num_buckets / 2)
+
+        return event
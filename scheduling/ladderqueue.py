@@ -0,0 +1,206 @@
+from bisect import insort
+
+from algorithm import Scheduler
+
+class LadderQueue(Scheduler):
+    """
+    Future event set backed by a ladder queue.
+
+    Far future events are appended unsorted to the top. When the
+    bottom runs empty, the top is spread over a rung of buckets, and
+    crowded buckets are spread over finer rungs below. Only the few
+    events in the bottom are ever kept sorted.
+    """
+
+    _TYPE = 'ladder'
+
+    _THRESHOLD = 50
+    _MAX_RUNGS = 8
+
+    def __init__(self):
+        """
+        Creates an empty LadderQueue instance.
+        """
+
+        self._seq = 0
+        self._size = 0
+
+        # Unsorted events scheduled at or after the start of the top
+        self._top = []
+        self._top_start = None
+        self._top_min = None
+        self._top_max = None
+
+        # Rungs as lists of [start, width, current bucket, buckets]
+        self._rungs = []
+
+        # Sorted events earlier than any event on the rungs
+        self._bottom = []
+
+    def _spawn(self, start, width, entries):
+        """
+        Spreads the specified entries over a new rung with the
+        specified start and bucket width.
+        """
+
+        num_buckets = len(entries) + 1
+        buckets = [[] for i in xrange(num_buckets)]
+
+        for entry in entries:
+            buckets[self._index(entry[0], start, width, num_buckets)].append(entry)
+
+        self._rungs.append([start, width, 0, buckets])
+
+    def _index(self, time, start, width, num_buckets):
+        """
+        Returns the bucket of a rung with the specified start, bucket
+        width and number of buckets that the specified time falls in.
+        """
+
+        return min(max(int((time - start) / width), 0), num_buckets - 1)
+
+    def _transfer(self):
+        """
+        Transfers the events of the top onto a new rung.
+        """
+
+        top = self._top
+        self._top = []
+
+        start = self._top_min
+        end = self._top_max
+
+        self._top_start = end
+        self._top_min = None
+        self._top_max = None
+
+        # Sorts events that are all scheduled at the same time
+        if start == end:
+            top.sort()
+            self._bottom = top
+
+            return
+
+        self._spawn(start, float(end - start) / float(len(top)), top)
+
+        # Later events are scheduled past the end of the rung
+        rung = self._rungs[-1]
+        self._top_start = rung[0] + len(rung[3]) * rung[1]
+
+    def _refill(self):
+        """
+        Refills the bottom with the earliest events.
+        """
+
+        while not self._bottom:
+            if not self._rungs:
+                self._transfer()
+                continue
+
+            rung = self._rungs[-1]
+            (start, width, current, buckets) = rung
+
+            # Skips over empty buckets
+            while current < len(buckets) and not buckets[current]:
+                current += 1
+
+            # Removes the rung once all of its buckets were consumed
+            if current == len(buckets):
+                self._rungs.pop()
+                continue
+
+            bucket = buckets[current]
+            buckets[current] = []
+            rung[2] = current + 1
+
+            # Spreads a crowded bucket over a finer rung
+            if (len(bucket) > LadderQueue._THRESHOLD
+                    and len(self._rungs) < LadderQueue._MAX_RUNGS
+                    and min(bucket)[0] != max(bucket)[0]):
+                self._spawn(start + current * width, width / float(len(bucket) + 1), bucket)
+
+            # Otherwise, sorts the bucket into the bottom
+            else:
+                bucket.sort()
+                self._bottom = bucket
+
+    # Overrides Scheduler.__len__()
+    def __len__(self):
+        """
+        Returns the number of scheduled events.
+        """
+
+        return self._size
+
+    # Overrides Scheduler.push(time, event)
+    def push(self, time, event):
+        """
+        Schedules the specified event at the specified time.
+        """
+
+        self._seq += 1
+        self._size += 1
+
+        entry = (time, self._seq, event)
+
+        # Appends far future events to the top
+        if self._top_start is None or time >= self._top_start:
+            self._top.append(entry)
+
+            if self._top_min is None or time < self._top_min:
+                self._top_min = time
+
+            if self._top_max is None or time > self._top_max:
+                self._top_max = time
+
+            return
+
+        # Inserts the event into the first rung that has not passed it
+        for (start, width, current, buckets) in self._rungs:
+            index = self._index(time, start, width, len(buckets))
+
+            if index >= current:
+                buckets[index].append(entry)
+                return
+
+        # Otherwise, inserts the event into the bottom
+        insort(self._bottom, entry)
+
+        bottom = self._bottom
+
+        # Spreads a crowded bottom over a new rung
+        if (len(bottom) > LadderQueue._THRESHOLD
+                and len(self._rungs) < LadderQueue._MAX_RUNGS
+                and bottom[0][0] != bottom[-1][0]):
+            self._bottom = []
+            self._spawn(bottom[0][0], float(bottom[-1][0] - bottom[0][0]) / float(len(bottom)), bottom)
+
+    # Overrides Scheduler.peek()
+    def peek(self):
+        """
+        Returns the time of the next event.
+        """
+
+        if self._size == 0:
+            raise IndexError, 'peek from an empty ladder queue'
+
+        if not self._bottom:
+            self._refill()
+
+        return self._bottom[0][0]
+
+    # Overrides Scheduler.pop()
+    def pop(self):
+        """
+        Removes and returns the next event.
+        """
+
+        if self._size == 0:
+            raise IndexError, 'pop from an empty ladder queue'
+
+        if not self._bottom:
+            self._refill()
+
+        self._size -= 1
+
+        return self._bottom.pop(0)[2]
@@ -2,15 +2,27 @@
 
 from sys import argv
 
+import cache
+import clock
+import convergence
+import trains
 from buffer import Buffer
+from compiled import CompiledSimulation
+from parallel import ComponentSimulation, ParallelSimulation
 from congestion.aimd import AIMD
 from congestion.fast import FAST
 from conn import Link, Port
 from flow import Flow
+from fluid import FluidSimulation
 from host import Host
+from hybrid import HybridSimulation
 from router import Router
 from routing.bellmanford import BellmanFord
+from scheduling.binaryheap import BinaryHeap
+from scheduling.calendarqueue import CalendarQueue
+from scheduling.ladderqueue import LadderQueue
 from simulation import Simulation
+from steady import SteadySimulation
 
 
 
@@ -80,7 +92,7 @@ def _initialize(self, config):
                 source_device = devices[source]
                 dest_device = devices[dest]
                 rate = int(rate)
-                delay = float(delay)
+                delay = clock.ticks(float(delay))
                 size = int(size)
 
                 source_link = Link()
@@ -120,7 +132,7 @@ def _initialize(self, config):
                 source_device = devices[source]
                 dest_device = devices[dest]
                 size = int(size)
-                time = float(time)
+                time = clock.ticks(float(time))
 
                 if algorithm == AIMD._TYPE:
                     algorithm = AIMD()
@@ -149,13 +161,229 @@ def _initialize(self, config):
 
         return (devices.values(), measure_flows, measure_links)
 
-if __name__ == '__main__':
-    filename = argv[1]
+def main(args):
+    """
+    Runs the configuration given by the specified command-line
+    arguments.
+    """
 
-    config = Setup(filename)
-    devices = config.devices
-    measure_flows = config.flows
-    measure_links = config.links
+    args = list(args)
+
+    # Uses integer nanosecond ticks as the time base, if specified
+    if '--ticks' in args:
+        args.remove('--ticks')
+        clock.use_ticks(clock.NS_PER_MS)
+
+    # Sends the packets that the windows allow at once as trains, if
+    # specified
+    trained = False
+
+    if '--trains' in args:
+        args.remove('--trains')
+        trained = True
+
+    # Skips the checks of the accessors on the hot path, if specified
+    trusted = False
+
+    if '--trusted' in args:
+        args.remove('--trusted')
+        trusted = True
+
+    # Runs the compiled engine instead of the devices, if specified
+    engine = Simulation
+
+    # Engines selected by the arguments, of which there is at most one
+    engines = []
+
+    if '--compiled' in args:
+        args.remove('--compiled')
+        engines.append(CompiledSimulation)
+
+    # Skips ahead over the periods of a steady state, if specified
+    if '--steady' in args:
+        args.remove('--steady')
+        engines.append(SteadySimulation)
+
+    # Runs partitions of the devices in parallel processes, or the
+    # connected components of the network, if specified
+    options = {}
+
+    if '--components' in args:
+        args.remove('--components')
+        engines.append(ComponentSimulation)
+
+    for arg in list(args):
+        if arg.startswith('--parallel='):
+            args.remove(arg)
+            engines.append(ParallelSimulation)
+            options['partitions'] = int(arg[len('--parallel='):])
+
+    # Runs the flows that are not measured as fluid, updated every
+    # given number of milliseconds, if specified
+    for arg in list(args):
+        if arg == '--hybrid':
+            args.remove(arg)
+            engines.append(HybridSimulation)
+
+        elif arg.startswith('--hybrid='):
+            args.remove(arg)
+            engines.append(HybridSimulation)
+            options['step'] = float(arg[len('--hybrid='):])
+
+    # Integrates a fluid model of the whole network instead, in steps
+    # of the given number of milliseconds, if specified
+    for arg in list(args):
+        if arg == '--fluid':
+            args.remove(arg)
+            engines.append(FluidSimulation)
+
+        elif arg.startswith('--fluid='):
+            args.remove(arg)
+            engines.append(FluidSimulation)
+            options['step'] = float(arg[len('--fluid='):])
+
+    # Checks that at most one engine was selected
+    if len(set(engines)) > 1:
+        raise ValueError, 'engine flags are mutually exclusive'
+
+    elif engines:
+        engine = engines[0]
+
+    # Bounds the run by simulated time, events or wall-clock time,
+    # if specified
+    bounds = {}
+
+    for arg in list(args):
+        for (option, name, cast) in [('--until=', 'until', float),
+                                     ('--max-events=', 'max_events', int),
+                                     ('--max-seconds=', 'max_seconds', float)]:
+            if arg.startswith(option):
+                args.remove(arg)
+                bounds[name] = cast(arg[len(option):])
+
+    # Stops once the measured metrics converged to the given relative
+    # precision, checked after every batch of the given number of
+    # milliseconds, if specified
+    stopping = {}
+
+    for arg in list(args):
+        for (option, name) in [('--precision=', 'precision'), ('--batch=', 'batch')]:
+            if arg.startswith(option):
+                args.remove(arg)
+                stopping[name] = float(arg[len(option):])
+
+    # Resumes from a checkpoint and saves one when the run stops, if
+    # specified
+    files = {}
+
+    for arg in list(args):
+        for (option, name) in [('--restore=', 'restore'), ('--save=', 'save')]:
+            if arg.startswith(option):
+                args.remove(arg)
+                files[name] = arg[len(option):]
+
+    # Checks that the engine runs the methods of the devices, which
+    # trains replace
+    if trained and engine not in (Simulation, SteadySimulation, ComponentSimulation):
+        raise ValueError, 'trains are not supported by this engine'
+
+    # Checks that the engine keeps no state beyond the devices and the
+    # scheduler, which is all that checkpoints hold
+    if ('restore' in files or 'save' in files) and engine is not Simulation:
+        raise ValueError, 'checkpoints are not supported by this engine'
+
+    # Replays the results of an identical earlier run from a cache,
+    # and caches the results of the run otherwise, if specified
+    for arg in list(args):
+        if arg == '--cache':
+            args.remove(arg)
+            files['cache'] = '.cache'
+
+        elif arg.startswith('--cache='):
+            args.remove(arg)
+            files['cache'] = arg[len('--cache='):]
+
+        elif arg.startswith('--cache-size='):
+            args.remove(arg)
+            options['cache_size'] = int(float(arg[len('--cache-size='):]) * (1 << 20))
+
+    cache_size = options.pop('cache_size', cache.DEFAULT_SIZE)
+
+    filename = args[0]
+
+    # Selects the scheduler for future events, if specified
+    scheduler = BinaryHeap()
+
+    if len(args) > 1:
+        if args[1] == CalendarQueue._TYPE:
+            scheduler = CalendarQueue()
+        elif args[1] == LadderQueue._TYPE:
+            scheduler = LadderQueue()
+
+        # Checks that the scheduler is a known one
+        elif args[1] != BinaryHeap._TYPE:
+            raise ValueError, 'scheduler must be one of %s, %s or %s' % (
+                BinaryHeap._TYPE, CalendarQueue._TYPE, LadderQueue._TYPE)
+
+    # Replaces the methods of the devices by trains for this run only
+    trains.use_trains(trained)
+
+    try:
+        config = Setup(filename)
+        devices = config.devices
+        measure_flows = config.flows
+        measure_links = config.links
+
+        sim = engine(devices, measure_flows, measure_links, scheduler, trusted, **options)
+
+        # Only caches runs whose results depend on nothing but their
+        # settings, which excludes wall-clock bounds and checkpoints
+        key = None
+        entry = None
+
+        if ('cache' in files and 'max_seconds' not in bounds
+                and 'restore' not in files and 'save' not in files):
+            settings = dict(bounds)
+            settings.update(options)
+            settings.update(stopping)
+            settings.update({'engine': engine.__name__,
+                             'scheduler': scheduler.__class__.__name__,
+                             'ticks': clock.uses_ticks(),
+                             'trains': trains.uses_trains()})
+
+            key = cache.key(filename, settings)
+            entry = cache.lookup(files['cache'], key)
+
+        if entry is not None:
+            cache.replay(entry)
+
+        else:
+            if key is not None:
+                recorder = cache.Recorder()
+
+            if 'restore' in files:
+                sim.restore(files['restore'])
+
+            if 'precision' in stopping:
+                stopping.update(bounds)
+                result = convergence.run(sim, **stopping)
+
+                if result.estimates is not None:
+                    print 'converged at', sim.now()
+                    print '\n'.join(result.report())
+            else:
+                sim.run(**bounds)
+
+            if 'save' in files:
+                sim.save(files['save'])
+
+            sim.finish()
 
-    sim = Simulation(devices, measure_flows, measure_links)
-    sim.start()
+            if key is not None:
+                cache.store(files['cache'], key, recorder, sim, cache_size)
+
+    finally:
+        trains.use_trains(False)
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -1,22 +1,39 @@
-from heapq import heappush, heappop
+from collections import deque
+from time import time as wall_clock
 
+import branching
+import checkpoint
+import clock
+import lockstep
+import validation
 from device import Device
-from event import Event
+from event import Event, POOL
 from host import Host
 from router import Router
+from scheduling.algorithm import Scheduler
+from scheduling.binaryheap import BinaryHeap
+from timer import TimerWheel
 
 
 from graph import Graph
 
-class Simulation:
+class BaseSimulation:
     """
-    Class for running multi-link, multi-flow network simulations.
+    Event loop of every engine, with the bounded runs, the steps and the
+    finalization of a simulation.
     """
 
-    def __init__(self, devices, measure_flows, measure_links):
+    # Number of events between checks of the wall-clock deadline
+    _CHECK_EVERY = 1000
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler=None,
+                 trusted=False):
         """
         Creates a Simulation instance with the specified list of
-        devices.
+        devices and the specified scheduler for future events.
+
+        If trusted is True, the accessors on the hot path skip their
+        checks while the simulation runs.
         """
 
         # Checks that devices is a list
@@ -32,31 +49,203 @@ def __init__(self, devices, measure_flows, measure_links):
         # Stores the list of devices
         self._devices = devices
 
+        # Keeps the validation mode of the accessors for each run
+        self._trusted = trusted
+
+        # Defaults to a binary heap for future events
+        if scheduler is None:
+            scheduler = BinaryHeap()
+
+        # Checks that scheduler is a Scheduler instance
+        if not isinstance(scheduler, Scheduler):
+            raise TypeError, 'scheduler must be a Scheduler instance'
+
         # Initializes an empty event queue
-        self._event_queue = []
-        
+        self._event_queue = scheduler
+        self._sequence = 0
+
+        # Initializes the arrival channels, one per receiving port
+        self._channels = {}
+
+        # Initializes the queue of events scheduled for the current time
+        self._now_queue = deque()
+        self._now = None
+
+        # Initializes the timer wheel shared by the devices
+        self._timers = TimerWheel(clock.ticks(1))
+
+        for device in devices:
+            device.timers(self._timers)
+            device.queue(self)
+
+        # Counts the flows of the hosts that have not yet completed
+        self._num_flows = 0
+        self._incomplete = 0
+
+        for device in devices:
+            if isinstance(device, Host):
+                for flow in device.get_flows().values():
+                    flow.observer(self)
+
+                    self._num_flows += 1
+                    if not flow.is_complete():
+                        self._incomplete += 1
+
         self._measure_flows = measure_flows
         self._measure_links = measure_links
 
+        self._initialized = False
+        self._finished = False
+        self._processed = 0
+
+        # Whether the trackers were converted back to milliseconds
+        self._rescaled = False
+
     def _initialize(self):
         """
-        Initializes the simulation by initializing each device.
+        Initializes the simulation by initializing each device, and
+        builds the table of handlers.
         """
 
         # Iterates through each device
         for device in self._devices:
-            # Initializes each device
-            events = device.initialize()
+            # Initializes each device, which pushes its first events
+            device.initialize()
+
+        # Maps each port to the handlers of its device
+        self._handlers = {}
+
+        for device in self._devices:
+            ports = device.get_ports()
+            if isinstance(device, Host):
+                ports = [ports]
+
+            handlers = device.handlers()
+
+            for port in ports:
+                self._handlers[port] = handlers
+
+    def _prepare(self):
+        """
+        Initializes the simulation unless it was already initialized.
+        """
 
-            # Pushes each event onto the queue
-            for event in events:
-                heappush(self._event_queue, event)
+        if not self._initialized:
+            self._initialize()
+            self._initialized = True
+
+    def flow_completed(self, flow):
+        """
+        Notes that the specified flow has completed.
+        """
+
+        self._incomplete -= 1
+
+    def flow_resumed(self, flow):
+        """
+        Notes that the specified flow has data to send or acknowledge
+        again after completing.
+        """
+
+        self._incomplete += 1
+
+    def push(self, event):
+        """
+        Pushes the specified event onto the event queue.
+
+        Events scheduled for the current time bypass the scheduler and
+        are run in the order they were spawned, before any other event
+        of the same time that is still on the scheduler.
+
+        Receive events are queued on the arrival channel of their port
+        and only the head of each channel is kept on the scheduler. Since a
+        link has a constant delay, packets arrive in the order they
+        were sent, so each channel is already sorted by time.
+        """
+
+        if event.scheduled() == self._now:
+            self._now_queue.append(event)
+            return
+
+        if event.action() == Event._RECEIVE:
+            port = event.port()
+            channel = self._channels.get(port)
+
+            if channel is None:
+                channel = deque()
+                self._channels[port] = channel
+
+            # Checks that the event preserves the order of the channel
+            if not channel or channel[-1].scheduled() <= event.scheduled():
+                channel.append(event)
+
+                # Only the head of the channel goes on the scheduler
+                if len(channel) == 1:
+                    self._schedule(event)
+
+                return
+
+        self._schedule(event)
+
+    def _schedule(self, event):
+        """
+        Puts the specified event on the scheduler, numbered by the order
+        of the push, which breaks ties between events of the same time.
+        """
+
+        self._sequence += 1
+        event._sequence = self._sequence
+
+        self._event_queue.push(event.scheduled(), event)
+
+    def _pop(self):
+        """
+        Pops the next event off of the event queue.
+        """
+
+        # Drains the events scheduled for the current time first
+        if self._now_queue:
+            return self._now_queue.popleft()
+
+        event = self._event_queue.pop()
+        self._now = event.scheduled()
+
+        if event.action() == Event._RECEIVE:
+            channel = self._channels.get(event.port())
+
+            # Replaces the head of the channel with the next arrival
+            if channel and channel[0] is event:
+                channel.popleft()
+
+                if channel:
+                    self._schedule(channel[0])
+
+        return event
+
+    def _rescale(self):
+        """
+        Converts the times recorded by the trackers of the measured
+        flows and links back to milliseconds, once.
+        """
+
+        if clock.uses_ticks() and not self._rescaled:
+            self._rescaled = True
+
+            factor = clock.ms(1)
+
+            for flow in self._measure_flows.values():
+                flow.getTracker().rescale(factor)
+
+            for link in self._measure_links.values():
+                link.getTracker().rescale(factor)
 
     def _finalize(self):
         """
         Finalizes the simulation.
         """
         # TODO: generate graphs from the statistics
+
+        self._rescale()
         
         #flow-related graphs
         window_size_graph = Graph("window size", "cwnd (packet)")
@@ -83,7 +272,7 @@ def _finalize(self):
             l = self._measure_links[link_name].getTracker()
             print "link name", link_name
             l.get_buffer_stats()
-            l.set_delay(self._measure_links[link_name].delay())
+            l.set_delay(clock.ms(self._measure_links[link_name].delay()))
             #buffer occupancy graph
             buffer_occupancy_graph.add_data_set(link_name, l.get_buffer_occupancy_data())
             #packet loss graph
@@ -99,40 +288,244 @@ def _finalize(self):
         rtt_graph.generate_total_graph()
         
 
-    def start(self):
+    def _advance(self, until=None, max_events=None, deadline=None):
         """
-        Starts the simulation and executes it until completion.
+        Processes events until completion, or until the next event is
+        scheduled at or after the specified time, the specified number
+        of events was processed, or the specified wall-clock deadline
+        passed.
         """
 
-        # Initializes the simulation
-        self._initialize()
+        handlers = self._handlers
+
+        # Runs until the queue empties if no host has a flow
+        tracked = self._num_flows > 0
+
+        done = self._finished
+        processed = 0
 
-        done = False
-        
         # Loops through all events on the queue
-        while self._event_queue and not done:
+        while (self._now_queue or self._event_queue or self._timers) and not done:
+            # Stops once the number of events or the time is exhausted
+            if max_events is not None and processed >= max_events:
+                break
+
+            if (deadline is not None and processed % BaseSimulation._CHECK_EVERY == 0
+                    and wall_clock() >= deadline):
+                break
+
+            # Schedules the timers that expire before the head of the queue
+            if self._timers and not self._now_queue:
+                head = None
+                if self._event_queue:
+                    head = self._event_queue.peek()
+
+                for timeout_event in self._timers.expire(head):
+                    self.push(timeout_event)
+
+            # Stops before the first event at or after the horizon
+            if until is not None:
+                if self._now_queue:
+                    next_time = self._now
+                elif self._event_queue:
+                    next_time = self._event_queue.peek()
+
+                # Stops if the timers left armed expire after the horizon
+                else:
+                    break
+
+                if next_time >= until:
+                    break
+
             # Pops the head off of the event queue
-            event = heappop(self._event_queue)
-            device = event.port().source()
+            event = self._pop()
+            port = event.port()
 
-            if isinstance(device, Host):
-                flows = device._flows.values()
+            # Processes the event, which pushes the spawned events
+            handlers[port][event.action()](event)
+
+            # Recycles the processed event, which handlers must not keep
+            POOL.release(event)
+
+            processed += 1
+
+            # Checks for completion once the event has been processed,
+            # as no stale timeout of the host will follow
+            done = tracked and not self._incomplete
+
+        self._finished = (done or not (self._now_queue or self._event_queue or self._timers))
+        self._processed += processed
+
+    def now(self):
+        """
+        Returns the time of the most recent event in milliseconds.
+        """
+
+        if self._now is None:
+            return 0.0
+
+        return clock.ms(self._now)
+
+    def processed(self):
+        """
+        Returns the number of events processed so far.
+        """
+
+        return self._processed
+
+    def finished(self):
+        """
+        Returns True if the simulation ran to completion, and False
+        otherwise.
+        """
+
+        return self._finished
+
+    def run(self, until=None, max_events=None, max_seconds=None):
+        """
+        Runs the simulation until completion, or until the specified
+        time in milliseconds, the specified number of events or the
+        specified number of wall-clock seconds is reached, whichever
+        comes first. A stopped simulation resumes on the next call.
+
+        Returns True if the simulation ran to completion, and False
+        otherwise.
+        """
+
+        # Checks that the trackers still record ticks
+        if self._rescaled:
+            raise ValueError, 'simulation cannot resume once its trackers were rescaled'
+
+        # Switches the validation mode for this run only
+        trusted = validation.is_trusted()
+        validation.use_trusted(self._trusted)
+
+        try:
+            self._prepare()
+
+            if until is not None:
+                until = clock.ticks(until)
+
+            deadline = None
+            if max_seconds is not None:
+                deadline = wall_clock() + max_seconds
+
+            self._advance(until, max_events, deadline)
+        finally:
+            validation.use_trusted(trusted)
+
+        return self._finished
+
+    def steps(self, events=None, ms=None):
+        """
+        Runs the simulation in chunks of the specified number of events
+        or the specified number of milliseconds, and yields the time of
+        the most recent event after each chunk until completion.
 
-                if flows:
-                    done = True
+        The trackers can be inspected between chunks, and the
+        simulation stops early if the caller stops iterating.
+        """
+
+        # Checks that exactly one chunk size is specified
+        if (events is None) == (ms is None):
+            raise ValueError, 'either events or ms must be specified'
+
+        horizon = self.now()
+        finished = False
+
+        while not finished:
+            until = None
+            if ms is not None:
+                horizon += ms
+                until = horizon
+
+            finished = self.run(until, events)
 
-                for flow in flows:
-                    if flow.has_data() or flow.unack():
-                        done = False
+            yield self.now()
 
-            # Processes the event
-            spawned_events = device.process(event)
-            # Pushes each spawned event onto the queue
-            for spawned_event in spawned_events:
-                heappush(self._event_queue, spawned_event)
+    def finish(self):
+        """
+        Finalizes the simulation and returns the result, after it was
+        run or stepped through.
+        """
 
         return self._finalize()
 
+    def start(self, until=None, max_events=None, max_seconds=None):
+        """
+        Starts the simulation and executes it until completion, or
+        until any of the specified bounds is reached, then finalizes
+        it.
+        """
+
+        self.run(until, max_events, max_seconds)
+
+        return self.finish()
+
+class Simulation(BaseSimulation):
+    """
+    Class for running multi-link, multi-flow network simulations.
+
+    Unlike the engines that only share the event loop, a Simulation
+    runs the device objects in a single process, so it can be saved and
+    restored, branched and swept.
+    """
+
+    def save(self, filename):
+        """
+        Saves a checkpoint of the simulation to the specified file.
+        """
+
+        # Checks that the simulation keeps no state beyond the devices
+        # and the scheduler
+        if self.__class__ is not Simulation:
+            raise TypeError, 'checkpoints are not supported by this engine'
+
+        self._prepare()
+
+        checkpoint.save(self, filename)
+
+    def restore(self, filename):
+        """
+        Restores the simulation from the checkpoint in the specified
+        file, which was saved by a simulation built from the same
+        configuration. Running the simulation then resumes from the
+        checkpoint.
+        """
+
+        # Checks that the simulation keeps no state beyond the devices
+        # and the scheduler
+        if self.__class__ is not Simulation:
+            raise TypeError, 'checkpoints are not supported by this engine'
+
+        self._prepare()
+
+        checkpoint.restore(self, filename)
+
+    def branch(self, until, variants, collect, processes=None):
+        """
+        Runs the simulation until the specified time in milliseconds,
+        then forks a child process for each of the specified variants,
+        which modifies its copy of the simulation and runs it to
+        completion. Returns the results of the specified collect
+        function for each variant, in order.
+        """
+
+        return branching.branch(self, until, variants, collect, processes)
+
+    def sweep(self, settings, collect, processes=None):
+        """
+        Runs the simulation to completion for each variant of the
+        specified settings, where each setting is an object, the name
+        of one of its attributes and the list of its values in each
+        variant. The variants are run together until they diverge,
+        with at most the specified number of processes at once.
+        Returns the results of the specified collect function for each
+        variant, in order.
+        """
+
+        return lockstep.sweep(self, settings, collect, processes)
+
 class TestBellmanFord(Simulation):
     """
     Simulation that verifies the Bellman-Ford algorithm.
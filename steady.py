@@ -0,0 +1,683 @@
+"""
+Steady-state fast-forward of long transfers.
+
+Once the flows of a simulation settle, the state of the network right
+after a flow sends a data packet repeats periodically, only shifted in
+time and in sequence numbers. SteadySimulation looks for such a period
+while it runs. Once the state has repeated over a few periods, it skips
+ahead by whole periods at once: the pending events, timers and packets
+move forward in time, the flows advance their sequence numbers and
+bits by what they send in the skipped periods, and the trackers repeat
+the records of the last period.
+
+The skip stops a few periods short of the bound of the run, the start
+of a flow, the next routing packet and the end of a flow, after which
+the packets are simulated again until the state repeats anew.
+
+Congestion windows that are not limiting and timeouts drift too slowly
+to change which packets are sent, so they are not part of the repeated
+state. The results are therefore close to those of Simulation, but not
+the same.
+"""
+
+from math import ceil
+
+import clock
+from event import Event
+from flow import Flow
+from host import Host
+from packet import Packet
+from simulation import Simulation
+
+# Periods over which the state must repeat before skipping
+_REPEATS = 3
+
+# Earlier occurrences of a state tried as the start of a period
+_CANDIDATES = 8
+
+# Occurrences of each state kept while looking for a period
+_KEEP = 16
+
+# Number of states kept before the history is cleared
+_LIMIT = 100000
+
+# Periods simulated before any change of the state
+_MARGIN = 2
+
+# Most samples waited after a period failed to verify
+_BACKOFF = 1024
+
+# Difference in milliseconds under which two times are the same
+_EPSILON = 1e-6
+
+def _close(first, second):
+    """
+    Returns True if the specified times of the time base are the same,
+    and False otherwise.
+    """
+
+    return abs(first - second) <= clock.ticks(_EPSILON)
+
+def _moved(record, shift):
+    """
+    Returns the specified tracker record, a time or a tuple starting
+    with a time, moved forward by the specified time.
+    """
+
+    if isinstance(record, tuple):
+        return (record[0] + shift,) + record[1:]
+
+    return record + shift
+
+def _time(record):
+    """
+    Returns the time of the specified tracker record.
+    """
+
+    if isinstance(record, tuple):
+        return record[0]
+
+    return record
+
+def _repeat(records, now, period, num_periods):
+    """
+    Repeats the specified records of the last period before the
+    specified time for the specified number of periods, and moves the
+    records after the specified time past them.
+    """
+
+    later = []
+    while records and _time(records[-1]) > now:
+        later.append(records.pop())
+
+    later.reverse()
+
+    start = len(records)
+    while start > 0 and _time(records[start - 1]) > now - period:
+        start -= 1
+
+    last = records[start:]
+
+    for i in xrange(1, num_periods + 1):
+        records.extend([_moved(record, i * period) for record in last])
+
+    records.extend([_moved(record, num_periods * period) for record in later])
+
+class SteadySimulation(Simulation):
+    """
+    Simulation that skips ahead over the periods of a steady state.
+    """
+
+    def __init__(self, devices, measure_flows, measure_links, scheduler=None,
+                 trusted=False):
+        """
+        Creates a SteadySimulation instance with the specified list of
+        devices and the specified scheduler for future events.
+        """
+
+        Simulation.__init__(self, devices, measure_flows, measure_links,
+                            scheduler, trusted)
+
+        # Bound of the current run, which no skip goes past
+        self._horizon = None
+
+        # Occurrences of each state, and the period being verified
+        self._history = {}
+        self._candidate = None
+
+        # Periods that failed to verify, and the samples to wait before
+        # looking for a period again, which double with each failure
+        self._failed = set()
+        self._wait = 0
+        self._backoff = 1
+
+        self._skipped = 0
+
+    # Overrides Simulation._initialize()
+    def _initialize(self):
+        """
+        Initializes the simulation, and samples the state after each
+        packet sent by a host.
+        """
+
+        Simulation._initialize(self)
+
+        devices = sorted(self._devices, key=str)
+
+        self._ports = []
+        self._flows = []
+
+        for device in devices:
+            ports = device.get_ports()
+
+            if isinstance(device, Host):
+                ports = [ports]
+
+                flows = device.get_flows()
+                for dest in sorted(flows, key=str):
+                    self._flows.append(flows[dest])
+
+            self._ports.extend(ports)
+
+        self._port_index = dict([(port, i) for (i, port) in enumerate(self._ports)])
+        self._link_index = dict([(port.conn(), i) for (i, port) in enumerate(self._ports)])
+        self._flow_index = dict([(flow, i) for (i, flow) in enumerate(self._flows)])
+
+        self._devices_sorted = devices
+
+        for device in devices:
+            if isinstance(device, Host):
+                port = device.get_ports()
+
+                handlers = list(self._handlers[port])
+                handlers[Event._SEND] = self._sampler(handlers[Event._SEND])
+
+                self._handlers[port] = handlers
+
+    # Overrides Simulation._advance()
+    def _advance(self, until=None, max_events=None, deadline=None):
+        """
+        Processes events as Simulation._advance() does, skipping ahead
+        whenever the state repeats.
+        """
+
+        self._horizon = until
+
+        Simulation._advance(self, until, max_events, deadline)
+
+    def skipped(self):
+        """
+        Returns the number of milliseconds skipped so far.
+        """
+
+        return clock.ms(self._skipped)
+
+    def _sampler(self, handler):
+        """
+        Returns the specified send handler of a host, followed by a
+        sample of the state when the reference flow sent a data packet.
+        """
+
+        def sample(event):
+            """
+            Handles the specified send event, then samples the state.
+            """
+
+            handler(event)
+
+            packet = event.packet()
+
+            if not packet.ack() and self._owner(packet) is self._reference():
+                self._sample()
+
+        return sample
+
+    def _owner(self, packet):
+        """
+        Returns the flow of a host that the specified data packet or
+        acknowledgment belongs to, or None for the packets of routers.
+        """
+
+        source = packet.source()
+        dest = packet.dest()
+
+        if packet.ack():
+            (source, dest) = (dest, source)
+
+        if not isinstance(source, Host):
+            return None
+
+        return source.get_flows().get(dest)
+
+    def _moving(self, flow):
+        """
+        Returns True if the specified flow has started, and False
+        otherwise.
+        """
+
+        return flow is not None and flow.start() <= self._now
+
+    def _reference(self):
+        """
+        Returns the first started flow with data left to send, whose
+        data packets mark the samples of the state, or None if there is
+        none.
+        """
+
+        for flow in self._flows:
+            if self._moving(flow) and flow.has_data():
+                return flow
+
+        return None
+
+    def _window(self, flow):
+        """
+        Returns the number of packets the window of the specified flow
+        lets in flight, or None if the window does not limit them.
+        """
+
+        window = flow._window_size
+
+        if window >= 2 * (flow._num_unack + 1):
+            return None
+
+        return int(ceil(window))
+
+    def _signature(self):
+        """
+        Returns the part of the state that is compared between samples
+        before looking for a period.
+        """
+
+        flows = tuple([(flow._algorithm.state(), self._window(flow),
+                        flow._num_unack, flow.has_data())
+                       for flow in self._flows])
+
+        ports = tuple([(len(port.incoming()), len(port.outgoing())) for port in self._ports])
+
+        return (flows, ports)
+
+    def _relative(self, time):
+        """
+        Returns the specified time relative to the current time.
+        """
+
+        return round(time - self._now, 6)
+
+    def _describe(self, packet):
+        """
+        Returns the specified packet relative to the current state of
+        its flow, or None for the packets of routers.
+        """
+
+        flow = self._owner(packet)
+
+        if flow is None:
+            return None
+
+        seq = packet._id
+        if seq is not None:
+            seq -= flow._curr_seq_num
+
+        return (self._flow_index[flow], packet.ack(), seq,
+                packet._bits_size, self._relative(packet._create_time))
+
+    def _pending(self):
+        """
+        Returns every pending event other than the timers.
+        """
+
+        queue = self._event_queue
+
+        # Drains the scheduler, then pushes the events back in the same
+        # order, which keeps the order of ties with later events
+        scheduled = []
+        while len(queue) > 0:
+            scheduled.append(queue.pop())
+
+        for event in scheduled:
+            self._schedule(event)
+
+        pending = list(self._now_queue) + scheduled
+
+        # Only the head of each channel is on the scheduler
+        for port in sorted(self._channels, key=self._port_index.get):
+            pending.extend(list(self._channels[port])[1:])
+
+        return pending
+
+    def _state(self, pending):
+        """
+        Returns the state relative to the current time and sequence
+        numbers, given the specified pending events, without the timers.
+        """
+
+        events = tuple([(self._relative(event.scheduled()), event.action(),
+                         self._port_index[event.port()], self._describe(event.packet()))
+                        for event in pending if self._moving(self._owner(event.packet()))])
+
+        buffers = tuple([(tuple([self._describe(packet) for packet in port.incoming()._deque]),
+                          tuple([self._describe(packet) for packet in port.outgoing()._deque]))
+                         for port in self._ports])
+
+        # Only the links that are still busy constrain the next packets
+        links = tuple([tuple(sorted([(self._link_index[link], self._relative(time))
+                                     for (link, time) in device._most_recent.iteritems()
+                                     if time > self._now]))
+                       for device in self._devices_sorted])
+
+        flows = []
+
+        for flow in self._flows:
+            base = flow._curr_seq_num
+
+            algorithm = sorted([(name, value) for (name, value) in vars(flow._algorithm).iteritems()
+                                if name != '_flow'])
+
+            flows.append((self._window(flow), flow._num_unack, flow.has_data(),
+                          tuple([seq - base for seq in flow._unack_packets]),
+                          tuple(sorted([(seq - base, count)
+                                        for (seq, count) in flow._ack_counts.iteritems()])),
+                          tuple(algorithm),
+                          self._relative(max(flow._last_timeout, self._now - clock.ticks(Flow._MARGIN))),
+                          self._relative(max(flow._last_duplicate, self._now - clock.ticks(Flow._MARGIN)))))
+
+        expected = []
+
+        for device in self._devices_sorted:
+            if isinstance(device, Host):
+                for (source, num) in sorted(device._expected.iteritems(), key=lambda item: str(item[0])):
+                    flow = source.get_flows().get(device)
+
+                    if self._moving(flow):
+                        expected.append(num - flow._curr_seq_num)
+
+        return (events, buffers, links, tuple(flows), tuple(expected))
+
+    def _timer_state(self):
+        """
+        Returns the time left before each timer expires.
+        """
+
+        return dict([(self._flow_index[flow], event.scheduled() - self._now)
+                     for (flow, (tick, event)) in self._timers._timers.iteritems()])
+
+    def _sample(self):
+        """
+        Records the state after a data packet of the reference flow was
+        sent, and skips ahead once it repeats over enough periods.
+        """
+
+        now = self._now
+        seqs = tuple([flow._curr_seq_num for flow in self._flows])
+        bits = tuple([flow._num_bits for flow in self._flows])
+
+        candidate = self._candidate
+
+        # Verifies the period found by comparing the whole state one
+        # period apart
+        if candidate is not None:
+            (target, period, sends, sent, state, timers) = candidate
+
+            if now < target and not _close(now, target):
+                return
+
+            self._candidate = None
+
+            if _close(now, target):
+                pending = self._pending()
+
+                if (self._state(pending) == state
+                        and self._steady(timers, self._timer_state(), period)
+                        and self._skip(period, sends, sent, pending)):
+                    self._backoff = 1
+                    return
+
+            self._failed.add(round(period, 6))
+            self._wait = self._backoff
+            self._backoff = min(2 * self._backoff, _BACKOFF)
+
+        signature = self._signature()
+
+        if len(self._history) > _LIMIT:
+            self._history = {}
+            self._failed = set()
+
+        occurrences = self._history.setdefault(signature, [])
+
+        candidates = occurrences[-_CANDIDATES:]
+
+        if self._wait > 0:
+            self._wait -= 1
+            candidates = []
+
+        for (time, old_seqs, old_bits) in reversed(candidates):
+            period = now - time
+            sends = [seq - old for (seq, old) in zip(seqs, old_seqs)]
+
+            # Tries longer periods once the shorter ones failed
+            if round(period, 6) in self._failed:
+                continue
+
+            if self._repeats(occurrences, now, period, seqs, sends):
+                sent = [None] * len(bits)
+                for (i, (num, old)) in enumerate(zip(bits, old_bits)):
+                    if num is not None:
+                        sent[i] = old - num
+
+                self._candidate = (now + period, period, sends, sent,
+                                   self._state(self._pending()), self._timer_state())
+                break
+
+        occurrences.append((now, seqs, bits))
+        del occurrences[:-_KEEP]
+
+    def _repeats(self, occurrences, now, period, seqs, sends):
+        """
+        Returns True if the specified occurrences of the state recur
+        with the specified period and sequence numbers sent per period
+        over enough periods, and False otherwise.
+        """
+
+        # Checks that the reference flow sent packets in the period
+        if period <= 0 or max(sends) <= 0 or min(sends) < 0:
+            return False
+
+        for i in xrange(1, _REPEATS + 1):
+            expected = [seq - i * sent for (seq, sent) in zip(seqs, sends)]
+
+            if not [time for (time, old_seqs, old_bits) in occurrences
+                    if _close(time, now - i * period) and list(old_seqs) == expected]:
+                return False
+
+        return True
+
+    def _steady(self, first, second, period):
+        """
+        Returns True if the specified times left on the timers, one
+        period apart, show that every timer is re-armed each period,
+        and False otherwise.
+        """
+
+        if sorted(first) != sorted(second):
+            return False
+
+        for (key, left) in first.iteritems():
+            if abs(second[key] - left) >= period / 2:
+                return False
+
+        return True
+
+    def _periods(self, period, sent, pending):
+        """
+        Returns the number of periods that can be skipped, given the
+        specified bits sent by each flow per period and the specified
+        pending events.
+        """
+
+        now = self._now
+
+        # Latest time the shifted events may reach
+        limits = []
+
+        if self._horizon is not None:
+            limits.append(self._horizon)
+
+        for flow in self._flows:
+            if not self._moving(flow):
+                limits.append(flow.start())
+
+        reach = 0
+
+        for event in pending:
+            if self._moving(self._owner(event.packet())):
+                reach = max(reach, event.scheduled() - now)
+            else:
+                limits.append(event.scheduled())
+
+        num_periods = None
+
+        if limits:
+            num_periods = int((min(limits) - now - reach) // period) - _MARGIN
+
+        for (flow, bits) in zip(self._flows, sent):
+            if bits and flow._num_bits is not None:
+                num = int(flow._num_bits // bits) - _MARGIN
+
+                if num_periods is None or num < num_periods:
+                    num_periods = num
+
+        # Does not skip without an end in sight
+        if num_periods is None:
+            return 0
+
+        return num_periods
+
+    def _skip(self, period, sends, sent, pending):
+        """
+        Skips ahead by as many of the specified periods as possible,
+        given the specified sequence numbers and bits sent by each flow
+        per period and the specified pending events.
+
+        Returns True if any period was skipped, and False otherwise.
+        """
+
+        num_periods = self._periods(period, sent, pending)
+
+        if num_periods <= 0:
+            return False
+
+        now = self._now
+        shift = num_periods * period
+
+        moving = set([flow for flow in self._flows if self._moving(flow)])
+        offsets = dict([(flow, num_periods * sends[i])
+                        for (i, flow) in enumerate(self._flows)])
+
+        moved = set()
+
+        def move_packet(packet):
+            """
+            Moves the specified packet forward, unless already moved.
+            """
+
+            if id(packet) in moved:
+                return
+
+            moved.add(id(packet))
+
+            flow = self._owner(packet)
+
+            if flow in moving:
+                if packet._id is not None:
+                    packet._id += offsets[flow]
+
+                packet._create_time += shift
+
+        def move_event(event):
+            """
+            Moves the specified event and its packet forward, unless it
+            belongs to a router or a flow that has not started.
+            """
+
+            if self._owner(event.packet()) in moving:
+                event._scheduled_time += shift
+                move_packet(event.packet())
+
+        # Moves the pending events, then pushes the events back in
+        # order
+        queue = self._event_queue
+
+        scheduled = []
+        while len(queue) > 0:
+            scheduled.append(queue.pop())
+
+        for event in pending:
+            move_event(event)
+
+        for event in scheduled:
+            self._schedule(event)
+
+        # Moves the timers
+        wheel = self._timers
+
+        timers = [(key, event) for (key, (tick, event)) in wheel._timers.items()]
+
+        for (key, event) in timers:
+            wheel.cancel(key)
+
+        wheel._tick += wheel._tick_of(now + shift) - wheel._tick_of(now)
+
+        for (key, event) in timers:
+            if key in moving:
+                event._scheduled_time += shift
+                move_packet(event.packet())
+
+            wheel.arm(key, event)
+
+        # Moves the packets waiting in the buffers, and the times they
+        # entered them
+        for port in self._ports:
+            entries = port.conn().getTracker()._packet_entries
+
+            for packet in port.outgoing()._deque:
+                if self._owner(packet) in moving and packet in entries:
+                    entries[packet] += shift
+
+            for packet in list(port.incoming()._deque) + list(port.outgoing()._deque):
+                move_packet(packet)
+
+        # Moves the times the links are busy until
+        for device in self._devices_sorted:
+            for (link, time) in device._most_recent.items():
+                if time > now:
+                    device._most_recent[link] = time + shift
+
+        # Advances the flows by what they send in the skipped periods
+        for (flow, bits) in zip(self._flows, sent):
+            if flow not in moving:
+                continue
+
+            offset = offsets[flow]
+
+            flow._curr_seq_num += offset
+            flow._unack_packets = [seq + offset for seq in flow._unack_packets]
+            flow._ack_counts = dict([(seq + offset, count)
+                                     for (seq, count) in flow._ack_counts.iteritems()])
+
+            flow._last_timeout += shift
+            flow._last_duplicate += shift
+
+            # Notifies the observer if the flow completes
+            if flow.bits() is not None:
+                flow.bits(flow.bits() - num_periods * bits)
+
+            tracker = flow.getTracker()
+
+            for records in [tracker._times_sent, tracker._times_received,
+                            tracker._flowrates, tracker._window_sizes, tracker._rtts]:
+                _repeat(records, now, period, num_periods)
+
+        for device in self._devices_sorted:
+            if isinstance(device, Host):
+                for (source, num) in device._expected.items():
+                    flow = source.get_flows().get(device)
+
+                    if flow in moving:
+                        device._expected[source] = num + offsets[flow]
+
+        for port in self._ports:
+            tracker = port.conn().getTracker()
+
+            for records in [tracker._times_sent, tracker._packet_losses,
+                            tracker._buffer_sizes, tracker._round_trips,
+                            tracker._link_rates, tracker._queueing_delays]:
+                _repeat(records, now, period, num_periods)
+
+        self._now += shift
+        self._skipped += shift
+
+        self._history = {}
+        self._failed = set()
+
+        return True
@@ -0,0 +1,46 @@
+"""
+Fixtures shared by the tests that compare simulations.
+"""
+
+from setup import Setup
+from simulation import Simulation
+
+def simulation(filename, engine=Simulation, **options):
+    """
+    Builds a simulation of the specified configuration with the
+    specified engine and options.
+    """
+
+    config = Setup(filename)
+
+    return engine(config.devices, config.flows, config.links, **options)
+
+def run(engine, filename, **options):
+    """
+    Runs the specified configuration with the specified engine and
+    options, and returns the simulation.
+    """
+
+    sim = simulation(filename, engine, **options)
+    sim.run()
+
+    return sim
+
+def statistics(sim, delays=True):
+    """
+    Returns the statistics recorded by the measured flows and links of
+    the specified simulation, leaving out the round trip times and the
+    queueing delays if delays is False.
+    """
+
+    flows = [sim._measure_flows[name].getTracker() for name in sorted(sim._measure_flows)]
+    links = [sim._measure_links[name].getTracker() for name in sorted(sim._measure_links)]
+
+    if not delays:
+        return ([(tracker._times_sent, tracker._window_sizes) for tracker in flows],
+                [(tracker._times_sent, tracker._buffer_sizes) for tracker in links])
+
+    return ([(tracker._times_sent, tracker._window_sizes, tracker._rtts)
+             for tracker in flows],
+            [(tracker._times_sent, tracker._buffer_sizes, tracker._queueing_delays)
+             for tracker in links])
@@ -0,0 +1,36 @@
+import nose
+
+from simulation import Simulation
+from tests.helpers import run, simulation
+
+def _sent(sim):
+    """
+    Returns the times sent recorded by the measured links of the
+    specified simulation.
+    """
+
+    return [sim._measure_links[name].getTracker()._times_sent
+            for name in sorted(sim._measure_links)]
+
+def test_variants_continue_from_branch():
+    filename = 'configs/hosts-simple.cfg'
+
+    sim = run(Simulation, filename)
+
+    branched = simulation(filename)
+    link = branched._measure_links.values()[0]
+
+    def unchanged(sim):
+        pass
+
+    def slower(sim):
+        link.rate(link.rate() / 2)
+
+    results = branched.branch(100, [unchanged, slower], _sent, processes=1)
+
+    # Checks that an unchanged variant matches an uninterrupted run
+    assert results[0] == _sent(sim)
+    assert results[1] != _sent(sim)
+
+    # Checks that the parent stopped at the branching time
+    assert not branched.finished() and branched.now() < 100
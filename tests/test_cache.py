@@ -0,0 +1,118 @@
+import nose
+
+import os
+import shutil
+import tempfile
+
+import cache
+from tests.helpers import simulation, statistics
+
+def _datafiles():
+    """
+    Returns the contents of each datafile.
+    """
+
+    return dict([(name, open(os.path.join(cache.DATAFILES, name)).read())
+                 for name in os.listdir(cache.DATAFILES)])
+
+def test_key_ignores_formatting():
+    filename = os.path.abspath('configs/hosts-simple.cfg')
+    directory = tempfile.mkdtemp()
+
+    try:
+        lines = [line.strip() for line in open(filename, 'r') if line.strip()]
+
+        # Reverses the entries of every section and pads their numbers
+        sections = []
+        for line in lines:
+            if line.startswith('#'):
+                sections.append([line])
+            else:
+                sections[-1].insert(1, line.replace(', 0,', ', 0.0,').replace(', ', ',  '))
+
+        path = os.path.join(directory, 'reordered.cfg')
+
+        outfile = open(path, 'w')
+        outfile.write('\n'.join(sum(sections, [])) + '\n')
+        outfile.close()
+
+        assert cache.key(path, {}) == cache.key(filename, {})
+        assert cache.key(filename, {'until': 100.0}) != cache.key(filename, {})
+
+    finally:
+        shutil.rmtree(directory)
+
+def test_replay_matches_run():
+    filename = os.path.abspath('configs/hosts-simple.cfg')
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+
+    try:
+        os.chdir(directory)
+        os.mkdir(cache.DATAFILES)
+
+        sim = simulation(filename)
+
+        key = cache.key(filename, {})
+        assert cache.lookup('cache', key) is None
+
+        recorder = cache.Recorder()
+        sim.run()
+        sim.finish()
+        cache.store('cache', key, recorder, sim)
+
+        datafiles = _datafiles()
+        shutil.rmtree(cache.DATAFILES)
+        os.mkdir(cache.DATAFILES)
+
+        # Checks that the replay restores the datafiles and trackers
+        replayed = simulation(filename)
+
+        cache.replay(cache.lookup('cache', key), replayed._measure_flows,
+                     replayed._measure_links)
+
+        assert _datafiles() == datafiles
+        assert statistics(replayed) == statistics(sim)
+
+        # Checks that the least recently used entry is evicted first
+        other = cache.key(filename, {'until': 100.0})
+        cache.store('cache', other, cache.Recorder(), sim,
+                    cache._size(os.path.join('cache', key)))
+
+        assert cache.lookup('cache', key) is None
+        assert cache.lookup('cache', other) is not None
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+def test_recorder_notes_datafiles_with_same_time():
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+
+    try:
+        os.chdir(directory)
+        os.mkdir(cache.DATAFILES)
+
+        path = os.path.join(cache.DATAFILES, 'windowsize_F1.dta')
+
+        outfile = open(path, 'w')
+        outfile.write('0 1\n')
+        outfile.close()
+
+        os.utime(path, (1000000000, 1000000000))
+
+        recorder = cache.Recorder()
+
+        outfile = open(path, 'w')
+        outfile.write('0 2\n')
+        outfile.close()
+
+        # Checks that a datafile rewritten with its time kept is noted
+        os.utime(path, (1000000000, 1000000000))
+
+        assert recorder.stop() == ('', ['windowsize_F1.dta'])
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
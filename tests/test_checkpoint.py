@@ -0,0 +1,50 @@
+import nose
+
+import os
+import tempfile
+
+from hybrid import HybridSimulation
+from steady import SteadySimulation
+from tests.helpers import simulation, statistics
+
+def _check_restore(filename, until):
+    """
+    Checks that the specified configuration saved at the specified
+    time and restored runs as it does uninterrupted.
+    """
+
+    sim = simulation(filename)
+    sim.run()
+
+    (handle, path) = tempfile.mkstemp()
+    os.close(handle)
+
+    try:
+        stopped = simulation(filename)
+        stopped.run(until=until)
+        stopped.save(path)
+
+        resumed = simulation(filename)
+        resumed.restore(path)
+
+        # Checks that the restored simulation resumes where it stopped
+        assert resumed.now() == stopped.now()
+        assert resumed.run()
+
+        assert statistics(resumed) == statistics(sim)
+        assert resumed.processed() == sim.processed()
+    finally:
+        os.remove(path)
+
+def test_restore_matches_uninterrupted_run():
+    _check_restore('configs/hosts-simple.cfg', 100)
+
+def test_restore_with_routers_matches_uninterrupted_run():
+    _check_restore('configs/two-routers.cfg', 500)
+
+def test_engines_with_own_state_are_not_checkpointed():
+    for engine in (SteadySimulation, HybridSimulation):
+        sim = simulation('configs/hosts-simple.cfg', engine)
+
+        nose.tools.assert_raises(TypeError, sim.save, os.devnull)
+        nose.tools.assert_raises(TypeError, sim.restore, os.devnull)
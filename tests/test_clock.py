@@ -0,0 +1,44 @@
+import nose
+
+import clock
+from simulation import Simulation
+from tests.helpers import run, statistics
+
+def _close(expected, actual):
+    """
+    Returns True if the specified statistics hold the same records,
+    with times that differ only by rounding, and False otherwise.
+    """
+
+    if isinstance(expected, (int, float)):
+        return abs(expected - actual) < 1e-6
+
+    return (len(expected) == len(actual) and
+            all([_close(a, b) for (a, b) in zip(expected, actual)]))
+
+def test_ticks_match_milliseconds():
+    filename = 'configs/hosts-simple.cfg'
+
+    sim = run(Simulation, filename)
+    now = sim.now()
+
+    clock.use_ticks(clock.NS_PER_MS)
+
+    try:
+        ticked = run(Simulation, filename)
+
+        # Checks that finalizing twice rescales the trackers once
+        ticked._rescale()
+        rescaled = statistics(ticked)
+        ticked._rescale()
+
+        assert statistics(ticked) == rescaled
+        assert _close(now, ticked.now())
+        assert ticked.processed() == sim.processed()
+
+        # Checks that the rescaled trackers cannot record ticks again
+        nose.tools.assert_raises(ValueError, ticked.run)
+    finally:
+        clock.use_ticks()
+
+    assert _close(statistics(sim), rescaled)
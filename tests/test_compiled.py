@@ -0,0 +1,54 @@
+import nose
+
+from compiled import CompiledSimulation
+from simulation import Simulation
+from tests.helpers import simulation, statistics
+
+def _run(engine, filename, step=None):
+    """
+    Runs the specified configuration on the specified engine, in
+    chunks of the specified number of milliseconds if specified, and
+    returns the statistics recorded by the measured flows and links.
+    """
+
+    class Recorded(engine):
+        def _finalize(self):
+            return statistics(self)
+
+    sim = simulation(filename, Recorded)
+
+    if step is None:
+        return sim.start()
+
+    times = list(sim.steps(ms=step))
+
+    # Checks that each chunk advances up to its horizon
+    assert times == sorted(times) and sim.finished()
+    assert all([time < step * (i + 1) for (i, time) in enumerate(times)])
+
+    return sim.finish()
+
+def _run_until(engine, filename, until):
+    """
+    Runs the specified configuration on the specified engine up to the
+    specified time, and returns the statistics recorded so far.
+    """
+
+    sim = simulation(filename, engine)
+    sim.run(until=until)
+
+    return (sim.now(), statistics(sim))
+
+def test_same_statistics():
+    for filename in ['configs/demo.cfg', 'configs/hosts-simple.cfg',
+                     'configs/two-routers.cfg']:
+        assert _run(CompiledSimulation, filename) == _run(Simulation, filename)
+
+def test_same_statistics_with_routers():
+    for filename in ['configs/test-case-1.cfg', 'configs/test-case-2.cfg']:
+        assert (_run_until(CompiledSimulation, filename, 1500) ==
+                _run_until(Simulation, filename, 1500))
+
+def test_stepped_statistics():
+    for engine in [Simulation, CompiledSimulation]:
+        assert _run(engine, 'configs/demo.cfg', 50) == _run(engine, 'configs/demo.cfg')
@@ -0,0 +1,27 @@
+import nose
+
+import convergence
+from tests.helpers import simulation
+
+def test_warmup_is_discarded():
+    means = [10.0] * 10 + [1.0, 2.0] * 15
+
+    assert convergence.warmup(means) == 10
+
+def test_stops_at_steady_state():
+    sim = simulation('configs/test-case-1-fast.cfg')
+    result = convergence.run(sim, 0.05, 50)
+
+    # Checks that the run stopped long before the flow completed
+    assert result.estimates is not None
+    assert not sim.finished()
+    assert sim.now() < 5000
+
+    estimates = dict([(name, mean) for (name, mean, half_width) in result.estimates])
+
+    # Checks that the flow fills the link with the queue of FAST
+    assert abs(estimates['F1 flow rate'] - 10000) < 500
+    assert abs(estimates['L1 queueing delay'] - 40) < 4
+
+    # Checks that the report holds the warm-up and every estimate
+    assert len(result.report()) == len(result.estimates) + 1
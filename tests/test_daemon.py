@@ -0,0 +1,68 @@
+import nose
+
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+import client
+import daemon
+
+def test_request_runs_configuration():
+    filename = os.path.abspath('configs/hosts-simple.cfg')
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'daemon.sock')
+    cwd = os.getcwd()
+
+    pid = os.fork()
+
+    if pid == 0:
+        try:
+            daemon.serve(path, 1)
+        finally:
+            os._exit(0)
+
+    try:
+        # Waits for the daemon to listen
+        deadline = time.time() + 10
+
+        while not os.path.exists(path):
+            assert time.time() < deadline, 'daemon did not start'
+            time.sleep(0.01)
+
+        # Checks that only the user can connect, and that a second
+        # daemon refuses to take over the socket
+        assert os.stat(path).st_mode & 0777 == 0600
+        nose.tools.assert_raises(ValueError, daemon.serve, path, 1)
+
+        os.chdir(directory)
+        os.mkdir('datafiles')
+
+        (output, error) = client.request([filename, '--until=100'], path)
+
+        assert error is None
+        assert 'flow name F1' in output
+        assert 'windowsize_F1.dta' in os.listdir('datafiles')
+
+        # Checks that a failed run reports its error
+        (output, error) = client.request([filename, '--until=never'], path)
+
+        assert 'ValueError' in error
+
+        # Checks that a request from a relative directory is refused
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+        client.send(connection, ('datafiles', '', []))
+
+        (output, error) = client.receive(connection)
+        connection.close()
+
+        assert 'directory must be' in error
+
+    finally:
+        os.chdir(cwd)
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        shutil.rmtree(directory)
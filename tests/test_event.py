@@ -0,0 +1,28 @@
+import nose
+
+from event import Event, POOL
+from tests.helpers import simulation
+
+def test_push_numbers_ties_in_order():
+    sim = simulation('configs/hosts-simple.cfg')
+    port = sim._devices[0].get_ports()
+
+    events = [POOL.create(50, port, action, None)
+              for action in [Event._SEND, Event._CREATE, Event._TIMEOUT]]
+
+    for event in events:
+        sim.push(event)
+
+    # Checks that events of the same time are ordered by their pushes
+    assert [event._sequence for event in events] == [1, 2, 3]
+    assert sorted(reversed(events)) == events
+
+    assert [sim._pop() for event in events] == events
+
+def test_pool_clears_sequence():
+    event = POOL.create(10, None, Event._CREATE, None)
+    event._sequence = 7
+
+    POOL.release(event)
+
+    assert POOL.create(10, None, Event._CREATE, None)._sequence is None
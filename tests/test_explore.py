@@ -0,0 +1,43 @@
+import csv
+import os
+import shutil
+import tempfile
+
+import nose
+
+import explore
+
+def _rows(results):
+    """
+    Returns the rows of the specified result table, without its header.
+    """
+
+    infile = open(results, 'rb')
+    rows = list(csv.reader(infile, delimiter='\t'))
+    infile.close()
+
+    return rows[1:]
+
+def test_failed_runs_are_resumed():
+    filename = 'configs/hosts-simple.cfg'
+    directory = tempfile.mkdtemp()
+
+    try:
+        results = os.path.join(directory, 'results.tsv')
+        ranges = [explore.parse_range('rate', 'C1=10000:12500:2500'),
+                  explore.parse_range('algorithm', '*=reno,none')]
+
+        assert explore.sweep(filename, ranges, results, processes=2) == 2
+
+        rows = _rows(results)
+        assert sorted([(row[1], row[2], row[3]) for row in rows]) == \
+            [('10000', 'none', 'failed'), ('10000', 'reno', 'ok'),
+             ('12500', 'none', 'failed'), ('12500', 'reno', 'ok')]
+
+        # Checks that only the failed runs are run again
+        assert explore.sweep(filename, ranges, results, processes=2) == 2
+        assert [row for row in _rows(results) if row[3] == 'ok'] == \
+            [row for row in rows if row[3] == 'ok']
+
+    finally:
+        shutil.rmtree(directory)
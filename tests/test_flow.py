@@ -0,0 +1,34 @@
+import nose
+
+from congestion.aimd import AIMD
+from flow import Flow
+
+class _Counter:
+    def __init__(self):
+        self.incomplete = 1
+
+    def flow_completed(self, flow):
+        self.incomplete -= 1
+
+    def flow_resumed(self, flow):
+        self.incomplete += 1
+
+def test_completion_notifications():
+    flow = Flow(AIMD())
+    flow.bits(16000)
+
+    counter = _Counter()
+    flow.observer(counter)
+
+    flow.bits(8000)
+    flow.unack(1)
+    flow.bits(0)
+    assert counter.incomplete == 1
+
+    # Checks that the flow completes once its last packet is acknowledged
+    flow.unack(0)
+    assert counter.incomplete == 0
+
+    # Checks that the flow resumes when a packet is outstanding again
+    flow.unack(1)
+    assert counter.incomplete == 1
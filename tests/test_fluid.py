@@ -0,0 +1,35 @@
+import nose
+
+from fluid import FluidSimulation
+from simulation import Simulation
+from tests.helpers import run
+
+def test_fast_reaches_equilibrium():
+    sim = run(FluidSimulation, 'configs/test-case-1-fast.cfg')
+
+    assert sim.finished()
+
+    # Checks that FAST TCP keeps alpha packets queued at the bottleneck,
+    # which holds 1.25 packets per millisecond
+    (time, window) = sim._measure_flows['F1'].getTracker()._window_sizes[-1]
+    (time, rtt) = sim._measure_flows['F1'].getTracker()._rtts[-1]
+    (time, delay) = sim._measure_links['L1'].getTracker()._queueing_delays[-1]
+
+    assert abs(delay - 40) < 1
+    assert abs(window - 1.25 * (rtt - delay) - 50) < 1
+
+def test_fluid_matches_packets():
+    filename = 'configs/hosts-simple-fast.cfg'
+
+    sim = run(Simulation, filename)
+    fluid = run(FluidSimulation, filename)
+
+    # Checks that the transfer took about as long
+    assert abs(fluid.now() - sim.now()) < 0.2 * sim.now()
+
+    # Checks that the round trip times are the same once settled
+    for name in sim._measure_flows:
+        rtts = sim._measure_flows[name].getTracker()._rtts
+        fluid_rtts = fluid._measure_flows[name].getTracker()._rtts
+
+        assert abs(rtts[-1][1] - fluid_rtts[-1][1]) < 1
@@ -0,0 +1,37 @@
+import nose
+
+from hybrid import HybridSimulation
+from simulation import Simulation
+from tests.helpers import run
+
+def test_background_flows_are_fluid():
+    filename = 'configs/background.cfg'
+
+    sim = run(Simulation, filename)
+    hybrid = run(HybridSimulation, filename)
+
+    # Checks that every flow completed with far fewer events
+    assert hybrid.finished()
+    assert hybrid.processed() < sim.processed() / 2
+
+    # Checks that the hosts still hold their fluid flows
+    for (flow, host) in hybrid._fluid.iteritems():
+        assert flow.is_complete()
+        assert host.get_flows()[flow.dest()] is flow
+
+    # Checks that the measured flow sent its packets
+    for name in sim._measure_flows:
+        sent = sim._measure_flows[name].getTracker()._times_sent
+        fluid = hybrid._measure_flows[name].getTracker()._times_sent
+
+        assert len(fluid) == len(sent)
+
+    # Checks that the bottleneck carried the fluid as well
+    for name in sim._measure_links:
+        sent = sum(size for (time, size) in sim._measure_links[name].getTracker()._times_sent)
+        fluid = sum(size for (time, size) in hybrid._measure_links[name].getTracker()._times_sent)
+
+        assert abs(fluid - sent) < 0.05 * sent
+
+    # Checks that the transfers took about as long
+    assert abs(hybrid.now() - sim.now()) < 0.25 * sim.now()
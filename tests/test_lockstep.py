@@ -0,0 +1,68 @@
+import nose
+
+import lockstep
+from tests.helpers import simulation, statistics
+
+def _buffers(sim):
+    """
+    Returns the buffers at both ends of the measured links of the
+    specified simulation.
+    """
+
+    buffers = []
+
+    for name in sorted(sim._measure_links):
+        link = sim._measure_links[name]
+
+        for port in [link.dest(), link.dest().conn().dest()]:
+            buffers.extend([port.incoming(), port.outgoing()])
+
+    return buffers
+
+def test_variants_match_separate_runs():
+    filename = 'configs/hosts-simple.cfg'
+    sizes = [512000, 512000, 16000]
+
+    expected = []
+    for size in sizes:
+        sim = simulation(filename, trusted=True)
+
+        for buffer in _buffers(sim):
+            buffer._max_size = size
+
+        sim.run()
+        expected.append(statistics(sim))
+
+    sim = simulation(filename, trusted=True)
+
+    # Checks that the variants still diverge with a single process at once
+    results = sim.sweep([(buffer, '_max_size', sizes) for buffer in _buffers(sim)],
+                        statistics, 1)
+
+    assert results == expected
+
+    # Checks that the variants diverged
+    assert results[0] != results[2]
+
+def test_varied_alphas_match_separate_runs():
+    filename = 'configs/hosts-simple-fast.cfg'
+    alphas = [50, 40, 20]
+
+    expected = []
+    for alpha in alphas:
+        sim = simulation(filename, trusted=True)
+        sim._measure_flows['F1']._algorithm._alpha = alpha
+
+        sim.run()
+        expected.append(statistics(sim))
+
+    sim = simulation(filename, trusted=True)
+
+    # Checks that the varied window sizes keep the timing of each variant
+    results = sim.sweep([(sim._measure_flows['F1']._algorithm, '_alpha', alphas)],
+                        statistics, 1)
+
+    assert results == expected
+
+def test_varied_values_are_not_hashable():
+    nose.tools.assert_raises(TypeError, hash, lockstep.Varied([1, 2]))
@@ -0,0 +1,45 @@
+import nose
+
+from packet import Packet
+
+def test_header_fields_are_slots():
+    packet = Packet()
+
+    try:
+        packet.color = 'red'
+    except AttributeError:
+        pass
+    else:
+        assert False, 'packet must only have its header fields'
+
+def test_data_maps_to_header():
+    packet = Packet()
+
+    assert not packet.has_datum(Packet._ACK)
+
+    packet.datum(Packet._ACK, True)
+
+    assert packet.ack()
+    assert packet.has_datum(Packet._ACK)
+
+    # Checks that the table of other data is only created when needed
+    assert packet._data is None
+
+    packet.datum('hops', 3)
+
+    assert packet.datum('hops') == 3
+    assert sorted(packet.data()) == [(Packet._ACK, True), ('hops', 3)]
+
+def test_routing_can_be_removed():
+    packet = Packet()
+
+    packet.routing({'R1': 10.0})
+
+    assert packet.has_datum(Packet._ROUTING)
+    assert packet.datum(Packet._ROUTING) == {'R1': 10.0}
+
+    packet.routing(None)
+
+    assert not packet.has_datum(Packet._ROUTING)
+    assert packet.routing() is None
+    assert packet.data() == []
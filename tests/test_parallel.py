@@ -0,0 +1,47 @@
+import nose
+
+from parallel import ComponentSimulation, ParallelSimulation
+from simulation import Simulation
+from tests.helpers import simulation, statistics
+
+def _run(engine, filename, **options):
+    """
+    Runs the specified configuration with the specified engine, and
+    returns the simulation.
+    """
+
+    sim = simulation(filename, engine, **options)
+    sim.run()
+
+    # Brings the trackers back from the processes
+    if isinstance(sim, ParallelSimulation):
+        sim._gather()
+        sim._stop()
+
+    return sim
+
+def _check_partitions(filename, partitions):
+    """
+    Checks that the specified configuration split into the specified
+    number of partitions runs as it does sequentially.
+    """
+
+    expected = _run(Simulation, filename)
+    sim = _run(ParallelSimulation, filename, partitions=partitions)
+
+    assert statistics(sim) == statistics(expected)
+    assert sim.now() == expected.now()
+    assert sim.processed() == expected.processed()
+
+def test_partitions_match_sequential_run():
+    _check_partitions('configs/hosts-simple.cfg', 2)
+
+def test_partitions_with_routers_match_sequential_run():
+    _check_partitions('configs/two-routers.cfg', 2)
+    _check_partitions('configs/two-routers.cfg', 3)
+
+def test_components_match_sequential_run():
+    filename = 'configs/islands.cfg'
+
+    assert (statistics(_run(ComponentSimulation, filename, processes=2)) ==
+            statistics(_run(Simulation, filename)))
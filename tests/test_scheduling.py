@@ -0,0 +1,48 @@
+import nose
+
+from random import Random
+
+from scheduling.binaryheap import BinaryHeap
+from scheduling.calendarqueue import CalendarQueue
+from scheduling.ladderqueue import LadderQueue
+
+def _run(scheduler, seed):
+    """
+    Pushes and pops events on the specified scheduler with times drawn
+    from a seeded random generator, and returns the popped events.
+    """
+
+    rand = Random(seed)
+    popped = []
+
+    now = 0.0
+    num_events = 0
+
+    for i in xrange(2000):
+        if rand.random() < 0.55 or len(scheduler) == 0:
+            delay = rand.choice([0, 0, 10, 0.64, 0.04096, rand.random() * 50])
+            scheduler.push(now + delay, num_events)
+            num_events += 1
+        else:
+            now = scheduler.peek()
+            popped.append((now, scheduler.pop()))
+
+    while len(scheduler) > 0:
+        popped.append((scheduler.peek(), scheduler.pop()))
+
+    return popped
+
+def test_binary_heap_order():
+    for seed in xrange(10):
+        popped = _run(BinaryHeap(), seed)
+
+        # Checks that ties are returned in the order they were pushed
+        assert popped == sorted(popped)
+
+def test_calendar_queue_order():
+    for seed in xrange(10):
+        assert _run(CalendarQueue(), seed) == _run(BinaryHeap(), seed)
+
+def test_ladder_queue_order():
+    for seed in xrange(10):
+        assert _run(LadderQueue(), seed) == _run(BinaryHeap(), seed)
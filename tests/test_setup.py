@@ -0,0 +1,13 @@
+import nose
+
+from setup import main
+
+_FILENAME = 'configs/hosts-simple.cfg'
+
+def test_unknown_scheduler_is_rejected():
+    nose.tools.assert_raises(ValueError, main, [_FILENAME, 'splay'])
+
+def test_conflicting_engines_are_rejected():
+    for flags in [['--compiled', '--fluid'], ['--steady', '--hybrid=5'],
+                  ['--parallel=2', '--components']]:
+        nose.tools.assert_raises(ValueError, main, [_FILENAME] + flags)
@@ -0,0 +1,155 @@
+import nose
+
+from event import Event, POOL
+from simulation import Simulation
+from tests.helpers import run, simulation, statistics
+
+_FILENAME = 'configs/hosts-simple.cfg'
+
+def _check(sim, expected):
+    """
+    Checks that the specified simulation ran to completion with the
+    same events and statistics as the specified uninterrupted run.
+    """
+
+    assert sim.finished()
+    assert sim.now() == expected.now()
+    assert sim.processed() == expected.processed()
+    assert statistics(sim) == statistics(expected)
+
+def test_until_matches_uninterrupted_run():
+    expected = run(Simulation, _FILENAME)
+
+    sim = simulation(_FILENAME)
+    horizon = 0
+
+    while not sim.run(until=horizon):
+        # Checks that each chunk stops before its horizon
+        assert sim.now() < horizon or sim.processed() == 0
+
+        horizon += 20
+
+    _check(sim, expected)
+
+def test_max_events_matches_uninterrupted_run():
+    expected = run(Simulation, _FILENAME)
+
+    sim = simulation(_FILENAME)
+    processed = 0
+
+    while not sim.run(max_events=37):
+        # Checks that each chunk processes exactly the bound
+        assert sim.processed() == processed + 37
+
+        processed = sim.processed()
+
+    _check(sim, expected)
+
+def test_steps_match_uninterrupted_run():
+    expected = run(Simulation, _FILENAME)
+
+    sim = simulation(_FILENAME)
+    times = list(sim.steps(ms=25))
+
+    # Checks that each chunk advances up to its horizon
+    assert times == sorted(times)
+    assert all([time < 25 * (i + 1) for (i, time) in enumerate(times)])
+
+    _check(sim, expected)
+
+    sim = simulation(_FILENAME)
+    list(sim.steps(events=50))
+
+    _check(sim, expected)
+
+def _ports(sim):
+    """
+    Returns the ports of the hosts of the specified simulation.
+    """
+
+    return [device.get_ports() for device in sim._devices]
+
+def test_channels_keep_heads_on_scheduler():
+    sim = simulation(_FILENAME)
+    (first, second) = _ports(sim)
+
+    arrivals = [POOL.create(time, first, Event._RECEIVE, None) for time in [5, 6, 7]]
+    arrivals.append(POOL.create(5.5, second, Event._RECEIVE, None))
+
+    for event in arrivals:
+        sim.push(event)
+
+    # Checks that only the head of each channel is on the scheduler
+    assert len(sim._event_queue) == 2
+
+    popped = [sim._pop() for event in arrivals]
+
+    assert [event.scheduled() for event in popped] == [5, 5.5, 6, 7]
+    assert len(sim._event_queue) == 0
+
+def test_current_time_runs_before_scheduler():
+    sim = simulation(_FILENAME)
+    (port, other) = _ports(sim)
+
+    first = POOL.create(5, port, Event._SEND, None)
+    waiting = POOL.create(5, port, Event._CREATE, None)
+
+    sim.push(first)
+    sim.push(waiting)
+
+    assert sim._pop() is first
+
+    spawned = [POOL.create(5, port, action, None)
+               for action in [Event._SEND, Event._CREATE, Event._TIMEOUT]]
+
+    for event in spawned:
+        sim.push(event)
+
+    # Checks that the events spawned for the current time run in order,
+    # before the event of the same time still on the scheduler
+    assert len(sim._event_queue) == 1
+    assert [sim._pop() for event in spawned] == spawned
+    assert sim._pop() is waiting
+
+def _traced(sim, dispatch):
+    """
+    Replaces the handlers of the specified simulation by the specified
+    dispatch of an event received on a port, and returns the list of
+    the events it processes.
+    """
+
+    trace = []
+
+    def handler(port):
+        def handle(event):
+            trace.append((event.scheduled(), event.action(), str(port.source())))
+            dispatch(port, event)
+
+        return handle
+
+    sim._prepare()
+
+    for port in sim._handlers.keys():
+        sim._handlers[port] = [handler(port)] * len(Event._NAMES)
+
+    return trace
+
+def test_handler_table_matches_process():
+    filename = 'configs/two-routers.cfg'
+
+    sim = simulation(filename)
+    sim._prepare()
+
+    table = dict(sim._handlers)
+
+    trace = _traced(sim, lambda port, event: table[port][event.action()](event))
+    sim.run()
+
+    # Dispatches each event through the process() of its device instead
+    expected = simulation(filename)
+
+    expected_trace = _traced(expected, lambda port, event: port.source().process(event))
+    expected.run()
+
+    assert trace == expected_trace
+    assert statistics(sim) == statistics(expected)
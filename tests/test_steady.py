@@ -0,0 +1,26 @@
+import nose
+
+from simulation import Simulation
+from steady import SteadySimulation
+from tests.helpers import run
+
+def test_steady_state_is_skipped():
+    filename = 'configs/hosts-simple-fast.cfg'
+
+    sim = run(Simulation, filename)
+    steady = run(SteadySimulation, filename)
+
+    # Checks that most of the transfer was skipped
+    assert steady.skipped() > steady.now() / 2
+    assert steady.processed() < sim.processed() / 2
+
+    # Checks that the flow sent the same packets over the same time
+    assert abs(steady.now() - sim.now()) < 1
+
+    for name in sim._measure_flows:
+        sent = [size for (time, size, delay)
+                in sim._measure_flows[name].getTracker()._times_sent]
+        skipped = [size for (time, size, delay)
+                   in steady._measure_flows[name].getTracker()._times_sent]
+
+        assert skipped == sent
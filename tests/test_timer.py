@@ -0,0 +1,67 @@
+import nose
+
+from event import Event
+from timer import TimerWheel
+
+def _create_event(time):
+    event = Event()
+    event.scheduled(time)
+
+    return event
+
+def test_expire_in_order():
+    timers = TimerWheel(1, 4)
+
+    timers.arm('A', _create_event(2.5))
+    timers.arm('B', _create_event(9.2))
+
+    assert timers.expire(2.0) == []
+    assert [event.scheduled() for event in timers.expire(3.0)] == [2.5]
+    assert timers.expire(9.0) == []
+    assert [event.scheduled() for event in timers.expire(9.3)] == [9.2]
+    assert len(timers) == 0
+
+def test_rearm_and_cancel():
+    timers = TimerWheel(1, 4)
+
+    timers.arm('A', _create_event(20))
+    timers.arm('A', _create_event(30))
+    timers.arm('B', _create_event(5))
+
+    # Checks that cancelling hands back the event of the timer
+    assert timers.cancel('B').scheduled() == 5.0
+    assert timers.cancel('B') is None
+
+    assert len(timers) == 1
+    assert timers.armed('A')
+    assert not timers.armed('B')
+
+    assert [event.scheduled() for event in timers.expire()] == [30.0]
+
+def test_expire_visits_each_slot_once():
+    timers = TimerWheel(1, 4)
+
+    timers.arm('A', _create_event(1000000.5))
+    timers.arm('B', _create_event(7.5))
+    timers.arm('C', _create_event(7.25))
+
+    # Checks that a large jump leaves the timers of later rotations
+    assert [event.scheduled() for event in timers.expire(10.0)] == [7.25, 7.5]
+    assert timers.armed('A')
+
+    assert timers.expire(999999.0) == []
+
+    assert [event.scheduled() for event in timers.expire(2000000.0)] == [1000000.5]
+
+def test_expire_all_in_order():
+    timers = TimerWheel(1, 4)
+
+    events = dict([(key, _create_event(time))
+                   for (key, time) in [('A', 9), ('B', 3), ('C', 9), ('D', 1)]])
+
+    for key in ['A', 'B', 'C', 'D']:
+        timers.arm(key, events[key])
+
+    # Checks that timers of equal times expire in the order armed
+    assert timers.expire() == [events['D'], events['B'], events['A'], events['C']]
+    assert len(timers) == 0
@@ -0,0 +1,72 @@
+import nose
+
+import os
+import shutil
+import tempfile
+
+import trains
+from setup import main
+from simulation import Simulation
+from tests.helpers import run
+
+def _run(filename, use_trains):
+    """
+    Runs the specified configuration with or without trains, and
+    returns the simulation.
+    """
+
+    trains.use_trains(use_trains)
+
+    try:
+        return run(Simulation, filename)
+    finally:
+        trains.use_trains(False)
+
+def test_trains_match_packets():
+    filename = 'configs/background.cfg'
+
+    sim = _run(filename, False)
+    train = _run(filename, True)
+
+    # Checks that every flow completed with far fewer events
+    assert train.finished()
+    assert train.processed() < sim.processed() / 4
+
+    # Checks that the measured flow recorded each of its packets
+    for name in sim._measure_flows:
+        sent = sim._measure_flows[name].getTracker()._times_sent
+        trained = train._measure_flows[name].getTracker()._times_sent
+
+        assert len(trained) == len(sent)
+
+    # Checks that the links recorded the packets one by one
+    for name in sim._measure_links:
+        sent = sim._measure_links[name].getTracker()._times_sent
+        trained = train._measure_links[name].getTracker()._times_sent
+
+        assert set(size for (time, size) in trained) == set(size for (time, size) in sent)
+        assert abs(len(trained) - len(sent)) < 0.05 * len(sent)
+
+    # Checks that the transfers took about as long
+    assert abs(train.now() - sim.now()) < 0.1 * sim.now()
+
+def test_trains_only_last_one_run():
+    filename = os.path.abspath('configs/hosts-simple.cfg')
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+
+    try:
+        os.chdir(directory)
+        os.mkdir('datafiles')
+
+        main([filename, '--trains'])
+
+        assert not trains.uses_trains()
+
+        # Checks that the engines that do not run the devices reject trains
+        for engine in ['--compiled', '--fluid', '--hybrid', '--parallel=2']:
+            nose.tools.assert_raises(ValueError, main, [filename, '--trains', engine])
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
@@ -0,0 +1,57 @@
+import nose
+
+import validation
+
+from event import Event, POOL
+from packet import Packet
+from tests.helpers import simulation
+
+def test_strict_by_default():
+    assert not validation.is_trusted()
+
+    packet = Packet()
+
+    try:
+        packet.seq('1')
+    except TypeError:
+        pass
+    else:
+        assert False, 'strict mode must check the sequence number'
+
+def test_trusted_skips_checks():
+    validation.use_trusted()
+
+    try:
+        packet = Packet()
+        packet.seq(1)
+        packet.size(8000)
+
+        assert packet.seq() == 1
+        assert packet.size() == 8000
+    finally:
+        validation.use_trusted(False)
+
+    assert not validation.is_trusted()
+
+def test_strict_rejects_released_events():
+    event = POOL.create(1, None, Event._RECEIVE, Packet())
+
+    # Checks that the time is converted to the time base
+    assert isinstance(event.scheduled(), float)
+
+    POOL.release(event)
+
+    nose.tools.assert_raises(ValueError, event.scheduled)
+    nose.tools.assert_raises(ValueError, event.packet)
+
+def test_trusted_only_while_running():
+    sim = simulation('configs/hosts-simple.cfg', trusted=True)
+
+    # Checks that building a trusted simulation keeps the strict mode
+    assert not validation.is_trusted()
+
+    sim.run(until=50)
+
+    assert not validation.is_trusted()
+
+    nose.tools.assert_raises(TypeError, Packet().seq, '1')
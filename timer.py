@@ -0,0 +1,161 @@
+class TimerWheel:
+    """
+    Hashed timing wheel for cancellable timers.
+
+    Each timer is identified by a key and holds the event to schedule
+    when it expires. Arming and cancelling a timer are O(1), and at
+    most one timer is live for each key. Expiring advances the wheel
+    slot by slot from the last tick it reached, and visits each slot at
+    most once however far it advances, leaving the timers of later
+    rotations in their slots.
+    """
+
+    def __init__(self, resolution=1.0, num_slots=512):
+        """
+        Creates a TimerWheel instance with the specified tick
+        resolution and the specified number of slots.
+        """
+
+        # Checks whether resolution is an int and converts to float
+        if isinstance(resolution, int):
+            resolution = float(resolution)
+
+        # Checks that resolution is a float
+        if not isinstance(resolution, float):
+            raise TypeError, 'resolution must be a float'
+
+        # Checks that resolution is positive
+        elif resolution <= 0:
+            raise ValueError, 'resolution must be positive'
+
+        # Checks that num_slots is an int
+        if not isinstance(num_slots, int):
+            raise TypeError, 'number of slots must be an int'
+
+        # Checks that num_slots is positive
+        elif num_slots <= 0:
+            raise ValueError, 'number of slots must be positive'
+
+        self._resolution = resolution
+        self._num_slots = num_slots
+
+        self._slots = [{} for i in xrange(num_slots)]
+        self._timers = {} # key -> (tick, event)
+
+        # Lowest tick that has not yet been fully expired
+        self._tick = 0
+
+        # Order in which each live timer was armed
+        self._seq = 0
+        self._order = {}
+
+    def __len__(self):
+        """
+        Returns the number of live timers.
+        """
+
+        return len(self._timers)
+
+    def _tick_of(self, time):
+        """
+        Returns the tick containing the specified time.
+        """
+
+        return int(time // self._resolution)
+
+    def armed(self, key):
+        """
+        Returns True if a timer is live for the specified key, and
+        False otherwise.
+        """
+
+        return key in self._timers
+
+    def arm(self, key, event):
+        """
+        Arms a timer for the specified key that expires with the
+        specified event, replacing any timer already live for the key.
+        """
+
+        self.cancel(key)
+
+        tick = max(self._tick_of(event.scheduled()), self._tick)
+
+        self._add(key, tick, event)
+
+    def _add(self, key, tick, event):
+        """
+        Adds a timer for the specified key that expires with the
+        specified event in the specified tick.
+        """
+
+        self._slots[tick % self._num_slots][key] = (tick, event)
+        self._timers[key] = (tick, event)
+
+        self._seq += 1
+        self._order[key] = self._seq
+
+    def cancel(self, key):
+        """
+        Cancels the timer for the specified key, if any, and returns its
+        event, or None if no timer was live for the key.
+        """
+
+        timer = self._timers.pop(key, None)
+
+        if timer is None:
+            return None
+
+        (tick, event) = timer
+        del self._slots[tick % self._num_slots][key]
+        del self._order[key]
+
+        return event
+
+    def expire(self, until=None):
+        """
+        Removes and returns the events of every timer that expires
+        strictly before the specified time, or of every timer if no
+        time is specified, in the order of their times and then of
+        their arming.
+        """
+
+        expired = []
+
+        # Expires every timer when nothing else is scheduled
+        if until is None:
+            for (key, (tick, event)) in self._timers.items():
+                del self._slots[tick % self._num_slots][key]
+                expired.append((event.scheduled(), self._order.pop(key), event))
+
+            self._timers = {}
+
+        else:
+            last = self._tick_of(until)
+
+            if self._timers:
+                # Visits the slots from the current tick on, each at
+                # most once
+                end = min(last, self._tick + self._num_slots - 1)
+
+                for tick in xrange(self._tick, end + 1):
+                    slot = self._slots[tick % self._num_slots]
+
+                    if not slot:
+                        continue
+
+                    for (key, (timer_tick, event)) in slot.items():
+                        # Ignores timers that belong to a later rotation
+                        if timer_tick > last or event.scheduled() >= until:
+                            continue
+
+                        del slot[key]
+                        del self._timers[key]
+
+                        expired.append((event.scheduled(), self._order.pop(key), event))
+
+            self._tick = max(self._tick, last)
+
+        expired.sort()
+
+        return [event for (time, seq, event) in expired]
@@ -1,3 +1,5 @@
+import clock
+
 from device import Device
 
 class FlowTracker:
@@ -99,10 +101,26 @@ def variance_rtt(self, since):
             count_square_deviations += 1
 
         if count_square_deviations <= 1:
-            return 10
+            return 10 * clock.ticks(1) ** 2
 
         return (float(sum_square_deviations) / float(count_square_deviations))   
 
+    def rescale(self, factor):
+        """
+        Multiplies every recorded time by the specified factor.
+        """
+
+        self._times_sent = [(time * factor, size, delay * factor)
+                            for (time, size, delay) in self._times_sent]
+        self._times_received = [time * factor
+                                for time in self._times_received]
+        self._flowrates = [(time * factor, rate)
+                           for (time, rate) in self._flowrates]
+        self._window_sizes = [(time * factor, size)
+                              for (time, size) in self._window_sizes]
+        self._rtts = [(time * factor, rtt * factor)
+                      for (time, rtt) in self._rtts]
+
     def get_times_sent(self):
         return self._times_sent
 
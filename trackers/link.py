@@ -34,6 +34,29 @@ def __init__(self):
     def set_delay(self, delay):
         self._delay = delay
 
+    def rescale(self, factor):
+        """
+        Multiplies every recorded time by the specified factor.
+        """
+
+        self._times_sent = [(time * factor, size)
+                            for (time, size) in self._times_sent]
+        self._packet_losses = [time * factor
+                               for time in self._packet_losses]
+        self._buffer_sizes = [(time * factor, size)
+                              for (time, size) in self._buffer_sizes]
+        self._round_trips = [(time * factor, rtt * factor)
+                             for (time, rtt) in self._round_trips]
+        self._link_rates = [(time * factor, rate)
+                            for (time, rate) in self._link_rates]
+
+        self._delay *= factor
+        self._queueing_delay *= factor
+        self._queueing_delays = [(time * factor, delay * factor)
+                                 for (time, delay) in self._queueing_delays]
+        self._packet_entries = dict([(packet, time * factor)
+                                     for (packet, time) in self._packet_entries.iteritems()])
+
     #record that a packet has entered the buffer
     def record_packet_entry(self, packet, time):
         self._packet_entries[packet] = time
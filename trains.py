@@ -0,0 +1,521 @@
+"""
+Packet trains on the data path.
+
+By default, every packet of a flow is created, queued, sent and
+received as its own events. When trains are used instead, a host sends
+the packets that its window allows at once as a single train, which
+moves through the queues and links as one packet of their total size
+and carries their count next to the sequence number of the first. The
+destination acknowledges the packets received in order as a single
+train of acknowledgments.
+
+A train is only split where part of it does not fit in a buffer: the
+packets at its head go on, and the others are dropped. Its packets all
+share a destination, so every router forwards them to the same next
+hop.
+
+A train arrives whole a propagation delay after its transmission
+starts, so its packets reach the next hop together instead of spaced
+by their transmissions. The train carries that spacing instead, and
+the records of the flows and links are still kept per packet, at the
+times that each packet of the train would have arrived and been
+transmitted.
+"""
+
+import clock
+from buffer import Buffer
+from conn import Link
+from event import Event
+from flow import Flow
+from host import Host
+from packet import Packet
+from router import Router
+
+# Key of the number of packets in a train
+_TRAIN = 'train'
+
+# Key of the time between the packets of a train
+_SPACING = 'spacing'
+
+def _count(packet):
+    """
+    Returns the number of packets in the specified packet.
+    """
+
+    if packet._data is None:
+        return 1
+
+    return packet._data.get(_TRAIN, 1)
+
+def _split(packet, num):
+    """
+    Returns a train of the specified number of packets at the head of
+    the specified train.
+    """
+
+    unit = packet.size() // _count(packet)
+
+    head = Packet()
+    head.source(packet.source())
+    head.dest(packet.dest())
+    head.seq(packet.seq())
+    head.size(unit * num)
+    head.set_create_time(packet.get_create_time())
+    head.ack(packet.ack())
+
+    head._data = dict(packet._data)
+    del head._data[_TRAIN]
+
+    if num > 1:
+        head.datum(_TRAIN, num)
+
+    return head
+
+def _fit(packet, queue):
+    """
+    Returns the longest head of the specified train that fits in the
+    specified buffer, or None if not even a packet fits.
+    """
+
+    count = _count(packet)
+    unit = packet.size() // count
+
+    num = min(count, (queue._max_size - queue.size()) // unit)
+
+    if num <= 0:
+        return None
+
+    if num < count:
+        return _split(packet, num)
+
+    return packet
+
+def _spacing(packet):
+    """
+    Returns the time between the packets of the specified packet.
+    """
+
+    if packet._data is None:
+        return 0
+
+    return packet._data.get(_SPACING, 0)
+
+def _departures(link, packet, time):
+    """
+    Returns the times that the packets of the specified train start
+    their transmissions through the specified link, when the first one
+    starts at the specified time.
+    """
+
+    count = _count(packet)
+    spacing = _spacing(packet)
+
+    trans_delay = clock.transmission(packet.size() // count, link.rate())
+    entry = link.getTracker().get_packet_entry(packet)
+
+    # Each packet waits for those ahead of it to be transmitted, as
+    # well as for its own arrival
+    return [max(time + i * trans_delay, entry + i * spacing)
+            for i in xrange(count)]
+
+def _record_sent(link, time, packet):
+    """
+    Records the packets of the specified train as sent through the
+    specified link, when the first one is sent at the specified time.
+    """
+
+    unit = packet.size() // _count(packet)
+
+    for departure in _departures(link, packet, time):
+        link.record_sent(departure, unit)
+
+def _forward(link, packet):
+    """
+    Spaces the packets of the specified train by at least their
+    transmissions through the specified link.
+    """
+
+    if _count(packet) > 1:
+        trans_delay = clock.transmission(packet.size() // _count(packet), link.rate())
+
+        packet.datum(_SPACING, max(_spacing(packet), trans_delay))
+
+def _update_queueing_delay(self, packet, time):
+    """
+    Train version of Link.update_queueing_delay(packet, time).
+    """
+
+    if _count(packet) == 1:
+        self._tracker.update_queueing_delay(packet, time)
+        return
+
+    tracker = self._tracker
+
+    entry = tracker.get_packet_entry(packet)
+    spacing = _spacing(packet)
+
+    for (i, departure) in enumerate(_departures(self, packet, time)):
+        tracker._queueing_delay = departure - (entry + i * spacing)
+        tracker._queueing_delays.append((departure, tracker._queueing_delay))
+
+def _len(self):
+    """
+    Train version of Buffer.__len__().
+    """
+
+    return sum([_count(packet) for packet in self._deque])
+
+def _prepare(self, packet):
+    """
+    Train version of Flow.prepare(packet).
+    """
+
+    packet.seq(self.next_seq())
+
+    # Reserves the sequence numbers of the rest of the train
+    self._curr_seq_num += _count(packet) - 1
+
+    num_bits = self.bits()
+    if num_bits is not None:
+        self.bits(num_bits - packet.size())
+
+def _analyze(self, event, link):
+    """
+    Train version of Flow.analyze(event, link).
+    """
+
+    packet = event.packet()
+    count = _count(packet)
+
+    # Analyzes single packets and timeouts as usual
+    if count == 1 or event.action() == Event._TIMEOUT:
+        return _PACKETS[Flow]['analyze'](self, event, link)
+
+    action = event.action()
+    time = event.scheduled()
+
+    first = packet.seq()
+
+    reset = False
+
+    self._tracker.record_windowsize(time, self.window())
+
+    if action == Event._SEND and not packet.ack():
+        unit = packet.size() // count
+
+        for (i, departure) in enumerate(_departures(link, packet, time)):
+            self._tracker.record_sent(departure, unit, link.delay())
+
+            self._unack_packets.append(first + i)
+
+    elif action == Event._RECEIVE and packet.ack():
+        spacing = _spacing(packet)
+
+        # Receives the acknowledgments as spaced when they were sent
+        for i in xrange(count):
+            arrival = time + i * spacing
+
+            reset |= self._acknowledge(arrival, first + i)
+
+            self.record_packet_rtt(packet, arrival)
+
+            self._tracker.record_windowsize(arrival, self.window())
+
+    self.unack(len(self._unack_packets))
+
+    self._tracker.record_windowsize(time, self.window())
+
+    return reset
+
+def _host_handle_create(self, event):
+    """
+    Train version of Host._handle_create(event).
+    """
+
+    time = event.scheduled()
+    packet = event.packet()
+
+    dest = packet.dest()
+
+    flow = self._flows.get(dest)
+
+    if flow is not None and flow.is_able() and flow.has_data():
+        queue = self._port.outgoing()
+
+        # Sends as many packets as the window, the data left and the
+        # outgoing buffer allow, and at least one
+        num = int(flow.window() - flow.unack())
+        if num < flow.window() - flow.unack():
+            num += 1
+
+        num_bits = flow.bits()
+        if num_bits is not None:
+            num = min(num, -(-num_bits // Packet._DATA_SIZE))
+
+        num = max(min(num, (queue._max_size - queue.size()) // Packet._DATA_SIZE), 1)
+
+        link = self._port.conn()
+
+        packet.size(Packet._DATA_SIZE * num)
+
+        # Spaces the packets as if each one was created once the one
+        # ahead of it was transmitted
+        if num > 1:
+            packet.datum(_TRAIN, num)
+            packet.datum(_SPACING, clock.transmission(Packet._DATA_SIZE, link.rate()))
+
+        # Counts the train as unacknowledged until it is sent, so that
+        # the flow does not complete while its last train is queued
+        flow.unack(flow.unack() + num)
+
+        # Attaches the unique identifiers (per flow) of the train
+        flow.prepare(packet)
+
+        queue.append(packet) # append right, pop left
+
+        link.record_packet_entry(packet, time)
+        send_time = self._schedule(time, packet, link)
+
+        send_event = self._create_event(send_time, self._port, Event._SEND, packet)
+        self._push(send_event)
+
+def _host_handle_receive(self, event):
+    """
+    Train version of Host._handle_receive(event).
+    """
+
+    packet = event.packet()
+
+    # Handles acknowledgments as usual, as the flow analyzes trains
+    if packet.dest() != self or packet.ack():
+        return _PACKETS[Host]['_handle_receive'](self, event)
+
+    time = event.scheduled()
+    dest = packet.source()
+
+    first = packet.seq()
+
+    # Acknowledges each packet of the train in turn
+    acks = []
+
+    for seq_num in xrange(first, first + _count(packet)):
+        if dest not in self._expected:
+            self._expected[dest] = seq_num
+
+        expected = self._expected[dest]
+
+        # Extends the train of acknowledgments of consecutive packets
+        if acks and expected == acks[-1][0] + acks[-1][1]:
+            acks[-1][1] += 1
+        else:
+            acks.append([expected, 1])
+
+        if seq_num == expected:
+            self._expected[dest] += 1
+
+    link = self._port.conn()
+    queue = self._port.outgoing()
+
+    for (seq_num, num) in acks:
+        ack = self._create_ack(packet)
+        ack.seq(seq_num)
+        ack.size(Packet._ACK_SIZE * num)
+
+        # Spaces the acknowledgments as the packets arrived
+        if num > 1:
+            ack.datum(_TRAIN, num)
+            ack.datum(_SPACING, _spacing(packet))
+
+        # Drops the acknowledgments that do not fit
+        ack = _fit(ack, queue)
+        if ack is None:
+            continue
+
+        queue.append(ack) # append right, pop left
+
+        link.record_packet_entry(ack, time)
+        send_time = self._schedule(time, ack, link)
+
+        # Creates a send event for the current time
+        ack_event = self._create_event(send_time, self._port, Event._SEND, ack)
+        self._push(ack_event)
+
+def _host_handle_send(self, event):
+    """
+    Train version of Host._handle_send(event).
+    """
+
+    time = event.scheduled()
+    port = event.port()
+    packet = event.packet()
+
+    link = port.conn()
+    prop_delay = link.delay()
+    dest = link.dest()
+
+    queue = dest.incoming()
+
+    # Forwards the head of the train that fits on the receiving end
+    head = _fit(packet, queue)
+
+    if head is not None:
+        queue.append(head) # append right, pop left
+
+        # Creates a receive event for a propagation delay later
+        receive_event = self._create_event(time + prop_delay, dest, Event._RECEIVE, head)
+        self._push(receive_event)
+
+    # Notifies the link that the rest of the train was dropped
+    num_lost = _count(packet)
+    if head is not None:
+        num_lost -= _count(head)
+
+    for i in xrange(num_lost):
+        link.record_packet_loss(time + prop_delay)
+
+    should_create = True
+
+    if packet.source() == self:
+        # Updates packet statistics of flow
+        flow = self._flows.get(packet.dest())
+
+        if flow is not None:
+            flow.analyze(event, link)
+            should_create = flow.is_able()
+
+    if not packet.ack():
+        # Notifies the link that the packets were sent
+        _record_sent(link, time, packet)
+
+    # Creates the next packet to send
+    next_packet = self._create_packet(self, packet.dest())
+    next_packet.set_create_time(time)
+
+    # Arms the retransmission timer of the flow unless already running
+    flow = self._flows.get(next_packet.dest())
+    if (flow is not None and packet.source() == self
+            and not packet.ack()):
+        timeout = clock.quantize(flow.timeout(link.delay()))
+        self._timeouts[flow] = timeout
+
+        if not self._timers.armed(flow):
+            timeout_event = self._create_event(time + timeout + clock.ticks(0.001), self._port, Event._TIMEOUT, packet)
+            self._timers.arm(flow, timeout_event)
+
+    # Only create an event if currently able to send
+    if should_create:
+        # Creates a create event once the whole train is transmitted
+        trans_delay = clock.transmission(packet.size(), link.rate())
+
+        create_event = self._create_event(time + trans_delay, self._port, Event._CREATE, next_packet)
+        self._push(create_event)
+
+    if head is not None:
+        _forward(link, head)
+
+def _router_handle_receive(self, event):
+    """
+    Train version of Router._handle_receive(event).
+    """
+
+    packet = event.packet()
+
+    if packet.dest() != self and _count(packet) > 1:
+        next_port = self._algorithm.next(packet.dest())
+
+        # Drops the rest of the train that does not fit in the
+        # outgoing buffer
+        if next_port is not None:
+            head = _fit(packet, next_port.outgoing())
+            if head is None:
+                return
+
+            event.packet(head)
+
+    _PACKETS[Router]['_handle_receive'](self, event)
+
+def _router_handle_send(self, event):
+    """
+    Train version of Router._handle_send(event).
+    """
+
+    packet = event.packet()
+
+    # Sends the packets of the router itself as usual
+    if _count(packet) == 1:
+        return _PACKETS[Router]['_handle_send'](self, event)
+
+    time = event.scheduled()
+    port = event.port()
+
+    link = port.conn()
+    prop_delay = link.delay()
+    dest = link.dest()
+
+    queue = dest.incoming()
+
+    # Forwards the head of the train that fits on the receiving end
+    head = _fit(packet, queue)
+
+    if head is not None:
+        queue.append(head) # append right, pop left
+
+        spawned_event = self._create_event(time + prop_delay, dest, Event._RECEIVE, head)
+        self._push(spawned_event)
+
+    # Records the rest of the train as dropped
+    num_lost = _count(packet)
+    if head is not None:
+        num_lost -= _count(head)
+
+    for i in xrange(num_lost):
+        link.record_packet_loss(time + prop_delay)
+
+    if not packet.ack():
+        _record_sent(link, time, packet)
+
+    if head is not None:
+        _forward(link, head)
+
+# Maps each class to its train versions of the data path
+_TRAINS = {Buffer: {'__len__': _len},
+           Link:   {'update_queueing_delay': _update_queueing_delay},
+           Flow:   {'prepare': _prepare,
+                    'analyze': _analyze},
+           Host:   {'_handle_create': _host_handle_create,
+                    '_handle_receive': _host_handle_receive,
+                    '_handle_send': _host_handle_send},
+           Router: {'_handle_receive': _router_handle_receive,
+                    '_handle_send': _router_handle_send}}
+
+# Maps each class to its per-packet versions of the data path
+_PACKETS = dict([(cls, dict([(name, cls.__dict__[name]) for name in methods]))
+                 for (cls, methods) in _TRAINS.iteritems()])
+
+_trains = False
+
+def use_trains(trains=True):
+    """
+    Sends the packets of the flows as trains if specified, and one by
+    one otherwise.
+    """
+
+    global _trains
+
+    methods = _PACKETS
+    if trains:
+        methods = _TRAINS
+
+    for (cls, versions) in methods.iteritems():
+        for (name, method) in versions.iteritems():
+            setattr(cls, name, method)
+
+    _trains = trains
+
+def uses_trains():
+    """
+    Returns True if the packets of the flows are sent as trains, and
+    False otherwise.
+    """
+
+    return _trains
@@ -0,0 +1,222 @@
+"""
+Validation mode of the core data path.
+
+Strict mode checks the arguments of every accessor and is the default.
+Trusted mode swaps the accessors on the hot path for versions that
+skip the checks, which is safe for objects built by Setup. Since the
+accessors belong to the classes, a Simulation only switches the mode
+for the duration of each run, and restores the previous mode after.
+"""
+
+from buffer import Buffer
+from event import Event
+from flow import Flow
+from packet import Packet
+from routing.bellmanford import BellmanFord
+
+def _scheduled(self, time=None):
+    """
+    Trusted version of Event.scheduled(time).
+    """
+
+    if time is None:
+        return self._scheduled_time
+
+    self._scheduled_time = time
+
+def _port(self, port=None):
+    """
+    Trusted version of Event.port(port).
+    """
+
+    if port is None:
+        return self._port
+
+    self._port = port
+
+def _action(self, action=None):
+    """
+    Trusted version of Event.action(action).
+    """
+
+    if action is None:
+        return self._action
+
+    self._action = action
+
+def _packet(self, packet=None):
+    """
+    Trusted version of Event.packet(packet).
+    """
+
+    if packet is None:
+        return self._packet
+
+    self._packet = packet
+
+def _seq(self, num=None):
+    """
+    Trusted version of Packet.seq(num).
+    """
+
+    if num is None:
+        return self._id
+
+    self._id = num
+
+def _source(self, device=None):
+    """
+    Trusted version of Packet.source(device).
+    """
+
+    if device is None:
+        return self._source
+
+    self._source = device
+
+def _dest(self, device=None):
+    """
+    Trusted version of Packet.dest(device).
+    """
+
+    if device is None:
+        return self._dest
+
+    self._dest = device
+
+def _size(self, bits=None):
+    """
+    Trusted version of Packet.size(bits).
+    """
+
+    if bits is None:
+        return self._bits_size
+
+    self._bits_size = bits
+
+def _ack(self, flag=None):
+    """
+    Trusted version of Packet.ack(flag).
+    """
+
+    if flag is None:
+        return self._ack
+
+    self._ack = flag
+
+def _has_space(self, packet):
+    """
+    Trusted version of Buffer.has_space(packet).
+    """
+
+    return (self._curr_size + packet._bits_size <= self._max_size)
+
+def _append(self, packet):
+    """
+    Trusted version of Buffer.append(packet).
+    """
+
+    size = packet._bits_size
+
+    if self._curr_size + size <= self._max_size:
+        self._deque.append(packet)
+        self._curr_size += size
+
+def _next(self, device):
+    """
+    Trusted version of BellmanFord.next(device).
+    """
+
+    return self._routing_table.get(device)
+
+def _window(self, size=None):
+    """
+    Trusted version of Flow.window(size).
+    """
+
+    if size is None:
+        return self._window_size
+
+    # Keeps window sizes as floats, by multiplying so that the sizes
+    # of the variants of a sweep are not converted to a single one
+    self._window_size = size * 1.0
+
+def _unack(self, num=None):
+    """
+    Trusted version of Flow.unack(num).
+    """
+
+    if num is None:
+        return self._num_unack
+
+    complete = self.is_complete()
+    self._num_unack = num
+    self._notify(complete)
+
+def _bits(self, num=None):
+    """
+    Trusted version of Flow.bits(num).
+    """
+
+    if num is None:
+        return self._num_bits
+
+    complete = self.is_complete()
+    self._num_bits = num
+    self._notify(complete)
+
+# Maps each class to its trusted accessors
+_TRUSTED = {Event:       {'scheduled': _scheduled,
+                          'port': _port,
+                          'action': _action,
+                          'packet': _packet},
+            Packet:      {'seq': _seq,
+                          'source': _source,
+                          'dest': _dest,
+                          'size': _size,
+                          'ack': _ack},
+            Buffer:      {'has_space': _has_space,
+                          'append': _append},
+            BellmanFord: {'next': _next},
+            Flow:        {'window': _window,
+                          'unack': _unack,
+                          'bits': _bits}}
+
+# Maps each class to the accessors that the trusted ones replaced
+_strict = {}
+
+_trusted = False
+
+def use_trusted(trusted=True):
+    """
+    Uses the trusted accessors if specified, and the strict accessors
+    otherwise.
+    """
+
+    global _trusted
+
+    if trusted == _trusted:
+        return
+
+    # Keeps the accessors in place when switching, to restore them later
+    if trusted:
+        for (cls, methods) in _TRUSTED.iteritems():
+            _strict[cls] = dict([(name, cls.__dict__[name]) for name in methods])
+
+    accessors = _strict
+    if trusted:
+        accessors = _TRUSTED
+
+    for (cls, methods) in accessors.iteritems():
+        for (name, method) in methods.iteritems():
+            setattr(cls, name, method)
+
+    _trusted = trusted
+
+def is_trusted():
+    """
+    Returns True if the trusted accessors are in use, and False
+    otherwise.
+    """
+
+    return _trusted